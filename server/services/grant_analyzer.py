@@ -4,596 +4,4473 @@ Enhanced Grant Analysis System for CiviGrantAI
 Integrated version for TypeScript/React application
 """
 
+import codecs
+import dataclasses
+import hashlib
+import heapq
 import json
+import math
+import mmap
 import re
+import sqlite3
+import struct
 import sys
 import os
-from typing import Dict, List, Any, Optional
+import time
+import zipfile
+import zlib
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from itertools import accumulate, islice
+from typing import Callable, Dict, List, Any, Iterator, Optional, Tuple, Union, get_args, get_origin, get_type_hints
 from datetime import datetime
-import PyPDF2
-import docx
+from xml.etree import ElementTree
 import io
 
+# ---------------------------------------------------------------------------
+# Rule pack
+#
+# Every pattern and rule table the extractors use comes from a versioned JSON
+# rule pack (grant_rules.json beside this file, or GRANT_ANALYZER_RULE_PACK)
+# and is bound to a name here, so the keyword scanner below can be compiled
+# once per process. Patterns are registered with the flags they are matched
+# with.
+# ---------------------------------------------------------------------------
+
+RULE_PACK_FORMAT = 1
+RULE_PACK_PATH = os.environ.get('GRANT_ANALYZER_RULE_PACK') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'grant_rules.json')
+
+def load_rule_pack(path: str) -> Dict[str, Any]:
+    """Read a rule pack and add its 'digest', a hash of its canonical JSON"""
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            pack = json.load(file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Rule pack not found: {path} (grant_rules.json ships beside grant_analyzer.py "
+                                f"or set GRANT_ANALYZER_RULE_PACK to another pack)") from None
+    if pack.get('format') != RULE_PACK_FORMAT:
+        raise ValueError(f"{path}: unsupported rule pack format {pack.get('format')!r} (expected {RULE_PACK_FORMAT})")
+    canonical = json.dumps(pack, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    pack['digest'] = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+    return pack
+
+RULE_PACK = load_rule_pack(RULE_PACK_PATH)
+_RULES = RULE_PACK['rules']
+
+FONUM_PATTERNS = _RULES['fonum_patterns']
+TITLE_PATTERNS = _RULES['title_patterns']
+AGENCY_PATTERNS = _RULES['agency_patterns']
+
+# A description is a heading followed by at least DESC_MIN_LENGTH characters without letters
+DESC_HEADINGS = _RULES['desc_headings']
+DESC_MIN_LENGTH = _RULES['desc_min_length']
+DESC_MAX_LENGTH = _RULES['desc_max_length']
+
+# Canonical section names and the heading lines that introduce them.
+# Headings are matched as whole lines, ignoring case, numbering and a
+# trailing colon.
+SECTION_HEADINGS = _RULES['section_headings']
+
+ELIGIBLE_PATTERNS = _RULES['eligible_patterns']
+INELIGIBLE_PATTERNS = _RULES['ineligible_patterns']
+AMOUNT_PATTERNS = _RULES['amount_patterns']
+COST_SHARING_NO_PATTERN = _RULES['cost_sharing_no_pattern']
+COST_SHARING_YES_PATTERN = _RULES['cost_sharing_yes_pattern']
+
+# Section headers in caps: a run of capitals on one line containing a keyword
+CRITERIA_KEYWORDS = _RULES['criteria_keywords']
+CAPS_RUN_PATTERN = _RULES['caps_run_pattern']
+
+# Common rating scale patterns
+SCALE_PATTERNS = _RULES['scale_patterns']
+
+DOC_PATTERNS = _RULES['doc_patterns']
+PAGE_LIMIT_PATTERN = _RULES['page_limit_pattern']
+FORMAT_PATTERNS = _RULES['format_patterns']
+
+MONTH_NAMES = _RULES['month_names']
+
+# Month-name deadlines are one alternative per month, so each is anchored on the month name
+DEADLINE_PATTERNS = _RULES['deadline_patterns']
+DATE_PATTERNS = _RULES['date_patterns']
+
+# Role of a date, from the words before it in its sentence. Q&A and period
+# of performance sentences borrow closing words ("questions are due", "start
+# date ... through"), so those roles win whenever they appear; otherwise the
+# keyword nearest the date decides.
+DATE_ROLE_RULES = [tuple(rule) for rule in _RULES['date_role_rules']]
+OVERRIDING_DATE_ROLES = tuple(_RULES['overriding_date_roles'])
+DATE_ROLE_PATTERNS = [(role, re.compile(pattern, re.IGNORECASE)) for role, pattern in DATE_ROLE_RULES]
+
+DATE_REGEXES = [re.compile(pattern) for pattern in DATE_PATTERNS]
+
+# Labeled dates kept per document
+MAX_LABELED_DATES = 50
+
+# "Keyword up to the end of its sentence"; patterns ending in this are
+# answered from the sentence index (see KeywordHits.clauses)
+CLAUSE_SUFFIX = r'.*?(?:\.|$)'
+
+PRIORITY_PATTERNS = [keyword + CLAUSE_SUFFIX for keyword in _RULES['priority_keywords']]
+
+GOAL_PATTERNS = [keyword + CLAUSE_SUFFIX for keyword in _RULES['goal_keywords']]
+
+COMPLIANCE_KEYWORDS = _RULES['compliance_keywords']
+
+# Surrounding context for each compliance keyword
+COMPLIANCE_CONTEXT_PATTERNS = {
+    keyword: re.compile(f'.{{0,100}}{keyword}.{{0,100}}', re.IGNORECASE)
+    for keyword in COMPLIANCE_KEYWORDS
+}
+
+STRATEGIC_INSIGHT_RULES = [tuple(rule) for rule in _RULES['strategic_insight_rules']]
+
+# Each match adds one point to the funding competitiveness score
+COMPETITIVENESS_PATTERNS = _RULES['competitiveness_patterns']
+
+def competitiveness_level(score: int) -> str:
+    return "High" if score >= 2 else "Medium" if score == 1 else "Low"
+
+EMPHASIS_PATTERNS = [keyword + CLAUSE_SUFFIX for keyword in _RULES['emphasis_keywords']]
+
+VOLUME_INDICATOR_RULES = [tuple(rule) for rule in _RULES['volume_indicator_rules']]
+DIFFERENTIATION_RULES = [tuple(rule) for rule in _RULES['differentiation_rules']]
+POSITIONING_RULES = [tuple(rule) for rule in _RULES['positioning_rules']]
+
+# ---------------------------------------------------------------------------
+# Keyword scanner
+# ---------------------------------------------------------------------------
+
+_REGEX_META = set('.^$*+?{}[]|()')
+_QUANTIFIERS = set('*?{')
+
+# Non-ASCII code points that re.IGNORECASE matches against ASCII letters
+# (everything else that lower() maps onto ASCII is plain A-Z)
+_IGNORECASE_SPECIALS = (('İ', 'i'), ('ı', 'i'), ('ſ', 's'))
+
+def _fold_case(text: str) -> str:
+    """Lowercase text without changing its length, matching re.IGNORECASE for ASCII"""
+    if not text.isascii():
+        for special, replacement in _IGNORECASE_SPECIALS:
+            text = text.replace(special, replacement)
+    return text.lower()
+
+# Bytes of a bytes buffer lowercased and scanned at a time
+SCAN_CHUNK_SIZE = 1 << 20
+
+# Bytes versions of str regexes, for text held in a bytes buffer
+_BYTES_REGEXES: Dict[Any, Any] = {}
+
+def _compiled_for(regex, text):
+    """regex itself, or its bytes twin (ASCII semantics) when text is a bytes buffer"""
+    if isinstance(text, str):
+        return regex
+    if regex not in _BYTES_REGEXES:
+        _BYTES_REGEXES[regex] = re.compile(regex.pattern.encode('ascii'), regex.flags & ~re.UNICODE)
+    return _BYTES_REGEXES[regex]
+
+def _decode(value):
+    """Matched bytes as str; str and None pass through"""
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return value
+
+class _TextMatch:
+    """A match over a bytes buffer whose groups read as str"""
+    
+    __slots__ = ('_match',)
+    
+    def __init__(self, match):
+        self._match = match
+    
+    def group(self, *groups):
+        value = self._match.group(*groups)
+        return tuple(map(_decode, value)) if isinstance(value, tuple) else _decode(value)
+    
+    def start(self, group=0) -> int:
+        return self._match.start(group)
+    
+    def end(self, group=0) -> int:
+        return self._match.end(group)
+
+def _split_alternatives(pattern: str) -> List[str]:
+    """Split a pattern on its top-level | operators"""
+    alternatives = []
+    depth = 0
+    in_class = False
+    current = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            current += pattern[i:i + 2]
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            alternatives.append(current)
+            current = ''
+            i += 1
+            continue
+        current += char
+        i += 1
+    alternatives.append(current)
+    return alternatives
+
+def _split_literal(pattern: str) -> Tuple[str, str]:
+    """Split a pattern into the literal text every match starts with and the rest"""
+    prefix = ''
+    consumed = []
+    i = 0
+    while i < len(pattern):
+        start = i
+        char = pattern[i]
+        if char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if not escaped or escaped.isalnum():
+                break
+            char = escaped
+            i += 1
+        elif char in _REGEX_META:
+            if char in _QUANTIFIERS and consumed:
+                # The quantifier may make the previous character optional
+                prefix = prefix[:-1]
+                i = consumed.pop()
+            break
+        prefix += char
+        consumed.append(start)
+        i += 1
+    return prefix, pattern[i:]
+
+class _Alternative:
+    """One top-level alternative of a registered pattern and how to evaluate it"""
+    
+    def __init__(self, regex, anchor_id: Optional[int], piece_ids: Optional[List[int]] = None,
+                 piece_lengths: Optional[List[int]] = None, line_bounded: bool = False):
+        self.regex = regex
+        self.anchor_id = anchor_id
+        # Literal pieces joined by '.*', matched through the hit table
+        self.piece_ids = piece_ids
+        self.piece_lengths = piece_lengths
+        # A failed match at one hit fails for every later hit on the same line
+        self.line_bounded = line_bounded
+
+def _build_trie_regex(words: List[str]) -> str:
+    """Build an alternation factored on common prefixes, preferring longer words"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(node[char]) for char in sorted(node) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            body = '(?:' + body + ')?'
+        return body
+    
+    return emit(trie)
+
+class KeywordScanner:
+    """
+    Precompiled multi-pattern scanner shared by all extractors.
+    
+    Each registered pattern is reduced to the literal text every match must
+    start with (its anchor). One combined, prefix-factored alternation finds
+    every anchor occurrence in a single pass over the document; full patterns
+    are then only tried, anchored, at those offsets. This returns exactly the
+    matches re.search/re.finditer would, without rescanning the document once
+    per pattern. Patterns without a literal anchor fall back to a direct scan.
+    
+    A binary scanner compiles the same patterns as bytes regexes, for text
+    held in a bytes buffer such as a memory-mapped file (see
+    analyze_mapped_text); they then match with ASCII semantics.
+    
+    Work stays linear in the document size: literal chains such as
+    'Exceeds.*meets.*does not meet' are answered from the hit table without
+    running the regex, and a pattern like 'due.*?(date)' that fails at one hit
+    skips the remaining hits on that line instead of rescanning it.
+    """
+    
+    def __init__(self, patterns: List[Tuple[str, int]], binary: bool = False):
+        self.binary = binary
+        self.anchors: List[str] = []
+        self._anchor_ids: Dict[str, int] = {}
+        self._alternatives: Dict[str, List[_Alternative]] = {}
+        
+        for pattern, flags in patterns:
+            if pattern not in self._alternatives:
+                self._alternatives[pattern] = [
+                    self._compile_alternative(alternative, flags)
+                    for alternative in _split_alternatives(pattern)
+                ]
+        
+        # Shorter anchors that are prefixes of a longer one match wherever it does
+        self._implied = [
+            sorted(self._anchor_ids[anchor[:length]] for length in range(1, len(anchor))
+                   if anchor[:length] in self._anchor_ids)
+            for anchor in self.anchors
+        ]
+        trie = _build_trie_regex(self.anchors)
+        self._regex = re.compile(trie.encode('ascii') if binary else trie)
+    
+    def _compile_alternative(self, alternative: str, flags: int) -> _Alternative:
+        regex = re.compile(alternative.encode('ascii') if self.binary else alternative, flags)
+        literal, rest = _split_literal(alternative)
+        if not literal:
+            return _Alternative(regex, None)
+        anchor_id = self._anchor_id(literal.lower())
+        if flags & re.DOTALL:
+            return _Alternative(regex, anchor_id)
+        
+        pieces = [_split_literal(piece) for piece in re.split(r'\.\*(?!\?)', alternative)]
+        if len(pieces) > 1 and all(piece and not rest for piece, rest in pieces):
+            return _Alternative(regex, anchor_id,
+                                piece_ids=[self._anchor_id(piece.lower()) for piece, _ in pieces],
+                                piece_lengths=[len(piece) for piece, _ in pieces])
+        
+        return _Alternative(regex, anchor_id, line_bounded=rest.startswith('.*'))
+    
+    def _anchor_id(self, anchor: str) -> int:
+        if anchor not in self._anchor_ids:
+            self._anchor_ids[anchor] = len(self.anchors)
+            self.anchors.append(anchor)
+        return self._anchor_ids[anchor]
+    
+    def scan(self, text: str, workers: int = 1) -> 'KeywordHits':
+        """Find every anchor occurrence in one left-to-right pass (or with parallel_scan, see there)"""
+        
+        if workers > 1 and isinstance(text, str) and len(text) >= PARALLEL_SCAN_MIN_CHARS:
+            return parallel_scan(self, text, workers)
+        
+        # Packed offsets keep the hit table small on very large documents
+        offsets = [array('q') for _ in self.anchors]
+        if self.binary:
+            # Lowercase one chunk at a time rather than copying the whole buffer;
+            # chunks overlap by the longest anchor so none is cut in half
+            overlap = max(map(len, self.anchors), default=1) - 1
+            for chunk_start in range(0, len(text), SCAN_CHUNK_SIZE):
+                chunk = text[chunk_start:chunk_start + SCAN_CHUNK_SIZE + overlap].lower()
+                self._scan_folded(chunk, chunk_start, min(SCAN_CHUNK_SIZE, len(text) - chunk_start), offsets)
+        else:
+            self._scan_folded(_fold_case(text), 0, len(text), offsets)
+        
+        return KeywordHits(self, text, offsets)
+    
+    def _scan_folded(self, folded, base: int, limit: int, offsets: List[Any]):
+        """Record the anchors starting in folded[:limit], at base plus their offset"""
+        search = self._regex.search
+        match = search(folded)
+        while match and match.start() < limit:
+            start = match.start()
+            anchor = match.group().decode('ascii') if self.binary else match.group()
+            anchor_id = self._anchor_ids[anchor]
+            offsets[anchor_id].append(base + start)
+            for implied_id in self._implied[anchor_id]:
+                offsets[implied_id].append(base + start)
+            match = search(folded, start + 1)
+
+class KeywordHits:
+    """Anchor hit table for one document, queried instead of rescanning the text"""
+    
+    def __init__(self, scanner: KeywordScanner, text: str, offsets: List[Any],
+                 counts: Optional[Tuple[int, int]] = None,
+                 headings: Optional[List[Tuple[int, str, Optional[str]]]] = None):
+        self.scanner = scanner
+        self.text = text
+        self.offsets = offsets
+        # Filled in by parallel_scan, which finds them alongside the anchors
+        self._counts = counts
+        self.headings = headings
+        self.newline = b'\n' if scanner.binary else '\n'
+        # Regex executions so far, read by the opt-in stage timings
+        self.regex_calls = 0
+        self._sentences: Optional['SentenceIndex'] = None
+    
+    def counts(self) -> Tuple[int, int]:
+        """count_words_and_chars of the text, computed once"""
+        if self._counts is None:
+            self._counts = count_words_and_chars(self.text)
+        return self._counts
+    
+    @property
+    def sentences(self) -> 'SentenceIndex':
+        """Sentence index of the text, built on first use and shared by every extractor"""
+        if self._sentences is None:
+            self._sentences = SentenceIndex(self.text)
+        return self._sentences
+    
+    def clauses(self, pattern: str, start: int = 0, end: Optional[int] = None,
+                limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Spans re.finditer would return for a 'keyword' + CLAUSE_SUFFIX pattern
+        (up to limit of them), looked up from the keyword's hits and the
+        sentence index instead of running the regex.
+        """
+        
+        end = len(self.text) if end is None else end
+        alternative, = self.scanner._alternatives[pattern]
+        keyword_length = len(pattern) - len(CLAUSE_SUFFIX)
+        offsets = self.offsets[alternative.anchor_id]
+        spans = []
+        index = bisect_left(offsets, start)
+        while index < len(offsets) and (limit is None or len(spans) < limit):
+            offset = offsets[index]
+            if offset + keyword_length > end:
+                break
+            clause_end = self.sentences.clause_end(offset + keyword_length, end)
+            if clause_end is None:
+                index += 1
+                continue
+            spans.append((offset, clause_end))
+            # finditer resumes after the match, skipping keywords inside it
+            index = bisect_left(offsets, clause_end, index + 1)
+        return spans
+    
+    def search(self, pattern: str, start: int = 0, end: Optional[int] = None):
+        """Equivalent of re.search(pattern, text[start:end]) with offsets into text"""
+        end = len(self.text) if end is None else end
+        best = None
+        for alternative in self.scanner._alternatives[pattern]:
+            limit = end if best is None else best.start()
+            match = self._first_match(alternative, start, limit, end)
+            if match is not None and (best is None or match.start() < best.start()):
+                best = match
+        return _TextMatch(best) if self.scanner.binary and best is not None else best
+    
+    def contains(self, pattern: str, start: int = 0, end: Optional[int] = None) -> bool:
+        """Whether re.search(pattern, text[start:end]) would find a match"""
+        end = len(self.text) if end is None else end
+        for alternative in self.scanner._alternatives[pattern]:
+            if alternative.piece_ids is not None:
+                found = self._chain_start(alternative, start, end) is not None
+            else:
+                found = self._first_match(alternative, start, end, end) is not None
+            if found:
+                return True
+        return False
+    
+    def finditer(self, pattern: str, start: int = 0, end: Optional[int] = None) -> Iterator[Any]:
+        """Equivalent of re.finditer(pattern, text[start:end]) with offsets into text"""
+        end = len(self.text) if end is None else end
+        pos = start
+        while pos <= end:
+            match = self.search(pattern, pos, end)
+            if match is None:
+                return
+            yield match
+            pos = match.end() if match.end() > match.start() else match.end() + 1
+    
+    def findall(self, pattern: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """Matched text of every finditer match"""
+        return [match.group(0) for match in self.finditer(pattern, start, end)]
+    
+    def regex_match(self, regex, pos: int = 0, end: Optional[int] = None):
+        """regex.match(text, pos, end) for a str regex outside the scanner, with str groups"""
+        end = len(self.text) if end is None else end
+        match = _compiled_for(regex, self.text).match(self.text, pos, end)
+        return _TextMatch(match) if self.scanner.binary and match is not None else match
+    
+    def regex_search(self, regex, pos: int = 0, end: Optional[int] = None):
+        """regex.search(text, pos, end) for a str regex outside the scanner, with str groups"""
+        end = len(self.text) if end is None else end
+        match = _compiled_for(regex, self.text).search(self.text, pos, end)
+        return _TextMatch(match) if self.scanner.binary and match is not None else match
+    
+    def slice(self, start: int, end: int) -> str:
+        """text[start:end] as str"""
+        return _decode(self.text[start:end])
+    
+    def _first_match(self, alternative: _Alternative, start: int, limit: int, end: int):
+        """First match of one alternative starting in [start, limit]"""
+        text = self.text
+        regex = alternative.regex
+        if alternative.anchor_id is None:
+            self.regex_calls += 1
+            match = regex.search(text, start, end)
+            return match if match is not None and match.start() <= limit else None
+        
+        if alternative.piece_ids is not None:
+            chain_start = self._chain_start(alternative, start, end)
+            if chain_start is None or chain_start > limit:
+                return None
+            self.regex_calls += 1
+            return regex.match(text, chain_start, end)
+        
+        offsets = self.offsets[alternative.anchor_id]
+        index = bisect_left(offsets, start)
+        while index < len(offsets):
+            offset = offsets[index]
+            if offset > limit:
+                break
+            self.regex_calls += 1
+            match = regex.match(text, offset, end)
+            if match is not None:
+                return match
+            index += 1
+            if alternative.line_bounded:
+                line_end = text.find(self.newline, offset, end)
+                if line_end == -1:
+                    break
+                index = bisect_left(offsets, line_end + 1, index)
+        return None
+    
+    def _chain_start(self, alternative: _Alternative, start: int, end: int) -> Optional[int]:
+        """Leftmost hit from which every literal piece follows in order on one line"""
+        text = self.text
+        first_offsets = self.offsets[alternative.piece_ids[0]]
+        index = bisect_left(first_offsets, start)
+        while index < len(first_offsets):
+            chain_start = first_offsets[index]
+            position = chain_start + alternative.piece_lengths[0]
+            for piece_id, length in zip(alternative.piece_ids[1:], alternative.piece_lengths[1:]):
+                piece_offsets = self.offsets[piece_id]
+                piece_index = bisect_left(piece_offsets, position)
+                if piece_index == len(piece_offsets) or piece_offsets[piece_index] + length > end:
+                    # No later start can find this piece either
+                    return None
+                piece_start = piece_offsets[piece_index]
+                newline = text.rfind(self.newline, position, piece_start)
+                if newline != -1:
+                    # Earliest remaining piece is on a later line; so is every
+                    # chain starting before that line break
+                    index = bisect_left(first_offsets, newline + 1, index)
+                    break
+                position = piece_start + length
+            else:
+                return chain_start if position <= end else None
+        return None
+
+PERIOD = re.compile(r'\.')
+LINE_BREAK = re.compile(r'\n')
+
+class SentenceIndex:
+    """
+    Offsets of every period and line break in one document, built in one pass.
+    
+    A clause runs from a keyword to the first period after it on the same line
+    ('.' never matches a line break); a line without one only ends a clause
+    when it is the last line of the searched range, where '$' matches.
+    """
+    
+    def __init__(self, text):
+        self.text_length = len(text)
+        self.periods = array('q', (match.start() for match in _compiled_for(PERIOD, text).finditer(text)))
+        self.line_breaks = array('q', (match.start() for match in _compiled_for(LINE_BREAK, text).finditer(text)))
+    
+    def _next(self, stops, position: int) -> Optional[int]:
+        index = bisect_left(stops, position)
+        return stops[index] if index < len(stops) else None
+    
+    def clause_end(self, position: int, end: int) -> Optional[int]:
+        """End of the clause continuing at position within text[:end], or None if it has none"""
+        period = self._next(self.periods, position)
+        line_break = self._next(self.line_breaks, position)
+        line_end = end if line_break is None else min(line_break, end)
+        if period is not None and period < line_end:
+            return period + 1
+        if line_end == end:
+            return end
+        if line_end == end - 1:
+            # '$' also matches before a line break that ends the range
+            return line_end
+        return None
+    
+    def sentence_at(self, offset: int) -> Tuple[int, int]:
+        """(start, end) of the sentence or line containing offset, end including its period"""
+        period = bisect_left(self.periods, offset)
+        line_break = bisect_left(self.line_breaks, offset)
+        start = max(self.periods[period - 1] + 1 if period else 0,
+                    self.line_breaks[line_break - 1] + 1 if line_break else 0)
+        end = self.text_length
+        if period < len(self.periods):
+            end = min(end, self.periods[period] + 1)
+        if line_break < len(self.line_breaks):
+            end = min(end, self.line_breaks[line_break])
+        return start, end
+
+# Every pattern the extractors match through KeywordHits, with its regex flags
+KEYWORD_PATTERNS = (
+    [(pattern, re.IGNORECASE) for pattern in
+        FONUM_PATTERNS + TITLE_PATTERNS + AGENCY_PATTERNS + DESC_HEADINGS] +
+    [(pattern, re.IGNORECASE) for pattern in
+        ELIGIBLE_PATTERNS + INELIGIBLE_PATTERNS + AMOUNT_PATTERNS +
+        [COST_SHARING_NO_PATTERN, COST_SHARING_YES_PATTERN] +
+        SCALE_PATTERNS + DOC_PATTERNS + [PAGE_LIMIT_PATTERN] + FORMAT_PATTERNS +
+        DEADLINE_PATTERNS + PRIORITY_PATTERNS + GOAL_PATTERNS + COMPLIANCE_KEYWORDS +
+        [rule for rule, _ in STRATEGIC_INSIGHT_RULES] + COMPETITIVENESS_PATTERNS +
+        EMPHASIS_PATTERNS +
+        [rule for rule, _ in VOLUME_INDICATOR_RULES + DIFFERENTIATION_RULES + POSITIONING_RULES]] +
+    [(pattern, 0) for pattern in [CAPS_RUN_PATTERN] + DATE_PATTERNS]
+)
+
+KEYWORD_SCANNER = KeywordScanner(KEYWORD_PATTERNS)
+
+# ---------------------------------------------------------------------------
+# Section index
+# ---------------------------------------------------------------------------
+
+# Short lines only; long lines are body text and are skipped by the regex
+HEADING_LINE = re.compile(_RULES['heading_line'], re.MULTILINE)
+HEADING_NUMBERING = re.compile(_RULES['heading_numbering'], re.IGNORECASE)
+
+SECTION_ALIASES = {
+    alias: section
+    for section, aliases in SECTION_HEADINGS.items()
+    for alias in aliases
+}
+
+class DocumentSections:
+    """
+    Heading index for one document, built in a single pass over its lines.
+    
+    Headings are lines that either match a known section alias (any case) or
+    are short all-caps lines. Each heading spans up to the next heading. A
+    canonical section spans from its first heading to the next heading that
+    belongs to a different canonical section, so uncategorized headings such
+    as merit criteria titles stay inside the section that contains them.
+    """
+    
+    def __init__(self, text: str, heading_lines: Optional[List[Tuple[int, str, Optional[str]]]] = None):
+        self.text_length = len(text)
+        self.headings: List[Dict[str, Any]] = []
+        
+        for start, line, section in self.heading_lines(text) if heading_lines is None else heading_lines:
+            if self.headings:
+                self.headings[-1]['end'] = start
+            self.headings.append({
+                'title': line,
+                'section': section,
+                'start': start,
+                'end': self.text_length
+            })
+        
+        # First occurrence of each canonical section wins
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        current = None
+        open_section = None
+        for heading in self.headings:
+            section = heading['section']
+            if section is None or section == current:
+                continue
+            if open_section is not None:
+                self.sections[open_section] = (self.sections[open_section][0], heading['start'])
+                open_section = None
+            current = section
+            if section not in self.sections:
+                self.sections[section] = (heading['start'], self.text_length)
+                open_section = section
+    
+    @classmethod
+    def heading_lines(cls, text) -> List[Tuple[int, str, Optional[str]]]:
+        """(offset, title, canonical section or None) of every heading line in text"""
+        
+        headings = []
+        for match in _compiled_for(HEADING_LINE, text).finditer(text):
+            line = _decode(match.group(1)).rstrip()
+            if '....' in line:  # Table of contents entry
+                continue
+            
+            section = cls._canonical_section(line)
+            if section is None and not cls._is_caps_heading(line):
+                continue
+            headings.append((match.start(), line, section))
+        return headings
+    
+    @staticmethod
+    def _canonical_section(line: str) -> Optional[str]:
+        if not line[0].isalpha() or HEADING_NUMBERING.match(line):
+            line = HEADING_NUMBERING.sub('', line)
+        return SECTION_ALIASES.get(' '.join(line.rstrip(':').lower().split()))
+    
+    @staticmethod
+    def _is_caps_heading(line: str) -> bool:
+        if not line.isupper():
+            return False
+        letters = sum(1 for char in line if char.isalpha())
+        return letters >= 4 and letters >= 0.6 * len(line.replace(' ', ''))
+    
+    def span(self, section: str) -> Tuple[int, int]:
+        """Return (start, end) of a canonical section, or an empty span when absent"""
+        return self.sections.get(section, (0, 0))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'headings': self.headings,
+            'sections': {
+                section: {'start': start, 'end': end}
+                for section, (start, end) in self.sections.items()
+            }
+        }
+
+NON_WHITESPACE = re.compile(r'\S')
+LETTER = re.compile(r'[A-Z]', re.IGNORECASE)
+
+# Characters (or bytes) counted per slice, bounding the memory word counting needs
+COUNT_CHUNK_SIZE = 1 << 20
+
+def count_words_and_chars(text) -> Tuple[int, int]:
+    """
+    len(text.split()) and len(text) without building the word list. A bytes
+    buffer is counted on its UTF-8 decoding, one chunk at a time.
+    """
+    
+    if isinstance(text, str):
+        chunks = (text[start:start + COUNT_CHUNK_SIZE] for start in range(0, len(text), COUNT_CHUNK_SIZE))
+    else:
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        chunks = (decoder.decode(text[start:start + COUNT_CHUNK_SIZE], start + COUNT_CHUNK_SIZE >= len(text))
+                  for start in range(0, len(text), COUNT_CHUNK_SIZE))
+    
+    words = chars = 0
+    in_word = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        words += len(chunk.split())
+        if in_word and not chunk[0].isspace():
+            words -= 1  # A word split across the chunk boundary
+        in_word = not chunk[-1].isspace()
+        chars += len(chunk)
+    return words, chars
+
+# ---------------------------------------------------------------------------
+# Parallel scan
+# ---------------------------------------------------------------------------
+
+# Documents shorter than this are scanned serially even when workers are
+# requested; below it process start-up and copying cost more than they save
+PARALLEL_SCAN_MIN_CHARS = 8 << 20
+
+# Scanner of a parallel_scan pool process, set by its initializer
+_WORKER_SCANNER: Optional[KeywordScanner] = None
+
+def _init_scan_worker(scanner: KeywordScanner):
+    global _WORKER_SCANNER
+    _WORKER_SCANNER = scanner
+
+def _scan_chunk(chunk: str, base: int, limit: int) -> Tuple[List[Any], int, int, List[Tuple[int, str, Optional[str]]]]:
+    """Anchor offsets, word and character counts and heading lines of chunk[:limit] (runs in pool workers)"""
+    
+    offsets = [array('q') for _ in _WORKER_SCANNER.anchors]
+    _WORKER_SCANNER._scan_folded(_fold_case(chunk), base, limit, offsets)
+    body = chunk[:limit]
+    words, chars = count_words_and_chars(body)
+    headings = [(base + start, line, section) for start, line, section in DocumentSections.heading_lines(body)]
+    return offsets, words, chars, headings
+
+def line_chunks(text: str, parts: int) -> List[Tuple[int, int]]:
+    """Split text into at most parts (start, end) ranges of similar size, each cut just after a line break"""
+    
+    bounds = []
+    start = 0
+    for part in range(1, parts):
+        target = len(text) * part // parts
+        if target <= start:
+            continue
+        end = text.rfind("\n", start, target) + 1 or text.find("\n", target) + 1
+        if end <= start or end >= len(text):
+            break
+        bounds.append((start, end))
+        start = end
+    bounds.append((start, len(text)))
+    return bounds
+
+def parallel_scan(scanner: KeywordScanner, text: str, workers: int) -> 'KeywordHits':
+    """
+    KeywordScanner.scan split across a process pool, with the same result.
+    
+    The text is cut at line breaks into one chunk per worker. Each worker
+    scans its chunk plus the longest anchor's length beyond it, keeping the
+    anchors that start inside, and also counts its words and finds its
+    heading lines; no word or line crosses a cut. The chunks' results are
+    concatenated in text order, so the hit table, word count and section
+    index equal the serial ones, and the extractors then run over them as usual.
+    """
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    overlap = max(map(len, scanner.anchors), default=1) - 1
+    bounds = line_chunks(text, workers)
+    offsets = [array('q') for _ in scanner.anchors]
+    words = chars = 0
+    headings = []
+    with ProcessPoolExecutor(max_workers=len(bounds), initializer=_init_scan_worker,
+                             initargs=(scanner,)) as executor:
+        futures = [executor.submit(_scan_chunk, text[start:end + overlap], start, end - start)
+                   for start, end in bounds]
+        for future in futures:
+            chunk_offsets, chunk_words, chunk_chars, chunk_headings = future.result()
+            for merged, found in zip(offsets, chunk_offsets):
+                merged.extend(found)
+            words += chunk_words
+            chars += chunk_chars
+            headings.extend(chunk_headings)
+    return KeywordHits(scanner, text, offsets, (words, chars), headings)
+
+# ---------------------------------------------------------------------------
+# Document fingerprint
+# ---------------------------------------------------------------------------
+
+# Documents are compared as sets of shingles, runs of this many consecutive words
+FINGERPRINT_SHINGLE_WORDS = 5
+
+# MinHash values per signature and the LSH bands they are grouped into. With
+# 16 bands of 4 values, documents whose shingle sets have a Jaccard similarity
+# of 0.8 share a band with probability 0.9998, at 0.5 with 0.64, at 0.3 with 0.12
+FINGERPRINT_BINS = 64
+FINGERPRINT_BANDS = 16
+
+# Shingle hashes are the CRC-32 of their words' little-endian CRC-32s, so they are
+# the same on every platform and interpreter; the top bits pick the bin
+_FINGERPRINT_BIN_SHIFT = 32 - (FINGERPRINT_BINS.bit_length() - 1)
+_FINGERPRINT_EMPTY = 1 << 32
+_FINGERPRINT_WORD_BYTES = 4
+
+# Bumped whenever the same text gets a different fingerprint
+FINGERPRINT_VERSION = 2
+
+def document_fingerprint(text) -> Optional[str]:
+    """
+    MinHash signature of the text's shingles, as FINGERPRINT_BINS 8-digit hex
+    values, or None for a text without words (an image-only PDF, a blank
+    upload), which has nothing to compare.
+    
+    Words are the lowercased, whitespace-separated tokens of the UTF-8 text,
+    and every FINGERPRINT_SHINGLE_WORDS consecutive words (the whole text when
+    it has fewer) form a shingle. Each shingle is hashed once and falls into
+    the bin its hash's top bits select; every bin keeps its smallest hash
+    (one-permutation MinHash) and an empty bin borrows the next non-empty
+    one's. The share of bins on which two signatures agree estimates the
+    Jaccard similarity of the documents' shingle sets (see
+    fingerprint_similarity). The text is read one chunk at a time; a bytes
+    buffer is lowercased as ASCII.
+    """
+    
+    width = FINGERPRINT_SHINGLE_WORDS
+    step = _FINGERPRINT_WORD_BYTES
+    span = width * step
+    shift = _FINGERPRINT_BIN_SHIFT
+    minimums = [_FINGERPRINT_EMPTY] * FINGERPRINT_BINS
+    previous: List[int] = []  # Ids of the last words, which start the next chunk's first shingles
+    partial = b''  # A word the previous chunk ended inside
+    shingled = False
+    for start in range(0, len(text), COUNT_CHUNK_SIZE):
+        chunk = text[start:start + COUNT_CHUNK_SIZE].lower()
+        chunk = partial + (chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        words = chunk.split()
+        partial = words.pop() if words and not chunk[-1:].isspace() else b''
+        word_ids = previous + list(map(zlib.crc32, words))
+        previous = word_ids[-(width - 1):]
+        packed = struct.pack(f'<{len(word_ids)}I', *word_ids)
+        for position in range(0, len(packed) - span + step, step):
+            shingle_hash = zlib.crc32(packed[position:position + span])
+            bin_number = shingle_hash >> shift
+            if shingle_hash < minimums[bin_number]:
+                minimums[bin_number] = shingle_hash
+                shingled = True
+    
+    # The last word's shingle, or the whole text when it is shorter than one
+    word_ids = previous + ([zlib.crc32(partial)] if partial else [])
+    if partial and len(word_ids) == width or not shingled and word_ids:
+        shingle_hash = zlib.crc32(struct.pack(f'<{len(word_ids)}I', *word_ids))
+        bin_number = shingle_hash >> shift
+        minimums[bin_number] = min(minimums[bin_number], shingle_hash)
+    
+    filled = [bin_number for bin_number, value in enumerate(minimums) if value != _FINGERPRINT_EMPTY]
+    if not filled:
+        return None
+    values = []
+    for bin_number, value in enumerate(minimums):
+        if value == _FINGERPRINT_EMPTY:
+            # Next non-empty bin, wrapping around
+            value = minimums[filled[bisect_left(filled, bin_number) % len(filled)]]
+        values.append(value)
+    return ''.join(f'{value:08x}' for value in values)
+
+def fingerprint_similarity(first: str, second: str) -> float:
+    """Estimated Jaccard similarity of two documents from their fingerprints"""
+    
+    equal = sum(first[start:start + 8] == second[start:start + 8] for start in range(0, len(first), 8))
+    return equal / FINGERPRINT_BINS
+
+# Changes whenever the rule pack or a matching parameter kept in code changes,
+# so cached analyses produced by an older rule set are never served
+RULE_SET_FINGERPRINT = hashlib.sha256(repr((
+    RULE_PACK['digest'], CLAUSE_SUFFIX, FINGERPRINT_VERSION, FINGERPRINT_SHINGLE_WORDS, FINGERPRINT_BINS
+)).encode('utf-8')).hexdigest()[:16]
+
+# Code release, then the rule pack and rule set it ran with, e.g. 2.2+nofo.2025.11.<fingerprint>;
+# reported as analysis_metadata.analyzer_version so every result names its exact rules
+ANALYZER_RELEASE = '2.2'
+ANALYZER_VERSION = f"{ANALYZER_RELEASE}+{RULE_PACK['name']}.{RULE_PACK['version']}.{RULE_SET_FINGERPRINT}"
+
+# Formats DATE_PATTERNS matches take once commas are dropped
+DATE_FORMATS = ['%B %d %Y', '%m/%d/%Y', '%Y-%m-%d']
+
+@lru_cache(maxsize=4096)
+def normalize_date(text: str) -> Optional[str]:
+    """ISO form (YYYY-MM-DD) of a date as NOFOs write it, or None for impossible dates such as 02/30/2026"""
+    cleaned = ' '.join(text.replace(',', ' ').split())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+# ---------------------------------------------------------------------------
+# Revision tracking
+# ---------------------------------------------------------------------------
+
+# What each analysis section reads: the document section its extractor is
+# sliced to (None for the whole document) and the patterns it matches. A
+# revision can only change a section whose slice changed or whose patterns
+# match inside a changed region.
+EXTRACTOR_INPUTS = {
+    'document_info': (None, FONUM_PATTERNS + TITLE_PATTERNS + AGENCY_PATTERNS),
+    'basic_information': (None, DESC_HEADINGS),
+    'eligibility_requirements': ('ELIGIBILITY', ELIGIBLE_PATTERNS + INELIGIBLE_PATTERNS),
+    'funding_details': (None, AMOUNT_PATTERNS + [COST_SHARING_NO_PATTERN, COST_SHARING_YES_PATTERN]),
+    'evaluation_criteria': ('MERIT REVIEW', [CAPS_RUN_PATTERN] + SCALE_PATTERNS),
+    'application_requirements': ('APPLICATION', DOC_PATTERNS + [PAGE_LIMIT_PATTERN] + FORMAT_PATTERNS),
+    'deadlines_and_dates': (None, DEADLINE_PATTERNS + DATE_PATTERNS),
+    'program_priorities': ('PROGRAM DESCRIPTION', PRIORITY_PATTERNS + GOAL_PATTERNS),
+    'compliance_requirements': (None, COMPLIANCE_KEYWORDS),
+    'strategic_insights': (None, [rule for rule, _ in STRATEGIC_INSIGHT_RULES] +
+                           COMPETITIVENESS_PATTERNS + EMPHASIS_PATTERNS),
+    'competitive_analysis': (None, [rule for rule, _ in VOLUME_INDICATOR_RULES + DIFFERENTIATION_RULES +
+                                                      POSITIONING_RULES])
+}
+
+# Unchanged lines beyond the heading blocks around each edit that are rescanned
+# with it, so matches that run across a heading line are still seen
+REVISION_CONTEXT_LINES = 2
+
+# Named change types for the fields amendment tracking cares about; any other
+# field that differs is reported as 'changed'
+CHANGE_TYPES = {
+    ('document_info', 'funding_opportunity_number'): 'opportunity_number_changed',
+    ('document_info', 'program_title'): 'title_changed',
+    ('basic_information', 'program_description'): 'description_changed',
+    ('eligibility_requirements', 'eligible_applicants'): 'eligibility_changed',
+    ('eligibility_requirements', 'ineligible_applicants'): 'eligibility_changed',
+    ('funding_details', 'funding_amounts'): 'funding_amounts_changed',
+    ('funding_details', 'cost_sharing_requirement'): 'cost_sharing_changed',
+    ('evaluation_criteria', 'evaluation_criteria'): 'evaluation_criteria_changed',
+    ('application_requirements', 'required_documents'): 'required_documents_changed',
+    ('application_requirements', 'page_limits'): 'page_limits_changed',
+    ('deadlines_and_dates', 'submission_deadline'): 'deadline_moved',
+    ('deadlines_and_dates', 'important_dates'): 'dates_changed',
+    ('compliance_requirements', 'compliance_requirements'): 'compliance_changed',
+    ('strategic_insights', 'competitiveness_level'): 'competitiveness_changed'
+}
+
+AMOUNT_CHANGE_TYPES = {
+    'Award Ceiling': 'award_ceiling_changed',
+    'Award Floor': 'award_floor_changed'
+}
+
+# Bookkeeping fields that change with every revision and are not reported
+UNREPORTED_FIELDS = {'document_name', 'word_count', 'character_count', 'fingerprint'}
+
+def changed_line_ranges(old_lines: List[str], new_lines: List[str]) -> List[Tuple[int, int, int, int]]:
+    """(old_start, old_end, new_start, new_end) line ranges that differ between two versions"""
+    
+    import difflib
+    
+    # Amendments touch a few places; trim the shared head and tail before diffing
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    
+    matcher = difflib.SequenceMatcher(None, old_lines[prefix:len(old_lines) - suffix],
+                                      new_lines[prefix:len(new_lines) - suffix], autojunk=False)
+    return [
+        (prefix + i1, prefix + i2, prefix + j1, prefix + j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+    ]
+
+def revision_window(lines: List[str], changes: List[Tuple[int, int]], heading_offsets: List[int]) -> str:
+    """
+    Text of one version to rescan for its changed (start, end) line ranges:
+    every heading block a change touches, since a label such as 'Award
+    Ceiling:' matches across any number of blank lines to its amount,
+    widened by REVISION_CONTEXT_LINES. Overlapping spans are merged.
+    """
+    
+    line_starts = list(accumulate(map(len, lines), initial=0))
+    bounds = sorted({0, len(lines)} | {bisect_right(line_starts, offset) - 1 for offset in heading_offsets})
+    last_line = max(len(lines) - 1, 0)
+    spans = []
+    for start, end in changes:
+        first = bounds[bisect_right(bounds, min(start, last_line)) - 1]
+        last = bounds[min(bisect_right(bounds, min(max(start, end - 1), last_line)), len(bounds) - 1)]
+        spans.append((max(0, first - REVISION_CONTEXT_LINES), last + REVISION_CONTEXT_LINES))
+    
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return ''.join(''.join(lines[start:end]) + '\n' for start, end in merged)
+
+def _amounts_by_label(analysis: Dict[str, Any]) -> Dict[str, str]:
+    """First value of each 'Label: $amount' entry in an analysis' funding amounts"""
+    
+    amounts = {}
+    for amount in (analysis.get('funding_details') or {}).get('funding_amounts', []):
+        label, _, value = amount.partition(': ')
+        amounts.setdefault(label, value)
+    return amounts
+
+def compare_analyses(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Field-level differences between two analyses of the same opportunity"""
+    
+    changes = []
+    for section in EXTRACTOR_INPUTS:
+        old_fields = previous.get(section) or {}
+        new_fields = current.get(section) or {}
+        for field in new_fields:
+            if field in UNREPORTED_FIELDS:
+                continue
+            old_value = old_fields.get(field)
+            new_value = new_fields[field]
+            if old_value == new_value:
+                continue
+            
+            change = {'type': CHANGE_TYPES.get((section, field), 'changed'), 'section': section, 'field': field}
+            if isinstance(new_value, list) and isinstance(old_value, list):
+                old_items = {json.dumps(item, sort_keys=True): item for item in old_value}
+                new_items = {json.dumps(item, sort_keys=True): item for item in new_value}
+                if old_items.keys() == new_items.keys():
+                    continue  # Same items, different order
+                change['added'] = [item for key, item in new_items.items() if key not in old_items]
+                change['removed'] = [item for key, item in old_items.items() if key not in new_items]
+            else:
+                change['from'] = old_value
+                change['to'] = new_value
+            changes.append(change)
+    
+    # Call out the headline award amounts (first stated value of each) on their own
+    old_amounts = _amounts_by_label(previous)
+    new_amounts = _amounts_by_label(current)
+    for label, change_type in AMOUNT_CHANGE_TYPES.items():
+        if old_amounts.get(label) != new_amounts.get(label):
+            changes.append({
+                'type': change_type,
+                'section': 'funding_details',
+                'field': label,
+                'from': old_amounts.get(label),
+                'to': new_amounts.get(label)
+            })
+    
+    return changes
+
+# ---------------------------------------------------------------------------
+# Selective analysis
+# ---------------------------------------------------------------------------
+
+# Every section an analysis can contain, in output order (plus analysis_metadata)
+ANALYSIS_SECTIONS = list(EXTRACTOR_INPUTS) + ['document_sections']
+
+# Scanners for section subsets, built on first use
+_SECTION_SCANNERS: Dict[Tuple[frozenset, bool], KeywordScanner] = {}
+
+def select_sections(sections: Optional[List[str]] = None) -> List[str]:
+    """Validate requested section names and return them in output order (all of them for None)"""
+    
+    if sections is None:
+        return list(ANALYSIS_SECTIONS)
+    unknown = sorted(set(sections) - set(ANALYSIS_SECTIONS))
+    if unknown:
+        raise ValueError(f"Unknown analysis sections: {', '.join(unknown)}")
+    return [section for section in ANALYSIS_SECTIONS if section in sections]
+
+def keyword_scanner_for(sections: List[str], binary: bool = False) -> KeywordScanner:
+    """Scanner registering only the patterns the given sections' extractors match"""
+    
+    key = (frozenset(section for section in sections if section in EXTRACTOR_INPUTS), binary)
+    if key == (frozenset(EXTRACTOR_INPUTS), False):
+        return KEYWORD_SCANNER
+    if key not in _SECTION_SCANNERS:
+        patterns = {pattern for section in key[0] for pattern in EXTRACTOR_INPUTS[section][1]}
+        _SECTION_SCANNERS[key] = KeywordScanner(
+            [(pattern, flags) for pattern, flags in KEYWORD_PATTERNS if pattern in patterns], binary)
+    return _SECTION_SCANNERS[key]
+
+class LazyAnalysis(Mapping):
+    """
+    Analysis whose sections are computed on first access and then kept.
+    
+    The keyword scan, limited to the patterns of the selected sections, and
+    the section index are built once, by the first section that needs them,
+    and shared by every later one. Only the selected sections can be read;
+    'analysis_metadata' describes the sections computed so far.
+    """
+    
+    def __init__(self, analyzer: 'EnhancedGrantAnalyzer', document_text: str,
+                 document_name: str = "Grant Document", sections: Optional[List[str]] = None):
+        self.analyzer = analyzer
+        self.document_text = document_text
+        self.document_name = document_name
+        self.sections = select_sections(sections)
+        self.timestamp = datetime.now().isoformat()
+        self.timed_out: List[str] = []
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Any] = {}
+        self._hits: Optional[KeywordHits] = None
+        self._index: Optional[DocumentSections] = None
+    
+    def __getitem__(self, section: str) -> Any:
+        self._bind()
+        if section == 'analysis_metadata':
+            partial = len(self.sections) < len(ANALYSIS_SECTIONS)
+            return self.analyzer._metadata(self.document_name, self.sections if partial else None)
+        if section not in self.sections:
+            raise KeyError(section)
+        
+        if section not in self._results:
+            if section == 'document_sections':
+                self._results[section] = self._document_sections().to_dict()
+            else:
+                index = self._document_sections() if EXTRACTOR_INPUTS[section][0] is not None else None
+                extractor, *args = self.analyzer._extractors(self._keyword_hits(), index, self.document_name)[section]
+                self._results[section] = self.analyzer._run_extractor(section, extractor, *args)
+                if section == 'document_info':
+                    self._results[section] = self.analyzer._fingerprinted(self._results[section], self.document_text)
+        return self._results[section]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sections + ['analysis_metadata'])
+    
+    def __len__(self) -> int:
+        return len(self.sections) + 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Compute every selected section and return the plain analysis dict"""
+        
+        # Shared inputs first, so stage timings keep their usual order
+        self._bind()
+        if any(section in EXTRACTOR_INPUTS for section in self.sections):
+            self._keyword_hits()
+        if any(section == 'document_sections' or EXTRACTOR_INPUTS[section][0] is not None
+               for section in self.sections):
+            self._document_sections()
+        return {section: self[section] for section in self}
+    
+    def _bind(self):
+        """Point the analyzer's per-analysis state at this analysis"""
+        self.analyzer.analysis_timestamp = self.timestamp
+        self.analyzer._timed_out = self.timed_out
+        self.analyzer._timings = self.timings
+    
+    def _keyword_hits(self) -> KeywordHits:
+        if self._hits is None:
+            started = time.perf_counter()
+            binary = not isinstance(self.document_text, str)
+            self._hits = keyword_scanner_for(self.sections, binary).scan(self.document_text,
+                                                                         self.analyzer.scan_workers)
+            self.analyzer._record_stage('keyword_scan', started, len(self.document_text),
+                                        sum(map(len, self._hits.offsets)))
+        return self._hits
+    
+    def _document_sections(self) -> DocumentSections:
+        if self._index is None:
+            started = time.perf_counter()
+            self._index = DocumentSections(self.document_text,
+                                           self._hits.headings if self._hits is not None else None)
+            self.analyzer._record_stage('document_sections', started, len(self.document_text),
+                                        len(self._index.headings))
+        return self._index
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+def _result_items(value) -> int:
+    """Number of leaf values in an extractor result (list entries count individually)"""
+    
+    if isinstance(value, dict):
+        return sum(_result_items(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_result_items(item) for item in value) if value and isinstance(value[0], dict) else len(value)
+    return 1
+
+class AnalyzerMetrics:
+    """Cumulative stage timings for this process, rendered in the Prometheus text format"""
+    
+    def __init__(self):
+        self.documents = 0
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_regex_calls: Dict[str, int] = {}
+        self.extractions: Dict[str, int] = {}
+        self.extraction_seconds: Dict[str, float] = {}
+        self.pages = 0
+        self.page_seconds = 0.0
+    
+    def observe_analysis(self, timings: Dict[str, Any]):
+        """Add one analysis' analysis_metadata.timings"""
+        
+        self.documents += 1
+        for stage, timing in timings['stages'].items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + timing['seconds']
+            self.stage_regex_calls[stage] = self.stage_regex_calls.get(stage, 0) + timing.get('regex_calls', 0)
+    
+    def observe_extraction(self, timings: Dict[str, Any]):
+        """Add one process_file_content timings record"""
+        
+        file_type = timings['file_type']
+        self.extractions[file_type] = self.extractions.get(file_type, 0) + 1
+        self.extraction_seconds[file_type] = self.extraction_seconds.get(file_type, 0.0) + timings['seconds']
+        for page in timings.get('pages', []):
+            self.pages += 1
+            self.page_seconds += page['seconds']
+    
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        
+        lines = []
+        
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Any]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, value in samples:
+                lines.append(f"{name}{suffix} {value}")
+        
+        metric('grant_analyzer_documents_total', 'counter', "Documents analyzed with timings enabled.",
+               [('', self.documents)])
+        metric('grant_analyzer_stage_seconds_total', 'counter', "Wall time spent in each analysis stage.",
+               [(f'{{stage="{stage}"}}', round(seconds, 6)) for stage, seconds in self.stage_seconds.items()])
+        metric('grant_analyzer_stage_regex_calls_total', 'counter', "Regex executions in each analysis stage.",
+               [(f'{{stage="{stage}"}}', calls) for stage, calls in self.stage_regex_calls.items()])
+        metric('grant_analyzer_extraction_seconds', 'summary', "Text extraction time per file type.",
+               [sample for file_type in self.extractions for sample in (
+                   (f'_sum{{file_type="{file_type}"}}', round(self.extraction_seconds[file_type], 6)),
+                   (f'_count{{file_type="{file_type}"}}', self.extractions[file_type]))])
+        metric('grant_analyzer_pdf_page_seconds', 'summary', "PDF text extraction time per page.",
+               [('_sum', round(self.page_seconds, 6)), ('_count', self.pages)])
+        return "\n".join(lines) + "\n"
+
+METRICS = AnalyzerMetrics()
+
 class EnhancedGrantAnalyzer:
     """
     Comprehensive grant document analyzer that extracts key information
     from grant announcements, RFPs, and funding opportunity notices
     """
     
-    def __init__(self):
-        self.analysis_timestamp = datetime.now().isoformat()
+    def __init__(self, extractor_budget: Optional[float] = None, instrument: Optional[bool] = None,
+                 scan_workers: Optional[int] = None, fingerprint: Optional[bool] = None):
+        self.analysis_timestamp = datetime.now().isoformat()
+        # Wall-clock seconds each extractor may spend before returning partial results
+        if extractor_budget is None:
+            extractor_budget = float(os.environ.get('GRANT_ANALYZER_EXTRACTOR_BUDGET') or 0) or None
+        self.extractor_budget = extractor_budget
+        # Opt-in per-stage timings reported in analysis_metadata.timings
+        if instrument is None:
+            instrument = os.environ.get('GRANT_ANALYZER_TIMINGS', '').lower() in ('1', 'true', 'yes')
+        self.instrument = instrument
+        # Processes the keyword scan of very large documents is split across (see parallel_scan)
+        if scan_workers is None:
+            scan_workers = int(os.environ.get('GRANT_ANALYZER_SCAN_WORKERS') or 1)
+        self.scan_workers = max(1, scan_workers)
+        # document_info.fingerprint, by default only when a duplicate index will store it
+        if fingerprint is None:
+            fingerprint = bool(os.environ.get('GRANT_ANALYZER_DUPLICATE_INDEX_PATH'))
+        self.fingerprint = fingerprint
+        self._deadline = None
+        self._budget_exhausted = False
+        self._timed_out: List[str] = []
+        self._timings: Dict[str, Dict[str, Any]] = {}
+    
+    def analyze_grant_document(self, document_text: str, document_name: str = "Grant Document",
+                               sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Perform comprehensive analysis of grant document
+        
+        sections restricts the result to those ANALYSIS_SECTIONS; only their
+        extractors run and the keyword scan only looks for their patterns.
+        document_text may also be a bytes buffer (see analyze_mapped_text).
+        """
+        # Refresh per call so long-lived (--serve) analyzers stamp each result
+        self.analysis_timestamp = datetime.now().isoformat()
+        sections = select_sections(sections)
+        
+        try:
+            # Every selected section, sharing one keyword pass and section index
+            analysis = self.lazy_analysis(document_text, document_name, sections).to_dict()
+            self._observe(analysis)
+            return analysis
+        
+        except Exception as e:
+            return {
+                'error': f"Analysis failed: {str(e)}",
+                'document_name': document_name,
+                'timestamp': self.analysis_timestamp
+            }
+    
+    def lazy_analysis(self, document_text: str, document_name: str = "Grant Document",
+                      sections: Optional[List[str]] = None) -> LazyAnalysis:
+        """Analysis whose sections are only computed when first read"""
+        return LazyAnalysis(self, document_text, document_name, sections)
+    
+    def reanalyze_grant_document(self, previous_text: str, previous_analysis: Dict[str, Any],
+                                 document_text: str, document_name: str = "Grant Document") -> Dict[str, Any]:
+        """
+        Incrementally analyze a revised document (e.g. a NOFO amendment).
+        
+        The two versions are diffed line by line. A section-scoped extractor is
+        re-run only when its document section's text changed. A document-wide
+        one is re-run only when one of its patterns matches, in either version,
+        within the heading blocks around a changed region (see revision_window).
+        All other sections are reused from previous_analysis; document_info only
+        has its counts updated. Matches are assumed not to run from one heading
+        block into another beyond the context lines. Returns {'analysis', 'change_report'}; the report lists
+        the changed regions, which sections were re-run and the field-level
+        changes (deadline moved, award ceiling changed, ...).
+        """
+        
+        self.analysis_timestamp = datetime.now().isoformat()
+        self._timed_out = []
+        self._timings = {}
+        
+        if 'error' in previous_analysis or any(section not in previous_analysis for section in EXTRACTOR_INPUTS):
+            analysis = self.analyze_grant_document(document_text, document_name)
+            return {'analysis': analysis, 'change_report': self._change_report(
+                previous_analysis, analysis, [], list(EXTRACTOR_INPUTS), previous_text, document_text)}
+        
+        try:
+            started = time.perf_counter()
+            old_lines = previous_text.splitlines(True)
+            new_lines = document_text.splitlines(True)
+            ranges = changed_line_ranges(old_lines, new_lines)
+            self._record_stage('revision_diff', started, len(document_text), len(ranges))
+            
+            started = time.perf_counter()
+            sections = DocumentSections(document_text)
+            self._record_stage('document_sections', started, len(document_text), len(sections.headings))
+            old_index = previous_analysis.get('document_sections') or {}
+            if 'sections' not in old_index or 'headings' not in old_index:
+                old_index = DocumentSections(previous_text).to_dict()
+            old_spans = old_index['sections']
+            
+            # Scan only the heading blocks around the edits, in both versions
+            started = time.perf_counter()
+            old_window = revision_window(old_lines, [(old_start, old_end) for old_start, old_end, _, _ in ranges],
+                                         [heading['start'] for heading in old_index['headings']])
+            new_window = revision_window(new_lines, [(new_start, new_end) for _, _, new_start, new_end in ranges],
+                                         [heading['start'] for heading in sections.headings])
+            old_hits = KEYWORD_SCANNER.scan(old_window)
+            new_hits = KEYWORD_SCANNER.scan(new_window)
+            self._record_stage('revision_window', started, len(old_window) + len(new_window), len(ranges))
+            
+            stale = set(previous_analysis.get('analysis_metadata', {}).get('timed_out', []))
+            rerun = []
+            for section, (document_section, patterns) in EXTRACTOR_INPUTS.items():
+                if not ranges and section not in stale:
+                    continue
+                if document_section is not None:
+                    old_span = old_spans.get(document_section, {'start': 0, 'end': 0})
+                    start, end = sections.span(document_section)
+                    # One extra leading character for lookbehinds such as (?<!\d)
+                    affected = (previous_text[max(0, old_span['start'] - 1):old_span['end']] !=
+                                document_text[max(0, start - 1):end])
+                else:
+                    affected = any(old_hits.contains(pattern) or new_hits.contains(pattern) for pattern in patterns)
+                if affected or section in stale:
+                    rerun.append(section)
+            
+            hits = None
+            if rerun:
+                started = time.perf_counter()
+                hits = KEYWORD_SCANNER.scan(document_text)
+                self._record_stage('keyword_scan', started, len(document_text), sum(map(len, hits.offsets)))
+            extractors = self._extractors(hits, sections, document_name)
+            analysis = {}
+            for section, (extractor, *args) in extractors.items():
+                if section in rerun:
+                    analysis[section] = self._run_extractor(section, extractor, *args)
+                else:
+                    analysis[section] = previous_analysis[section]
+            
+            if 'document_info' not in rerun:
+                # Lines end in whitespace, so word counts add up line by line
+                word_count = previous_analysis['document_info']['word_count']
+                for old_start, old_end, new_start, new_end in ranges:
+                    word_count -= sum(len(line.split()) for line in old_lines[old_start:old_end])
+                    word_count += sum(len(line.split()) for line in new_lines[new_start:new_end])
+                analysis['document_info'] = dict(previous_analysis['document_info'],
+                                                 document_name=document_name,
+                                                 word_count=word_count,
+                                                 character_count=len(document_text))
+            if ('document_info' in rerun or ranges or
+                    self.fingerprint != ('fingerprint' in analysis['document_info'])):
+                analysis['document_info'] = self._fingerprinted(analysis['document_info'], document_text)
+            
+            analysis['document_sections'] = sections.to_dict()
+            analysis['analysis_metadata'] = self._metadata(document_name)
+            self._observe(analysis)
+            
+            return {'analysis': analysis, 'change_report': self._change_report(
+                previous_analysis, analysis, ranges, rerun, previous_text, document_text, old_lines, new_lines)}
+        
+        except Exception as e:
+            return {
+                'error': f"Analysis failed: {str(e)}",
+                'document_name': document_name,
+                'timestamp': self.analysis_timestamp
+            }
+    
+    def _change_report(self, previous_analysis: Dict[str, Any], analysis: Dict[str, Any],
+                       ranges: List[Tuple[int, int, int, int]], rerun: List[str], previous_text: str,
+                       document_text: str, old_lines: Optional[List[str]] = None,
+                       new_lines: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Describe what changed between two analyzed versions of a document"""
+        
+        changed_regions = []
+        if ranges:
+            # Character offsets of every line start, so line ranges map to text spans
+            old_offsets = [0]
+            for line in old_lines:
+                old_offsets.append(old_offsets[-1] + len(line))
+            new_offsets = [0]
+            for line in new_lines:
+                new_offsets.append(new_offsets[-1] + len(line))
+            changed_regions = [
+                {
+                    'previous': {'start': old_offsets[old_start], 'end': old_offsets[old_end]},
+                    'current': {'start': new_offsets[new_start], 'end': new_offsets[new_end]}
+                }
+                for old_start, old_end, new_start, new_end in ranges
+            ]
+        
+        return {
+            'changed_regions': changed_regions,
+            'rerun_sections': rerun,
+            'reused_sections': [section for section in EXTRACTOR_INPUTS if section not in rerun],
+            'changes': compare_analyses(previous_analysis, analysis) if 'error' not in analysis else []
+        }
+    
+    def _extractors(self, hits: Optional[KeywordHits], sections: DocumentSections, document_name: str):
+        """Extractor and arguments for every analysis section, in output order"""
+        
+        return {
+            'document_info': (self._extract_document_info, hits, document_name),
+            'basic_information': (self._extract_basic_information, hits),
+            'eligibility_requirements': (self._extract_eligibility_requirements, hits, sections),
+            'funding_details': (self._extract_funding_details, hits),
+            'evaluation_criteria': (self._extract_evaluation_criteria, hits, sections),
+            'application_requirements': (self._extract_application_requirements, hits, sections),
+            'deadlines_and_dates': (self._extract_deadlines_and_dates, hits),
+            'program_priorities': (self._extract_program_priorities, hits, sections),
+            'compliance_requirements': (self._extract_compliance_requirements, hits),
+            'strategic_insights': (self._generate_strategic_insights, hits),
+            'competitive_analysis': (self._analyze_competitive_factors, hits)
+        }
+    
+    def _metadata(self, document_name: str, sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """analysis_metadata for the analysis in progress; sections is set for partial analyses"""
+        
+        metadata = {
+            'timestamp': self.analysis_timestamp,
+            'document_name': document_name,
+            'analyzer_version': ANALYZER_VERSION,
+            'timed_out': self._timed_out
+        }
+        if sections is not None:
+            metadata['sections'] = sections
+        if self.instrument:
+            metadata['timings'] = {
+                'total_seconds': round(sum(timing['seconds'] for timing in self._timings.values()), 6),
+                'stages': self._timings
+            }
+        return metadata
+    
+    def _observe(self, analysis: Dict[str, Any]):
+        """Add a finished analysis' timings to METRICS, once per analysis rather than per metadata read"""
+        
+        timings = analysis['analysis_metadata'].get('timings')
+        if timings is not None:
+            METRICS.observe_analysis(timings)
+    
+    def _record_stage(self, stage: str, started: float, input_chars: int, result_items: int,
+                      regex_calls: int = 0, result_bytes: Optional[int] = None):
+        """Store one stage's timing when instrumentation is on"""
+        
+        if not self.instrument:
+            return
+        timing = {
+            'seconds': round(time.perf_counter() - started, 6),
+            'regex_calls': regex_calls,
+            'input_chars': input_chars,
+            'result_items': result_items
+        }
+        if result_bytes is not None:
+            timing['result_bytes'] = result_bytes
+        self._timings[stage] = timing
+    
+    def _fingerprinted(self, document_info: Dict[str, Any], document_text) -> Dict[str, Any]:
+        """document_info with the text's fingerprint when fingerprinting is on, timed as its own stage"""
+        
+        document_info = {name: value for name, value in document_info.items() if name != 'fingerprint'}
+        if self.fingerprint:
+            started = time.perf_counter()
+            fingerprint = document_fingerprint(document_text)
+            self._record_stage('fingerprint', started, len(document_text), int(fingerprint is not None))
+            if fingerprint is not None:
+                document_info['fingerprint'] = fingerprint
+        return document_info
+    
+    def _run_extractor(self, section: str, extractor, *args):
+        """Run one extractor under the per-extractor time budget"""
+        self._deadline = time.monotonic() + self.extractor_budget if self.extractor_budget else None
+        self._budget_exhausted = False
+        hits = args[0]
+        regex_calls = hits.regex_calls if self.instrument else 0
+        started = time.perf_counter()
+        result = extractor(*args)
+        if self._budget_exhausted:
+            self._timed_out.append(section)
+        
+        if self.instrument:
+            # Section-scoped extractors only read their document section
+            document_section = EXTRACTOR_INPUTS[section][0]
+            sections = next((arg for arg in args if isinstance(arg, DocumentSections)), None)
+            if document_section is not None and sections is not None:
+                start, end = sections.span(document_section)
+                input_chars = end - start
+            else:
+                input_chars = len(hits.text)
+            self._record_stage(section, started, input_chars, _result_items(result),
+                               hits.regex_calls - regex_calls, len(json.dumps(result)))
+        return result
+    
+    def _within_budget(self, items):
+        """Yield items until the running extractor's budget is spent, skipping the rest"""
+        for item in items:
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                self._budget_exhausted = True
+                return
+            yield item
+    
+    def _first_search(self, hits: KeywordHits, patterns: List[str], start: int = 0, end: Optional[int] = None):
+        """Return the match of the first pattern in the list that matches"""
+        for pattern in self._within_budget(patterns):
+            match = hits.search(pattern, start, end)
+            if match:
+                return match
+        return None
+    
+    def _extract_document_info(self, hits: KeywordHits, document_name: str) -> Dict[str, Any]:
+        """Extract basic document information"""
+        
+        # Extract funding opportunity number
+        match = self._first_search(hits, FONUM_PATTERNS)
+        funding_opportunity_number = match.group(1) if match else None
+        
+        # Extract program title
+        match = self._first_search(hits, TITLE_PATTERNS)
+        program_title = match.group(1).strip() if match else None
+        
+        # Extract issuing agency
+        match = self._first_search(hits, AGENCY_PATTERNS)
+        issuing_agency = match.group(0).strip() if match else None
+        
+        word_count, character_count = hits.counts()
+        
+        return {
+            'funding_opportunity_number': funding_opportunity_number or "Not specified",
+            'program_title': program_title or "Not specified",
+            'issuing_agency': issuing_agency or "Not specified",
+            'document_name': document_name,
+            'word_count': word_count,
+            'character_count': character_count
+        }
+    
+    def _extract_basic_information(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Extract basic grant information"""
+        
+        # Extract program description
+        program_description = None
+        for heading in self._within_budget(DESC_HEADINGS):
+            description = self._description_after(hits, heading)
+            if description is not None:
+                program_description = description.strip()[:500]  # Limit to 500 chars
+                break
+        
+        return {
+            'program_description': program_description or "Not specified"
+        }
+    
+    def _description_after(self, hits: KeywordHits, heading: str) -> Optional[str]:
+        """
+        Return the letter-free run following the first occurrence of heading
+        that has at least DESC_MIN_LENGTH characters, capped at DESC_MAX_LENGTH.
+        Each occurrence costs at most its whitespace run plus the capped window.
+        """
+        
+        text_length = len(hits.text)
+        for match in hits.finditer(heading):
+            heading_end = match.end()
+            non_space = hits.regex_search(NON_WHITESPACE, heading_end)
+            run_start = non_space.start() if non_space else text_length
+            window_end = min(text_length, run_start + DESC_MAX_LENGTH)
+            letter = hits.regex_search(LETTER, run_start, window_end)
+            run_end = letter.start() if letter else window_end
+            
+            if run_end - run_start >= DESC_MIN_LENGTH:
+                return hits.slice(run_start, run_end)
+            if run_end - heading_end >= DESC_MIN_LENGTH:
+                # Short run, but leading whitespace makes up the minimum length
+                return hits.slice(run_end - DESC_MIN_LENGTH, run_end)
+        
+        return None
+    
+    def _extract_eligibility_requirements(self, hits: KeywordHits, sections: DocumentSections) -> Dict[str, Any]:
+        """Extract eligibility requirements"""
+        
+        # Find eligibility section
+        start, end = sections.span('ELIGIBILITY')
+        
+        # Extract eligible applicants
+        eligible_applicants = []
+        for pattern in self._within_budget(ELIGIBLE_PATTERNS):
+            if hits.contains(pattern, start, end):
+                eligible_applicants.append(pattern.replace('.*', ' ').replace('\\', ''))
+        
+        # Extract ineligible applicants
+        ineligible_applicants = []
+        for pattern in self._within_budget(INELIGIBLE_PATTERNS):
+            if hits.contains(pattern, start, end):
+                ineligible_applicants.append("Individuals and for-profit organizations")
+        
+        return {
+            'eligible_applicants': eligible_applicants[:10],  # Limit to 10
+            'ineligible_applicants': ineligible_applicants[:5],  # Limit to 5
+            'additional_requirements': []
+        }
+    
+    def _extract_funding_details(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Extract funding information"""
+        
+        # Extract funding amounts
+        funding_amounts = []
+        for pattern in self._within_budget(AMOUNT_PATTERNS):
+            for match in islice(hits.finditer(pattern), 5 - len(funding_amounts)):
+                amount_type = match.group(0).split(':')[0].strip()
+                amount_value = match.group(1)
+                funding_amounts.append(f"{amount_type}: ${amount_value}")
+        
+        # Extract cost sharing requirement
+        cost_sharing_requirement = "Not specified"
+        if hits.contains(COST_SHARING_NO_PATTERN):
+            cost_sharing_requirement = "No"
+        elif hits.contains(COST_SHARING_YES_PATTERN):
+            cost_sharing_requirement = "Yes"
+        
+        return {
+            'funding_amounts': funding_amounts[:5],  # Limit to 5
+            'cost_sharing_requirement': cost_sharing_requirement
+        }
+    
+    def _extract_evaluation_criteria(self, hits: KeywordHits, sections: DocumentSections) -> Dict[str, Any]:
+        """Extract evaluation criteria and scoring information"""
+        
+        # Find merit review section
+        start, end = sections.span('MERIT REVIEW')
+        
+        # Extract evaluation criteria from single-line runs of capitals
+        caps_runs = hits.findall(CAPS_RUN_PATTERN, start, end)
+        evaluation_criteria = []
+        for keyword in self._within_budget(CRITERIA_KEYWORDS):
+            for criteria_name in caps_runs:
+                if keyword in criteria_name and len(criteria_name) > 10:  # Filter out very short matches
+                    evaluation_criteria.append({
+                        'category': criteria_name,
+                        'weight': 'Not specified',
+                        'description': 'Extracted from merit review section'
+                    })
+        
+        return {
+            'evaluation_criteria': evaluation_criteria[:6],  # Limit to 6
+            'rating_scale': self._extract_rating_scale(hits, start, end)
+        }
+    
+    def _extract_rating_scale(self, hits: KeywordHits, start: int, end: int) -> List[str]:
+        """Extract rating scale information"""
+        
+        rating_scales = []
+        for pattern in self._within_budget(SCALE_PATTERNS):
+            if hits.contains(pattern, start, end):
+                rating_scales.append(pattern.replace('.*', ' - '))
+        
+        return rating_scales[:3]  # Limit to 3
+    
+    def _extract_application_requirements(self, hits: KeywordHits, sections: DocumentSections) -> Dict[str, Any]:
+        """Extract application requirements and documents needed"""
+        
+        # Find application section
+        start, end = sections.span('APPLICATION')
+        
+        # Extract required documents
+        required_docs = []
+        for pattern in self._within_budget(DOC_PATTERNS):
+            if hits.contains(pattern, start, end):
+                required_docs.append(pattern)
+        
+        # Extract page limits
+        page_limits = [f"{match.group(1)} pages" for match in hits.finditer(PAGE_LIMIT_PATTERN, start, end)]
+        
+        # Extract format requirements
+        format_requirements = []
+        for pattern in self._within_budget(FORMAT_PATTERNS):
+            if hits.contains(pattern, start, end):
+                format_requirements.append(pattern)
+        
+        return {
+            'required_documents': required_docs,
+            'page_limits': page_limits,
+            'format_requirements': format_requirements
+        }
+    
+    def _extract_deadlines_and_dates(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Extract important dates and deadlines"""
+        
+        # Extract submission deadline; its date is the last one in the match
+        match = self._first_search(hits, DEADLINE_PATTERNS)
+        submission_deadline = match.group(0).strip() if match else None
+        deadline_date = None
+        if submission_deadline:
+            found = [date_match.group(0) for regex in DATE_REGEXES for date_match in regex.finditer(submission_deadline)]
+            deadline_date = normalize_date(found[-1]) if found else None
+        
+        # Extract other important dates in document order, each labeled by role
+        important_dates = []
+        dates = []
+        labeled = set()
+        matches = heapq.merge(*(hits.finditer(pattern) for pattern in DATE_PATTERNS), key=lambda match: match.start())
+        for match in self._within_budget(matches):
+            text = match.group(0)
+            if text not in important_dates and len(important_dates) < 10:  # Limit to 10
+                important_dates.append(text)
+            date = normalize_date(text)
+            if date is not None and len(dates) < MAX_LABELED_DATES:
+                role = self._date_role(hits, match.start())
+                if (date, role) not in labeled:
+                    labeled.add((date, role))
+                    dates.append({'date': date, 'role': role, 'text': text})
+            if len(important_dates) >= 10 and len(dates) >= MAX_LABELED_DATES:
+                break
+        
+        # The submission deadline's date unless it was labeled something other than closing
+        closing_dates = [entry['date'] for entry in dates if entry['role'] == 'closing']
+        closing_date = deadline_date
+        if closing_dates and deadline_date not in closing_dates:
+            closing_date = closing_dates[0]
+        
+        return {
+            'submission_deadline': submission_deadline or "Not specified",
+            'important_dates': important_dates,
+            'closing_date': closing_date,
+            'dates': dates
+        }
+    
+    def _date_role(self, hits: KeywordHits, offset: int) -> str:
+        """Role of the date at offset, from the words before it in its sentence (or the line above)"""
+        
+        start, _ = hits.sentences.sentence_at(offset)
+        context = hits.slice(start, offset)
+        if not context.strip() and start > 0:
+            # A date on a line of its own takes its label from the line above
+            previous_start, _ = hits.sentences.sentence_at(start - 1)
+            context = hits.slice(previous_start, start)
+        # Semicolons separate clauses such as "Q&A due 03/20/2026; closing 04/15/2026"
+        context = context.rsplit(';', 1)[-1]
+        nearest_role, nearest_end = 'other', -1
+        for role, pattern in DATE_ROLE_PATTERNS:
+            keyword_end = max((match.end() for match in pattern.finditer(context)), default=-1)
+            if keyword_end >= 0 and role in OVERRIDING_DATE_ROLES:
+                return role
+            if keyword_end > nearest_end:
+                nearest_role, nearest_end = role, keyword_end
+        return nearest_role
+    
+    def _extract_program_priorities(self, hits: KeywordHits, sections: DocumentSections) -> Dict[str, Any]:
+        """Extract program priorities and focus areas"""
+        
+        # Find program overview/description section
+        start, end = sections.span('PROGRAM DESCRIPTION')
+        
+        # Extract priority areas (2 per keyword) and program goals (3 per keyword)
+        priorities = self._ranked_clauses(hits, PRIORITY_PATTERNS, 2, start, end)
+        goals = self._ranked_clauses(hits, GOAL_PATTERNS, 3, start, end)
+        
+        return {
+            'program_priorities': priorities[:8],  # Limit to 8
+            'program_goals': goals[:8]
+        }
+    
+    def _ranked_clauses(self, hits: KeywordHits, patterns: List[str], per_pattern: int,
+                        start: int = 0, end: Optional[int] = None) -> List[str]:
+        """
+        The first per_pattern clauses of each keyword pattern, in document
+        order, keeping one clause per sentence (the one starting at the first
+        keyword) and dropping repeated text.
+        """
+        
+        starts = {}
+        for pattern in self._within_budget(patterns):
+            for clause_start, clause_end in hits.clauses(pattern, start, end, per_pattern):
+                # Clauses ending together share a sentence; the earliest start contains the rest
+                starts[clause_end] = min(clause_start, starts.get(clause_end, clause_start))
+        
+        clauses = []
+        for clause_end, clause_start in sorted(starts.items(), key=lambda item: item[1]):
+            clause = hits.slice(clause_start, clause_end).strip()
+            if clause not in clauses:
+                clauses.append(clause)
+        return clauses
+    
+    def _extract_compliance_requirements(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Extract compliance and regulatory requirements"""
+        
+        text = hits.text
+        compliance_requirements = []
+        for keyword in self._within_budget(COMPLIANCE_KEYWORDS):
+            keyword_match = hits.search(keyword)
+            if keyword_match:
+                # The leftmost context match starts up to 100 characters before
+                # the first occurrence, but never before the start of its line
+                position = keyword_match.start()
+                window_start = max(0, position - 100)
+                line_start = text.rfind(hits.newline, window_start, position) + 1
+                match = hits.regex_match(COMPLIANCE_CONTEXT_PATTERNS[keyword], max(window_start, line_start))
+                if match:
+                    compliance_requirements.append({
+                        'requirement': keyword,
+                        'context': match.group(0).strip()
+                    })
+        
+        return {
+            'compliance_requirements': compliance_requirements
+        }
+    
+    def _generate_strategic_insights(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Generate strategic insights for competitive advantage"""
+        
+        # Analyze competitive factors
+        insights = [insight for pattern, insight in self._within_budget(STRATEGIC_INSIGHT_RULES) if hits.contains(pattern)]
+        
+        # Analyze funding competitiveness
+        competitiveness_score = sum(1 for pattern in self._within_budget(COMPETITIVENESS_PATTERNS) if hits.contains(pattern))
+        
+        return {
+            'strategic_insights': insights,
+            'competitiveness_level': competitiveness_level(competitiveness_score),
+            'key_success_factors': self._identify_success_factors(hits)
+        }
+    
+    def _identify_success_factors(self, hits: KeywordHits) -> List[str]:
+        """Identify key success factors from the grant text"""
+        
+        # Look for emphasized terms and phrases
+        success_factors = self._ranked_clauses(hits, EMPHASIS_PATTERNS, 2)
+        
+        return success_factors[:6]  # Limit to 6
+    
+    def _analyze_competitive_factors(self, hits: KeywordHits) -> Dict[str, Any]:
+        """Analyze competitive factors and positioning"""
+        
+        # Analyze application volume indicators
+        volume_indicators = [indicator for pattern, indicator in self._within_budget(VOLUME_INDICATOR_RULES) if hits.contains(pattern)]
+        
+        # Analyze differentiation opportunities
+        differentiation_ops = [opportunity for pattern, opportunity in self._within_budget(DIFFERENTIATION_RULES) if hits.contains(pattern)]
+        
+        return {
+            'competitive_volume_indicators': volume_indicators,
+            'differentiation_opportunities': differentiation_ops,
+            'recommended_positioning': self._generate_positioning_recommendations(hits)
+        }
+    
+    def _generate_positioning_recommendations(self, hits: KeywordHits) -> List[str]:
+        """Generate positioning recommendations based on grant analysis"""
+        
+        recommendations = [recommendation for pattern, recommendation in self._within_budget(POSITIONING_RULES) if hits.contains(pattern)]
+        
+        return recommendations[:4]  # Limit to 4
+
+# Page ranges shorter than this are extracted serially even when workers are
+# requested; below it process start-up costs more than it saves.
+PARALLEL_PDF_MIN_PAGES = 32
+
+def _extract_pdf_range(file_path: str, first_page: int, last_page: int) -> List[Tuple[str, float]]:
+    """Extract an inclusive page range from its own reader (runs in pool workers)"""
+    
+    import PyPDF2
+    
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [(text, seconds) for _, text, seconds in _iter_reader_pages(pdf_reader, first_page, last_page)]
+
+def _iter_reader_pages(pdf_reader, first_page: int, last_page: int) -> Iterator[Tuple[int, str, float]]:
+    """Decode pages one at a time, dropping the objects resolved for each page once it is done"""
+    
+    for page_number in range(first_page, last_page + 1):
+        started = time.perf_counter()
+        text = pdf_reader.pages[page_number - 1].extract_text()
+        pdf_reader.resolved_objects.clear()
+        yield page_number, text, time.perf_counter() - started
+
+def _iter_parallel_pages(file_path: str, first_page: int, last_page: int,
+                         workers: int) -> Iterator[Tuple[int, str, float]]:
+    """Split the range into one contiguous block per worker and yield the pages back in order"""
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    page_count = last_page - first_page + 1
+    block = -(-page_count // workers)
+    ranges = [(first, min(first + block - 1, last_page)) for first in range(first_page, last_page + 1, block)]
+    
+    executor = ProcessPoolExecutor(max_workers=len(ranges))
+    try:
+        futures = [executor.submit(_extract_pdf_range, file_path, first, last) for first, last in ranges]
+        for (first, _), future in zip(ranges, futures):
+            for offset, (text, seconds) in enumerate(future.result()):
+                yield first + offset, text, seconds
+    finally:
+        # Callers may stop early; don't wait for blocks nobody will read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_pdf_pages(file_path: str, first_page: int = 1, last_page: Optional[int] = None,
+                   max_pages: Optional[int] = None, max_bytes: Optional[int] = None,
+                   workers: int = 1, page_timings: Optional[List[Dict[str, Any]]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for each PDF page as it is decoded.
+    
+    Page numbers are 1-based and first_page/last_page are inclusive. Extraction
+    stops after max_pages pages or once max_bytes of UTF-8 text have been
+    produced; the page crossing the byte cap is cut at the cap. Objects the
+    reader resolved for a page are dropped once it has been yielded, so memory
+    stays flat however long the document is and callers can stop early.
+    
+    With workers > 1 and at least PARALLEL_PDF_MIN_PAGES pages, the range is
+    split into contiguous blocks extracted by a process pool, each worker
+    opening the file itself; pages are still yielded in page order.
+    
+    If page_timings is a list, {page, seconds, chars} is appended to it for
+    every page yielded.
+    """
+    
+    # PDF and DOCX parsers are imported on first use; text-only analysis never loads them
+    import PyPDF2
+    
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        first_page = max(first_page, 1)
+        last_page = len(pdf_reader.pages) if last_page is None else min(last_page, len(pdf_reader.pages))
+        if max_pages is not None:
+            last_page = min(last_page, first_page + max_pages - 1)
+        
+        if workers > 1 and last_page - first_page + 1 >= PARALLEL_PDF_MIN_PAGES:
+            pages = _iter_parallel_pages(file_path, first_page, last_page, workers)
+        else:
+            pages = _iter_reader_pages(pdf_reader, first_page, last_page)
+        
+        remaining = max_bytes
+        try:
+            for page_number, text, seconds in pages:
+                if page_timings is not None:
+                    page_timings.append({'page': page_number, 'seconds': round(seconds, 6), 'chars': len(text)})
+                if remaining is not None:
+                    encoded = text.encode('utf-8')
+                    if len(encoded) >= remaining:
+                        yield page_number, encoded[:remaining].decode('utf-8', 'ignore')
+                        return
+                    remaining -= len(encoded)
+                
+                yield page_number, text
+        finally:
+            pages.close()
+
+def join_pages(pages) -> Tuple[str, List[Tuple[int, int]]]:
+    """Join extracted pages in linear time, returning the text and (page_number, start_offset) for each page"""
+    
+    parts = []
+    page_offsets = []
+    offset = 0
+    for page_number, text in pages:
+        page_offsets.append((page_number, offset))
+        parts.append(text)
+        offset += len(text)
+    return ''.join(parts), page_offsets
+
+def page_at(page_offsets: List[Tuple[int, int]], offset: int) -> Optional[int]:
+    """Page number containing a character offset of text built by join_pages"""
+    
+    index = bisect_right(page_offsets, offset, key=lambda entry: entry[1]) - 1
+    return page_offsets[index][0] if index >= 0 else None
+
+# WordprocessingML namespaces (transitional and strict) and markup compatibility
+WORD_NAMESPACES = ['http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+                   'http://purl.oclc.org/ooxml/wordprocessingml/main']
+MARKUP_COMPATIBILITY_NAMESPACE = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+PACKAGE_RELATIONSHIPS = '_rels/.rels'
+
+# Elements the DOCX reader acts on, by qualified tag
+DOCX_TAGS = {f'{{{namespace}}}{name}': name for namespace in WORD_NAMESPACES
+             for name in ('body', 'p', 'r', 't', 'tab', 'ptab', 'br', 'cr', 'noBreakHyphen')}
+# VML copies of drawings (text boxes) that repeat the text of the preferred choice
+DOCX_TAGS[f'{{{MARKUP_COMPATIBILITY_NAMESPACE}}}Fallback'] = 'Fallback'
+# Text equivalents of run content besides w:t, as python-docx renders them
+DOCX_RUN_TEXT = {'tab': '\t', 'ptab': '\t', 'cr': '\n', 'noBreakHyphen': '-'}
+DOCX_BREAK_TYPE_ATTRIBUTES = [f'{{{namespace}}}type' for namespace in WORD_NAMESPACES]
+
+# Compressed bytes of document.xml fed to the parser at a time
+DOCX_READ_SIZE = 256 * 1024
+
+def _docx_main_part(archive: zipfile.ZipFile) -> str:
+    """Path of the main document part, from the package relationships (usually word/document.xml)"""
+    
+    try:
+        relationships = ElementTree.fromstring(archive.read(PACKAGE_RELATIONSHIPS))
+    except KeyError:
+        return 'word/document.xml'
+    for relationship in relationships:
+        if relationship.get('Type', '').endswith('/officeDocument'):
+            return relationship.get('Target', '').lstrip('/')
+    return 'word/document.xml'
+
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+    """
+    Text of every paragraph in a DOCX, in document order, without building
+    the python-docx object model.
+    
+    The main part is pulled through an incremental XML parser straight from
+    the zip, and each body element is discarded once read, so time is linear
+    and memory bounded by the largest table. Paragraphs inside tables (and
+    content controls and text boxes) are included where they appear; run
+    text follows python-docx (tabs, line breaks and non-breaking hyphens).
+    """
+    
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(_docx_main_part(archive)) as part:
+            parser = ElementTree.XMLPullParser(events=('start', 'end'))
+            paragraphs: List[List[str]] = []
+            body = None
+            depth = run_depth = skip_depth = 0
+            
+            for chunk in iter(lambda: part.read(DOCX_READ_SIZE), b''):
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    kind = DOCX_TAGS.get(element.tag)
+                    if event == 'start':
+                        depth += 1
+                        if kind == 'p':
+                            paragraphs.append([])
+                        elif kind == 'r':
+                            run_depth += 1
+                        elif kind == 'body':
+                            body = element
+                        elif kind == 'Fallback':
+                            skip_depth += 1
+                        continue
+                    
+                    depth -= 1
+                    if kind == 'p':
+                        yield ''.join(paragraphs.pop())
+                        element.clear()
+                    elif kind == 'r':
+                        run_depth -= 1
+                    elif kind == 'Fallback':
+                        skip_depth -= 1
+                    elif kind is not None and run_depth and not skip_depth and paragraphs:
+                        if kind == 't':
+                            paragraphs[-1].append(element.text or '')
+                        elif kind == 'br':
+                            # Page and column breaks have no text equivalent
+                            break_type = next((element.get(name) for name in DOCX_BREAK_TYPE_ATTRIBUTES
+                                               if name in element.attrib), 'textWrapping')
+                            if break_type == 'textWrapping':
+                                paragraphs[-1].append('\n')
+                        else:
+                            paragraphs[-1].append(DOCX_RUN_TEXT.get(kind, ''))
+                    
+                    # A finished body element (paragraph, table, ...) is never looked at again
+                    if depth == 2 and body is not None:
+                        body.clear()
+            parser.close()
+
+def _docx_text_with_python_docx(file_path: str) -> str:
+    """Body paragraphs through python-docx, for files the streaming reader cannot parse"""
+    
+    import docx
+    
+    document = docx.Document(file_path)
+    return ''.join(paragraph.text + "\n" for paragraph in document.paragraphs)
+
+def docx_text(file_path: str) -> str:
+    """Paragraph and table text of a DOCX, one line per paragraph"""
+    
+    try:
+        return ''.join(paragraph + "\n" for paragraph in iter_docx_paragraphs(file_path))
+    except (KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+        return _docx_text_with_python_docx(file_path)
+
+def process_file_content(file_path: str, file_type: str, first_page: int = 1, last_page: Optional[int] = None,
+                         max_pages: Optional[int] = None, max_bytes: Optional[int] = None,
+                         workers: Optional[int] = None, timings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Process uploaded file and extract text content (page options apply to PDFs).
+    If timings is a dict it is filled with the extraction time (and per-page
+    times for PDFs), which are also added to METRICS.
+    """
+    
+    if workers is None:
+        workers = int(os.environ.get('GRANT_ANALYZER_PDF_WORKERS') or 1)
+    
+    started = time.perf_counter()
+    page_timings = [] if timings is not None else None
+    try:
+        if file_type == 'pdf':
+            text, _ = join_pages(iter_pdf_pages(file_path, first_page, last_page, max_pages, max_bytes, workers,
+                                                page_timings))
+        
+        elif file_type == 'docx':
+            text = docx_text(file_path)
+        
+        elif file_type == 'txt':
+            with open(file_path, 'r', encoding='utf-8') as file:
+                text = file.read()
+        
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+    
+    except Exception as e:
+        raise Exception(f"Error processing file: {str(e)}")
+    
+    if timings is not None:
+        timings.update(file_type=file_type, seconds=round(time.perf_counter() - started, 6), chars=len(text))
+        if file_type == 'pdf':
+            timings['pages'] = page_timings
+        METRICS.observe_extraction(timings)
+    return text
+
+# Plain-text files at least this large are analyzed through a memory map
+MAPPED_TXT_MIN_BYTES = 64 * 1024 * 1024
+
+def analyze_mapped_text(analyzer: 'EnhancedGrantAnalyzer', file_path: str, document_name: Optional[str] = None,
+                        sections: Optional[List[str]] = None, cache: Optional['AnalysisCache'] = None) -> Dict[str, Any]:
+    """
+    Analyze a UTF-8 text file without reading it into a str.
+    
+    The file is memory-mapped read-only and the patterns run over its bytes
+    (ASCII semantics, no newline translation); only matched spans are decoded
+    and words are counted chunk by chunk, so memory stays flat however large
+    the file. For ASCII files the result equals analyzing the decoded text;
+    document_sections offsets are byte offsets.
+    """
+    
+    document_name = document_name or os.path.basename(file_path)
+    with open(file_path, 'rb') as file:
+        # Empty files cannot be mapped
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else None
+    
+    document_text = buffer if buffer is not None else ''
+    try:
+        if cache:
+            return cache.analyze(analyzer, document_text, document_name, sections)
+        return analyzer.analyze_grant_document(document_text, document_name, sections)
+    finally:
+        if buffer is not None:
+            buffer.close()
+
+def analyze_document_file(analyzer: 'EnhancedGrantAnalyzer', file_path: str, file_type: str,
+                          document_name: Optional[str] = None, sections: Optional[List[str]] = None,
+                          cache: Optional['AnalysisCache'] = None, workers: Optional[int] = None,
+                          **page_options) -> Dict[str, Any]:
+    """Extract and analyze one file; txt files of MAPPED_TXT_MIN_BYTES or more are memory-mapped"""
+    
+    document_name = document_name or os.path.basename(file_path)
+    if file_type == 'txt' and os.path.getsize(file_path) >= MAPPED_TXT_MIN_BYTES:
+        return analyze_mapped_text(analyzer, file_path, document_name, sections, cache)
+    
+    if cache:
+        text = cache.extract_text(file_path, file_type, workers=workers, **page_options)
+        return cache.analyze(analyzer, text, document_name, sections)
+    text = process_file_content(file_path, file_type, workers=workers, **page_options)
+    return analyzer.analyze_grant_document(text, document_name, sections)
+
+# ---------------------------------------------------------------------------
+# Progressive analysis
+# ---------------------------------------------------------------------------
+
+# Characters of DOCX paragraphs or plain text extracted per piece
+PROGRESSIVE_PIECE_CHARS = 64 * 1024
+
+# The text extracted so far is re-analyzed once it has grown this many times
+# over since the last run, so the runs on partial text together cost at most
+# 4/3 of one analysis of the whole document
+PROGRESSIVE_GROWTH = 4
+
+def iter_file_text(file_path: str, file_type: str, first_page: int = 1, last_page: Optional[int] = None,
+                   max_pages: Optional[int] = None, max_bytes: Optional[int] = None,
+                   workers: Optional[int] = None) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Yield (page_number, text) pieces of a file as they are extracted.
+    
+    Joined, the pieces are process_file_content's text. Page numbers are only
+    set for PDFs, which yield a piece per page; DOCX paragraphs and plain
+    text come in pieces of about PROGRESSIVE_PIECE_CHARS.
+    """
     
-    def analyze_grant_document(self, document_text: str, document_name: str = "Grant Document") -> Dict[str, Any]:
-        """
-        Perform comprehensive analysis of grant document
-        """
-        try:
-            # Comprehensive analysis structure
-            analysis = {
-                'document_info': self._extract_document_info(document_text, document_name),
-                'basic_information': self._extract_basic_information(document_text),
-                'eligibility_requirements': self._extract_eligibility_requirements(document_text),
-                'funding_details': self._extract_funding_details(document_text),
-                'evaluation_criteria': self._extract_evaluation_criteria(document_text),
-                'application_requirements': self._extract_application_requirements(document_text),
-                'deadlines_and_dates': self._extract_deadlines_and_dates(document_text),
-                'program_priorities': self._extract_program_priorities(document_text),
-                'compliance_requirements': self._extract_compliance_requirements(document_text),
-                'strategic_insights': self._generate_strategic_insights(document_text),
-                'competitive_analysis': self._analyze_competitive_factors(document_text),
-                'analysis_metadata': {
-                    'timestamp': self.analysis_timestamp,
-                    'document_name': document_name,
-                    'analyzer_version': '2.0'
-                }
-            }
-            
-            return analysis
-            
-        except Exception as e:
-            return {
-                'error': f"Analysis failed: {str(e)}",
-                'document_name': document_name,
-                'timestamp': self.analysis_timestamp
-            }
+    if workers is None:
+        workers = int(os.environ.get('GRANT_ANALYZER_PDF_WORKERS') or 1)
     
-    def _extract_document_info(self, text: str, document_name: str) -> Dict[str, Any]:
-        """Extract basic document information"""
-        
-        # Extract funding opportunity number
-        fonum_patterns = [
-            r'Funding Opportunity Number:\s*([A-Z0-9]+)',
-            r'FONUM:\s*([A-Z0-9]+)',
-            r'Opportunity Number:\s*([A-Z0-9]+)'
-        ]
-        
-        funding_opportunity_number = None
-        for pattern in fonum_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                funding_opportunity_number = match.group(1)
-                break
-        
-        # Extract program title
-        title_patterns = [
-            r'Program Title:\s*([^\n]+)',
-            r'TITLE:\s*([^\n]+)',
-            r'Notice of Funding Opportunity\s*([^\n]+)'
-        ]
-        
-        program_title = None
-        for pattern in title_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                program_title = match.group(1).strip()
-                break
+    try:
+        if file_type == 'pdf':
+            yield from iter_pdf_pages(file_path, first_page, last_page, max_pages, max_bytes, workers)
         
-        # Extract issuing agency
-        agency_patterns = [
-            r'Bureau of ([^\n]+)',
-            r'Department of ([^\n]+)',
-            r'Agency:\s*([^\n]+)'
-        ]
+        elif file_type == 'docx':
+            paragraphs = []
+            size = 0
+            started = False
+            try:
+                for paragraph in iter_docx_paragraphs(file_path):
+                    paragraphs.append(paragraph + "\n")
+                    size += len(paragraph) + 1
+                    if size >= PROGRESSIVE_PIECE_CHARS:
+                        started = True
+                        yield None, ''.join(paragraphs)
+                        paragraphs, size = [], 0
+            except (KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+                # Same fallback as docx_text, as long as nothing was yielded yet
+                if started:
+                    raise
+                paragraphs = [_docx_text_with_python_docx(file_path)]
+            if paragraphs:
+                yield None, ''.join(paragraphs)
         
-        issuing_agency = None
-        for pattern in agency_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                issuing_agency = match.group(0).strip()
-                break
+        elif file_type == 'txt':
+            with open(file_path, 'r', encoding='utf-8') as file:
+                for piece in iter(lambda: file.read(PROGRESSIVE_PIECE_CHARS), ''):
+                    yield None, piece
         
-        return {
-            'funding_opportunity_number': funding_opportunity_number or "Not specified",
-            'program_title': program_title or "Not specified",
-            'issuing_agency': issuing_agency or "Not specified",
-            'document_name': document_name,
-            'word_count': len(text.split()),
-            'character_count': len(text)
-        }
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
     
-    def _extract_basic_information(self, text: str) -> Dict[str, Any]:
-        """Extract basic grant information"""
-        
-        # Extract program description
-        desc_patterns = [
-            r'Program Description\s*([^A-Z]{100,})',
-            r'DESCRIPTION\s*([^A-Z]{100,})',
-            r'Overview\s*([^A-Z]{100,})'
-        ]
+    except Exception as e:
+        raise Exception(f"Error processing file: {str(e)}")
+
+def iter_progressive_analysis(analyzer: 'EnhancedGrantAnalyzer', file_path: str, file_type: str,
+                              document_name: Optional[str] = None, sections: Optional[List[str]] = None,
+                              workers: Optional[int] = None, **page_options) -> Iterator[Dict[str, Any]]:
+    """
+    Analyze a file while it is being extracted, yielding events as results become known.
+    
+    {'event': 'progress', 'chars'} follows every extracted piece. After the
+    first piece, and whenever the text has grown PROGRESSIVE_GROWTH-fold
+    since, the text so far (up to its last line break) is analyzed and
+    {'event': 'section', 'section', 'final', 'result', 'chars'} is yielded for
+    every section whose result changed. A section read from one document
+    section (see EXTRACTOR_INPUTS) is final once the next section's heading
+    has been extracted: its text can no longer change, so it is not computed
+    again. Every other section stays provisional until the end. PDF events
+    also carry 'pages', the pages extracted so far.
+    
+    The last event is {'event': 'complete', 'analysis'}, equal to
+    analyze_grant_document on the whole text. Neither the cache nor the
+    memory map of analyze_document_file is used.
+    """
+    
+    document_name = document_name or os.path.basename(file_path)
+    sections = select_sections(sections)
+    final: Dict[str, Any] = {}
+    emitted: Dict[str, Any] = {}
+    parts: List[str] = []
+    progress: Dict[str, int] = {'chars': 0}
+    analyzed = 0
+    
+    for page_number, text in iter_file_text(file_path, file_type, workers=workers, **page_options):
+        parts.append(text)
+        progress['chars'] += len(text)
+        if page_number is not None:
+            progress['pages'] = progress.get('pages', 0) + 1
+        yield {'event': 'progress', **progress}
+        if analyzed and progress['chars'] < PROGRESSIVE_GROWTH * analyzed:
+            continue
         
-        program_description = None
-        for pattern in desc_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            if match:
-                program_description = match.group(1).strip()[:500]  # Limit to 500 chars
-                break
+        # Only whole lines, so every heading seen is complete
+        parts = [''.join(parts)]
+        prefix = parts[0][:parts[0].rfind("\n") + 1]
+        if len(prefix) <= analyzed:
+            continue
+        analyzed = len(prefix)
         
-        return {
-            'program_description': program_description or "Not specified"
-        }
+        run = analyzer.lazy_analysis(prefix, document_name, [section for section in sections
+                                                             if section not in final])
+        index = run._document_sections()
+        for section in run.sections:
+            result = run[section]
+            document_section = EXTRACTOR_INPUTS[section][0] if section in EXTRACTOR_INPUTS else None
+            closed = (document_section in index.sections and section not in run.timed_out
+                      and index.span(document_section)[1] < len(prefix))
+            if closed:
+                final[section] = result
+            elif result == emitted.get(section):
+                continue
+            emitted[section] = result
+            yield {'event': 'section', 'section': section, 'final': closed, 'result': result, **progress}
     
-    def _extract_eligibility_requirements(self, text: str) -> Dict[str, Any]:
-        """Extract eligibility requirements"""
+    run = analyzer.lazy_analysis(''.join(parts), document_name, [section for section in sections
+                                                                 if section not in final])
+    analysis = {section: final[section] if section in final else run[section] for section in sections}
+    run._bind()
+    analysis['analysis_metadata'] = analyzer._metadata(
+        document_name, sections if len(sections) < len(ANALYSIS_SECTIONS) else None)
+    analyzer._observe(analysis)
+    yield {'event': 'complete', 'analysis': analysis}
+
+# ---------------------------------------------------------------------------
+# Result model
+# ---------------------------------------------------------------------------
+
+# Fields left out of to_dict() while unset (analysis_metadata.sections and .timings,
+# and the sections a partial analysis skipped)
+OMIT_IF_NONE = {'omit_if_none': True}
+
+# Leads every packed analysis; bumped whenever a model field is added, removed or moved
+RESULT_MODEL_VERSION = 2
+
+@dataclass(slots=True)
+class DocumentInfo:
+    funding_opportunity_number: str
+    program_title: str
+    issuing_agency: str
+    document_name: str
+    word_count: int
+    character_count: int
+    fingerprint: Optional[str] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+
+@dataclass(slots=True)
+class BasicInformation:
+    program_description: str
+
+@dataclass(slots=True)
+class EligibilityRequirements:
+    eligible_applicants: List[str]
+    ineligible_applicants: List[str]
+    additional_requirements: List[str]
+
+@dataclass(slots=True)
+class FundingDetails:
+    funding_amounts: List[str]
+    cost_sharing_requirement: str
+
+@dataclass(slots=True)
+class EvaluationCriterion:
+    category: str
+    weight: str
+    description: str
+
+@dataclass(slots=True)
+class EvaluationCriteria:
+    evaluation_criteria: List[EvaluationCriterion]
+    rating_scale: List[str]
+
+@dataclass(slots=True)
+class ApplicationRequirements:
+    required_documents: List[str]
+    page_limits: List[str]
+    format_requirements: List[str]
+
+@dataclass(slots=True)
+class LabeledDate:
+    date: str
+    role: str
+    text: str
+
+@dataclass(slots=True)
+class DeadlinesAndDates:
+    submission_deadline: str
+    important_dates: List[str]
+    closing_date: Optional[str]
+    dates: List[LabeledDate]
+
+@dataclass(slots=True)
+class ProgramPriorities:
+    program_priorities: List[str]
+    program_goals: List[str]
+
+@dataclass(slots=True)
+class ComplianceRequirement:
+    requirement: str
+    context: str
+
+@dataclass(slots=True)
+class ComplianceRequirements:
+    compliance_requirements: List[ComplianceRequirement]
+
+@dataclass(slots=True)
+class StrategicInsights:
+    strategic_insights: List[str]
+    competitiveness_level: str
+    key_success_factors: List[str]
+
+@dataclass(slots=True)
+class CompetitiveAnalysis:
+    competitive_volume_indicators: List[str]
+    differentiation_opportunities: List[str]
+    recommended_positioning: List[str]
+
+@dataclass(slots=True)
+class Span:
+    start: int
+    end: int
+
+@dataclass(slots=True)
+class Heading:
+    title: str
+    section: Optional[str]
+    start: int
+    end: int
+
+@dataclass(slots=True)
+class DocumentSectionsResult:
+    headings: List[Heading]
+    sections: Dict[str, Span]
+
+@dataclass(slots=True)
+class AnalysisMetadata:
+    timestamp: str
+    document_name: str
+    analyzer_version: str
+    timed_out: List[str]
+    sections: Optional[List[str]] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    timings: Optional[Dict[str, Any]] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+
+@dataclass(slots=True)
+class GrantAnalysis:
+    """
+    Typed form of an analyze_grant_document() result. from_dict()/to_dict()
+    convert to and from the JSON shape; to_packed()/from_packed() use nested
+    lists in field order instead of objects, which drops every key from the
+    payload.
+    """
+    
+    analysis_metadata: AnalysisMetadata
+    document_info: Optional[DocumentInfo] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    basic_information: Optional[BasicInformation] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    eligibility_requirements: Optional[EligibilityRequirements] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    funding_details: Optional[FundingDetails] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    evaluation_criteria: Optional[EvaluationCriteria] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    application_requirements: Optional[ApplicationRequirements] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    deadlines_and_dates: Optional[DeadlinesAndDates] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    program_priorities: Optional[ProgramPriorities] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    compliance_requirements: Optional[ComplianceRequirements] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    strategic_insights: Optional[StrategicInsights] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    competitive_analysis: Optional[CompetitiveAnalysis] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    document_sections: Optional[DocumentSectionsResult] = dataclasses.field(default=None, metadata=OMIT_IF_NONE)
+    
+    @classmethod
+    def from_dict(cls, analysis: Dict[str, Any]) -> 'GrantAnalysis':
+        return _model_reader(cls, False)(analysis)
+    
+    @classmethod
+    def from_packed(cls, packed: List[Any]) -> 'GrantAnalysis':
+        if packed[0] != RESULT_MODEL_VERSION:
+            raise ValueError(f"Packed analysis has model version {packed[0]}, expected {RESULT_MODEL_VERSION}")
+        return _model_reader(cls, True)(packed[1:])
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """The analyze_grant_document() JSON shape, sections in output order"""
         
-        # Find eligibility section
-        eligibility_section = ""
-        eligibility_match = re.search(r'ELIGIBILITY.*?(?=\n[A-Z]{2,}|\Z)', text, re.IGNORECASE | re.DOTALL)
-        if eligibility_match:
-            eligibility_section = eligibility_match.group(0)
+        analysis = _model_writer(GrantAnalysis, False)(self)
+        metadata = analysis.pop('analysis_metadata')
+        analysis['analysis_metadata'] = metadata
+        return analysis
+    
+    def to_packed(self) -> List[Any]:
+        return [RESULT_MODEL_VERSION] + _model_writer(GrantAnalysis, True)(self)
+
+def _unchanged(value: Any) -> Any:
+    return value
+
+@lru_cache(maxsize=None)
+def _model_reader(kind: Any, packed: bool) -> Callable[[Any], Any]:
+    """
+    Function building a value of a model field type from its JSON (or packed)
+    form, compiled once per type; missing required keys raise KeyError.
+    """
+    
+    if dataclasses.is_dataclass(kind):
+        hints = get_type_hints(kind)
+        readers = [(item.name, _model_reader(hints[item.name], packed), bool(item.metadata.get('omit_if_none')))
+                   for item in dataclasses.fields(kind)]
+        if packed:
+            return lambda value: kind(*[read(item) for (_, read, _), item in zip(readers, value)])
+        return lambda value: kind(**{name: read(value.get(name) if omit else value[name])
+                                     for name, read, omit in readers})
+    
+    origin, arguments = get_origin(kind), get_args(kind)
+    if origin is Union:
+        read = _model_reader(arguments[0], packed)
+        return _unchanged if read is _unchanged else (lambda value: None if value is None else read(value))
+    if origin is list:
+        read = _model_reader(arguments[0], packed)
+        return _unchanged if read is _unchanged else (lambda value: [read(item) for item in value])
+    if origin is dict:
+        read = _model_reader(arguments[1], packed)
+        return _unchanged if read is _unchanged else (
+            lambda value: {key: read(item) for key, item in value.items()})
+    return _unchanged
+
+@lru_cache(maxsize=None)
+def _model_writer(kind: Any, packed: bool) -> Callable[[Any], Any]:
+    """Inverse of _model_reader"""
+    
+    if dataclasses.is_dataclass(kind):
+        hints = get_type_hints(kind)
+        writers = [(item.name, _model_writer(hints[item.name], packed), bool(item.metadata.get('omit_if_none')))
+                   for item in dataclasses.fields(kind)]
+        if packed:
+            return lambda model: [write(getattr(model, name)) for name, write, _ in writers]
         
-        # Extract eligible applicants
-        eligible_applicants = []
-        eligible_patterns = [
-            r'State governments',
-            r'Local governments',
-            r'County governments',
-            r'City.*governments',
-            r'Township governments',
-            r'Tribal governments',
-            r'Native American.*governments',
-            r'Public.*institutions',
-            r'Private.*institutions',
-            r'Higher education',
-            r'Nonprofits',
-            r'501\(c\)\(3\)',
-            r'For-profit.*organizations',
-            r'Small businesses'
-        ]
+        def write_dict(model):
+            result = {}
+            for name, write, omit in writers:
+                value = getattr(model, name)
+                if not (omit and value is None):
+                    result[name] = write(value)
+            return result
+        return write_dict
+    
+    origin, arguments = get_origin(kind), get_args(kind)
+    if origin is Union:
+        write = _model_writer(arguments[0], packed)
+        return _unchanged if write is _unchanged else (lambda value: None if value is None else write(value))
+    if origin is list:
+        write = _model_writer(arguments[0], packed)
+        return _unchanged if write is _unchanged else (lambda value: [write(item) for item in value])
+    if origin is dict:
+        write = _model_writer(arguments[1], packed)
+        return _unchanged if write is _unchanged else (
+            lambda value: {key: write(item) for key, item in value.items()})
+    return _unchanged
+
+# ---------------------------------------------------------------------------
+# Output encodings
+# ---------------------------------------------------------------------------
+
+# json: the indented shape main() always printed; compact: the same shape without
+# whitespace; packed: compact JSON of GrantAnalysis.to_packed(); msgpack: the
+# packed lists as MessagePack (needs the optional msgpack package)
+OUTPUT_FORMATS = ('json', 'compact', 'packed', 'msgpack')
+COMPACT_SEPARATORS = (',', ':')
+
+# Frames are a 4-byte big-endian payload length followed by the payload
+FRAME_HEADER = struct.Struct('>I')
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("The msgpack format needs the msgpack package (pip install msgpack)")
+    return msgpack
+
+def pack_analysis(analysis: Dict[str, Any]) -> Any:
+    """Packed lists for a successful analysis; error results stay as they are"""
+    
+    if 'error' in analysis:
+        return analysis
+    return GrantAnalysis.from_dict(analysis).to_packed()
+
+def unpack_analysis(packed: Any) -> Dict[str, Any]:
+    if isinstance(packed, dict):
+        return packed
+    return GrantAnalysis.from_packed(packed).to_dict()
+
+def encode_analysis(analysis: Dict[str, Any], output_format: str = 'json') -> bytes:
+    """Serialize an analysis (or error result) in one of OUTPUT_FORMATS"""
+    
+    if output_format == 'json':
+        return json.dumps(analysis, indent=2).encode('utf-8')
+    if output_format == 'compact':
+        return json.dumps(analysis, separators=COMPACT_SEPARATORS, ensure_ascii=False).encode('utf-8')
+    if output_format == 'packed':
+        return json.dumps(pack_analysis(analysis), separators=COMPACT_SEPARATORS, ensure_ascii=False).encode('utf-8')
+    if output_format == 'msgpack':
+        return _msgpack().packb(pack_analysis(analysis), use_bin_type=True)
+    raise ValueError(f"Unknown output format: {output_format} (expected one of {', '.join(OUTPUT_FORMATS)})")
+
+def decode_analysis(data: bytes, output_format: str = 'json') -> Dict[str, Any]:
+    """Inverse of encode_analysis, always returning the JSON shape"""
+    
+    if output_format in ('json', 'compact'):
+        return json.loads(data)
+    if output_format == 'packed':
+        return unpack_analysis(json.loads(data))
+    if output_format == 'msgpack':
+        return unpack_analysis(_msgpack().unpackb(data, raw=False))
+    raise ValueError(f"Unknown output format: {output_format} (expected one of {', '.join(OUTPUT_FORMATS)})")
+
+def write_frame(stream, payload: bytes):
+    stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+def iter_frames(stream) -> Iterator[bytes]:
+    """Payloads of a framed binary stream; a frame cut short by an interrupted writer ends it"""
+    
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        (length,) = FRAME_HEADER.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            return
+        yield payload
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    tier TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (tier, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+DEFAULT_CACHE_MAX_MB = 256
+
+# Bumped whenever process_file_content can return different text for the same
+# bytes, so the text tier never serves what an older extractor produced
+# (2: DOCX text includes table paragraphs)
+EXTRACTOR_VERSION = 2
+
+class AnalysisCache:
+    """
+    Two-tier, content-addressed cache in a local SQLite file.
+    
+    The text tier maps the SHA-256 of an uploaded file's bytes (with its file
+    type and page options) to the extracted text, keyed under the extractor
+    version. The analysis tier maps the SHA-256 of a document's text to its
+    analysis JSON, keyed under the analyzer version and rule-set fingerprint.
+    Entries of either tier from any other version are deleted when the cache
+    is opened. Once the stored values exceed max_bytes
+    the least recently used entries of either tier are evicted. The file can be
+    shared by several worker processes.
+    """
+    
+    TEXT = 'text'
+    ANALYSIS = 'analysis'
+    
+    def __init__(self, path: str, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         
-        for pattern in eligible_patterns:
-            if re.search(pattern, eligibility_section, re.IGNORECASE):
-                eligible_applicants.append(pattern.replace('.*', ' ').replace('\\', ''))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = {self.TEXT: 0, self.ANALYSIS: 0}
+        self.misses = {self.TEXT: 0, self.ANALYSIS: 0}
+        self.analysis_version = ANALYZER_VERSION
+        self.extractor_version = str(EXTRACTOR_VERSION)
         
-        # Extract ineligible applicants
-        ineligible_applicants = []
-        ineligible_patterns = [
-            r'Individuals.*ineligible',
-            r'For-profit.*ineligible',
-            r'Foreign.*entities.*ineligible'
-        ]
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(CACHE_SCHEMA)
+        self._drop_stale_entries()
+    
+    @classmethod
+    def from_env(cls) -> Optional['AnalysisCache']:
+        """Cache configured by GRANT_ANALYZER_CACHE_PATH, or None when caching is off"""
         
-        for pattern in ineligible_patterns:
-            if re.search(pattern, eligibility_section, re.IGNORECASE):
-                ineligible_applicants.append("Individuals and for-profit organizations")
+        path = os.environ.get('GRANT_ANALYZER_CACHE_PATH')
+        if not path:
+            return None
+        max_mb = float(os.environ.get('GRANT_ANALYZER_CACHE_MAX_MB') or DEFAULT_CACHE_MAX_MB)
+        return cls(path, int(max_mb * 1024 * 1024))
+    
+    def _drop_stale_entries(self):
+        """Delete text from a different extractor and analyses from a different analyzer version or rule set"""
         
-        return {
-            'eligible_applicants': eligible_applicants[:10],  # Limit to 10
-            'ineligible_applicants': ineligible_applicants[:5],  # Limit to 5
-            'additional_requirements': []
-        }
+        with self._db:
+            for tier, name, version in ((self.TEXT, 'extractor_version', self.extractor_version),
+                                        (self.ANALYSIS, 'analysis_version', self.analysis_version)):
+                row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+                if row is None or row[0] != version:
+                    self._db.execute("DELETE FROM entries WHERE tier = ?", (tier,))
+                    self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, version))
     
-    def _extract_funding_details(self, text: str) -> Dict[str, Any]:
-        """Extract funding information"""
+    def get(self, tier: str, key: str) -> Optional[str]:
+        """Cached value for key, refreshing its LRU position"""
         
-        # Extract funding amounts
-        amount_patterns = [
-            r'Award Ceiling:\s*\$([0-9,]+)',
-            r'Award Floor:\s*\$([0-9,]+)',
-            r'Total.*Funding:\s*\$([0-9,]+)',
-            r'Maximum.*Award:\s*\$([0-9,]+)',
-            r'Minimum.*Award:\s*\$([0-9,]+)'
-        ]
+        with self._db:
+            row = self._db.execute("SELECT value FROM entries WHERE tier = ? AND key = ?", (tier, key)).fetchone()
+            if row is None:
+                self.misses[tier] += 1
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE tier = ? AND key = ?", (time.time(), tier, key)
+            )
         
-        funding_amounts = []
-        for pattern in amount_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                amount_type = match.group(0).split(':')[0].strip()
-                amount_value = match.group(1)
-                funding_amounts.append(f"{amount_type}: ${amount_value}")
+        self.hits[tier] += 1
+        return row[0]
+    
+    def put(self, tier: str, key: str, value: str):
+        """Store value for key, then evict least recently used entries down to max_bytes"""
         
-        # Extract cost sharing requirement
-        cost_sharing_requirement = "Not specified"
-        if re.search(r'Cost Sharing.*Required:\s*No', text, re.IGNORECASE):
-            cost_sharing_requirement = "No"
-        elif re.search(r'Cost Sharing.*Required:\s*Yes', text, re.IGNORECASE):
-            cost_sharing_requirement = "Yes"
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
         
-        return {
-            'funding_amounts': funding_amounts[:5],  # Limit to 5
-            'cost_sharing_requirement': cost_sharing_requirement
-        }
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (tier, key, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (tier, key, value, size, time.time())
+            )
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = []
+                for old_tier, old_key, old_size in self._db.execute(
+                        "SELECT tier, key, size FROM entries ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((old_tier, old_key))
+                    total -= old_size
+                self._db.executemany("DELETE FROM entries WHERE tier = ? AND key = ?", evicted)
     
-    def _extract_evaluation_criteria(self, text: str) -> Dict[str, Any]:
-        """Extract evaluation criteria and scoring information"""
+    def extract_text(self, file_path: str, file_type: str, workers: Optional[int] = None,
+                     timings: Optional[Dict[str, Any]] = None, **page_options) -> str:
+        """process_file_content, served from the text tier when these bytes were extracted before"""
         
-        # Find merit review section
-        merit_section = ""
-        merit_match = re.search(r'MERIT REVIEW.*?(?=\n[A-Z]{2,}|\Z)', text, re.IGNORECASE | re.DOTALL)
-        if merit_match:
-            merit_section = merit_match.group(0)
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        key = f"{self.extractor_version}:{digest.hexdigest()}:{file_type}:{json.dumps(page_options, sort_keys=True)}"
         
-        # Extract evaluation criteria
-        evaluation_criteria = []
+        text = self.get(self.TEXT, key)
+        if text is None:
+            text = process_file_content(file_path, file_type, workers=workers, timings=timings, **page_options)
+            self.put(self.TEXT, key, text)
+        return text
+    
+    def analyze(self, analyzer: EnhancedGrantAnalyzer, document_text: str,
+                document_name: str = "Grant Document", sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        analyze_grant_document, served from the analysis tier when this text was
+        analyzed before. Only full analyses are stored; a section selection is
+        cut from a stored one, or computed on its own on a miss.
+        """
         
-        # Look for section headers in caps
-        criteria_patterns = [
-            r'([A-Z\s]+STATEMENT[A-Z\s]+)',
-            r'([A-Z\s]+TECHNICAL[A-Z\s]+)',
-            r'([A-Z\s]+APPROACH[A-Z\s]+)',
-            r'([A-Z\s]+BENEFIT[A-Z\s]+)',
-            r'([A-Z\s]+QUALIFICATIONS[A-Z\s]+)',
-            r'([A-Z\s]+PERFORMANCE[A-Z\s]+)'
-        ]
+        sections = select_sections(sections)
+        partial = len(sections) < len(ANALYSIS_SECTIONS)
+        # Analyses with and without fingerprints are stored apart
+        version = f"{self.analysis_version}:fingerprint" if analyzer.fingerprint else self.analysis_version
+        if isinstance(document_text, str):
+            key = f"{version}:{hashlib.sha256(document_text.encode('utf-8')).hexdigest()}"
+        else:
+            # Mapped files match with bytes semantics, so they never share entries with str text
+            key = f"{version}:bytes:{hashlib.sha256(document_text).hexdigest()}"
+        cached = self.get(self.ANALYSIS, key)
+        if cached is not None:
+            analysis = json.loads(cached)
+            analysis['document_info']['document_name'] = document_name
+            analysis['analysis_metadata']['document_name'] = document_name
+            analysis['analysis_metadata']['timestamp'] = datetime.now().isoformat()
+            if partial:
+                analysis = dict({section: analysis[section] for section in sections},
+                                analysis_metadata=dict(analysis['analysis_metadata'], sections=sections))
+            return analysis
         
-        for pattern in criteria_patterns:
-            matches = re.finditer(pattern, merit_section)
-            for match in matches:
-                criteria_name = match.group(1).strip()
-                if len(criteria_name) > 10:  # Filter out very short matches
-                    evaluation_criteria.append({
-                        'category': criteria_name,
-                        'weight': 'Not specified',
-                        'description': 'Extracted from merit review section'
-                    })
+        if partial:
+            return analyzer.analyze_grant_document(document_text, document_name, sections)
+        analysis = analyzer.analyze_grant_document(document_text, document_name)
+        # Errors and budget-truncated results are not worth keeping
+        if 'error' not in analysis and not analysis['analysis_metadata']['timed_out']:
+            # Timings describe this run only; a cache hit should not replay them
+            metadata = {name: value for name, value in analysis['analysis_metadata'].items() if name != 'timings'}
+            self.put(self.ANALYSIS, key, json.dumps(dict(analysis, analysis_metadata=metadata)))
+        return analysis
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current size of the cache file"""
         
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
         return {
-            'evaluation_criteria': evaluation_criteria[:6],  # Limit to 6
-            'rating_scale': self._extract_rating_scale(merit_section)
+            'path': self.path,
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'analysis_version': self.analysis_version,
+            'extractor_version': self.extractor_version
         }
+
+# ---------------------------------------------------------------------------
+# Deadline calendar
+# ---------------------------------------------------------------------------
+
+DEADLINE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_key TEXT PRIMARY KEY,
+    document_name TEXT NOT NULL,
+    program_title TEXT NOT NULL,
+    issuing_agency TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dates (
+    date TEXT NOT NULL,
+    role TEXT NOT NULL,
+    document_key TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (date, role, document_key, text)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dates_by_document ON dates (document_key);
+"""
+
+DEFAULT_DEADLINE_DAYS = 30
+
+def analysis_document_key(analysis: Dict[str, Any], document_key: Optional[str] = None) -> str:
+    """
+    Key the indexes store an analysis' document under: document_key when the
+    caller gives one, else the full funding opportunity number, so a revised
+    NOFO replaces its earlier entries, else the document name plus a digest of
+    the analysis, so unnumbered documents with the same name never share a key
+    """
     
-    def _extract_rating_scale(self, text: str) -> List[str]:
-        """Extract rating scale information"""
+    if document_key:
+        return document_key
+    info = analysis['document_info']
+    number = info.get('funding_opportunity_number')
+    if number and number != "Not specified":
+        return number
+    
+    content = {section: value for section, value in analysis.items() if section != 'analysis_metadata'}
+    content['document_info'] = {name: value for name, value in info.items()
+                                if name not in ('document_name', 'fingerprint')}
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return f"{info['document_name']}#{digest}"
+
+class DeadlineIndex:
+    """
+    Labeled dates of every analyzed document in a local SQLite file.
+    
+    Rows are clustered by (date, role), so "what closes in the next 30 days"
+    is one ordered range scan however many documents are indexed. Documents
+    are keyed by analysis_document_key, so recording a revised NOFO replaces
+    its earlier dates. The file can be shared by several worker processes.
+    """
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         
-        rating_scales = []
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(DEADLINE_INDEX_SCHEMA)
+    
+    @classmethod
+    def from_env(cls) -> Optional['DeadlineIndex']:
+        """Index configured by GRANT_ANALYZER_DEADLINE_INDEX_PATH, or None when it is off"""
         
-        # Common rating scale patterns
-        scale_patterns = [
-            r'Exceeds.*meets.*does not meet',
-            r'Excellent.*Good.*Fair.*Poor',
-            r'Outstanding.*Satisfactory.*Unsatisfactory',
-            r'Superior.*Acceptable.*Unacceptable'
-        ]
+        path = os.environ.get('GRANT_ANALYZER_DEADLINE_INDEX_PATH')
+        return cls(path) if path else None
+    
+    def record(self, analysis: Dict[str, Any], document_key: Optional[str] = None) -> Optional[str]:
+        """
+        Replace the dates stored for the analysis' document; returns its key,
+        or None for errors and analyses without document_info and deadlines.
+        """
         
-        for pattern in scale_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                rating_scales.append(pattern.replace('.*', ' - '))
+        if 'error' in analysis or 'document_info' not in analysis or 'deadlines_and_dates' not in analysis:
+            return None
         
-        return rating_scales[:3]  # Limit to 3
+        key = analysis_document_key(analysis, document_key)
+        info = analysis['document_info']
+        with self._db:
+            self._db.execute("DELETE FROM dates WHERE document_key = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (document_key, document_name, program_title, issuing_agency, "
+                "updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, info['document_name'], info['program_title'], info['issuing_agency'], time.time())
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO dates (date, role, document_key, text) VALUES (?, ?, ?, ?)",
+                [(entry['date'], entry['role'], key, entry['text'])
+                 for entry in analysis['deadlines_and_dates'].get('dates', [])]
+            )
+        return key
     
-    def _extract_application_requirements(self, text: str) -> Dict[str, Any]:
-        """Extract application requirements and documents needed"""
-        
-        # Find application section
-        app_section = ""
-        app_match = re.search(r'APPLICATION.*?(?=\n[A-Z]{2,}|\Z)', text, re.IGNORECASE | re.DOTALL)
-        if app_match:
-            app_section = app_match.group(0)
+    def remove(self, document_key: str) -> bool:
+        with self._db:
+            self._db.execute("DELETE FROM dates WHERE document_key = ?", (document_key,))
+            return self._db.execute("DELETE FROM documents WHERE document_key = ?", (document_key,)).rowcount > 0
+    
+    def between(self, start: str, end: str, roles: Optional[List[str]] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Dates in [start, end] (ISO, inclusive) in date order, optionally only the given roles"""
         
-        # Extract required documents
-        required_docs = []
-        doc_patterns = [
-            r'SF-424',
-            r'Budget Information',
-            r'Project Narrative',
-            r'Budget Narrative',
-            r'Biographical Sketch',
-            r'Current and Pending Support',
-            r'Letters of Support',
-            r'Curriculum Vitae',
-            r'Project Abstract'
-        ]
+        query = ("SELECT dates.date, dates.role, dates.document_key, documents.document_name, "
+                 "documents.program_title, documents.issuing_agency, dates.text "
+                 "FROM dates JOIN documents USING (document_key) WHERE dates.date BETWEEN ? AND ?")
+        params: List[Any] = [start, end]
+        if roles:
+            query += f" AND dates.role IN ({', '.join('?' for _ in roles)})"
+            params.extend(roles)
+        query += " ORDER BY dates.date, dates.role, dates.document_key"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
         
-        for pattern in doc_patterns:
-            if re.search(pattern, app_section, re.IGNORECASE):
-                required_docs.append(pattern)
+        columns = ['date', 'role', 'document_key', 'document_name', 'program_title', 'issuing_agency', 'text']
+        return [dict(zip(columns, row)) for row in self._db.execute(query, params)]
+    
+    def upcoming(self, days: int = DEFAULT_DEADLINE_DAYS, roles: Optional[List[str]] = None,
+                 start: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Dates from start (default today) through the following days"""
         
-        # Extract page limits
-        page_limits = []
-        page_matches = re.findall(r'(\d+)\s*pages?', app_section, re.IGNORECASE)
-        if page_matches:
-            page_limits = [f"{match} pages" for match in page_matches]
+        first = datetime.strptime(start, '%Y-%m-%d') if start else datetime.now()
+        last = datetime.fromordinal(first.toordinal() + int(days))
+        return self.between(first.date().isoformat(), last.date().isoformat(), roles, limit)
+    
+    def close(self):
+        self._db.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        dates = self._db.execute("SELECT COUNT(*) FROM dates").fetchone()[0]
+        return {'path': self.path, 'documents': documents, 'dates': dates}
+
+# ---------------------------------------------------------------------------
+# Result index
+# ---------------------------------------------------------------------------
+
+# Searchable text fields: (analysis section, field, key inside list items)
+INDEX_TEXT_FIELDS = {
+    'eligible': ('eligibility_requirements', 'eligible_applicants', None),
+    'ineligible': ('eligibility_requirements', 'ineligible_applicants', None),
+    'cost_sharing': ('funding_details', 'cost_sharing_requirement', None),
+    'compliance': ('compliance_requirements', 'compliance_requirements', 'requirement'),
+    'document': ('application_requirements', 'required_documents', None),
+    'competitiveness': ('strategic_insights', 'competitiveness_level', None),
+    'agency': ('document_info', 'issuing_agency', None)
+}
+
+# Funding amount labels (before the colon) and the numeric field each feeds;
+# ceilings keep the largest amount, floors the smallest
+INDEX_AMOUNT_FIELDS = [
+    (re.compile(r'Award Ceiling|Maximum.*Award'), 'funding_ceiling', max),
+    (re.compile(r'Award Floor|Minimum.*Award'), 'funding_floor', min),
+    (re.compile(r'Total.*Funding'), 'total_funding', max)
+]
+
+# Words too common to index on their own (they still count inside whole values)
+INDEX_STOP_WORDS = {'a', 'an', 'and', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+INDEX_NUMBER_FIELDS = ['funding_ceiling', 'funding_floor', 'total_funding', 'word_count', 'closing_date']
+
+RESULT_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_key TEXT PRIMARY KEY,
+    document_name TEXT NOT NULL,
+    program_title TEXT NOT NULL,
+    issuing_agency TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    field TEXT NOT NULL,
+    term TEXT NOT NULL,
+    document_key TEXT NOT NULL,
+    PRIMARY KEY (field, term, document_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS terms_by_document ON terms (document_key);
+CREATE TABLE IF NOT EXISTS numbers (
+    field TEXT NOT NULL,
+    value REAL NOT NULL,
+    document_key TEXT NOT NULL,
+    PRIMARY KEY (field, value, document_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS numbers_by_document ON numbers (document_key);
+"""
+
+# One query clause: a parenthesis, field:value / field>=number, or AND/OR/NOT
+QUERY_TOKEN = re.compile(r'\s*(?:(?P<paren>[()])|(?P<field>\w+)\s*(?P<op>:|>=|<=|>|<|=)\s*'
+                         r'(?P<value>"[^"]*"|[^\s()"]+)|(?P<word>[^\s()]+))')
+QUERY_OPERATORS = ('AND', 'OR', 'NOT')
+# Number fields keep a cumulative bitmap every this many sorted values
+RANGE_BLOCK = 64
+
+def index_term(value: str) -> str:
+    """Lowercased words of a value, so 'SF-424' and 'sf 424' are the same term"""
+    
+    return ' '.join(re.findall(r'[a-z0-9]+', value.lower()))
+
+def index_number(field: str, value: str) -> float:
+    """Numeric value of a query bound; closing_date takes YYYY-MM-DD and compares day ordinals"""
+    
+    if field == 'closing_date':
+        return float(datetime.strptime(value, '%Y-%m-%d').toordinal())
+    return float(value.replace(',', '').lstrip('$'))
+
+def bitmap(bits: Iterator[int], size: int) -> int:
+    """Int with the given bit positions (all below size) set"""
+    
+    buffer = bytearray(size // 8 + 1)
+    for bit in bits:
+        buffer[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(buffer, 'little')
+
+def index_amounts(analysis: Dict[str, Any]) -> Dict[str, float]:
+    """Dollar amounts of an analysis's funding_amounts, by INDEX_AMOUNT_FIELDS name"""
+    
+    amounts = {}
+    for amount in analysis.get('funding_details', {}).get('funding_amounts', []):
+        label, _, value = amount.partition(':')
+        for pattern, name, pick in INDEX_AMOUNT_FIELDS:
+            if pattern.match(label):
+                value = float(value.strip().lstrip('$').replace(',', '') or 0)
+                amounts[name] = pick(amounts[name], value) if name in amounts else value
+                break
+    return amounts
+
+def index_entries(analysis: Dict[str, Any]) -> Tuple[set, Dict[str, float]]:
+    """
+    Terms and numbers of one analysis. Every value is indexed as a whole and
+    word by word, so eligible:tribal and eligible:"tribal governments" both
+    match "Tribal governments".
+    """
+    
+    terms = set()
+    for name, (section, field, item_key) in INDEX_TEXT_FIELDS.items():
+        values = analysis.get(section, {}).get(field)
+        if values is None:
+            continue
+        for value in values if isinstance(values, list) else [values]:
+            term = index_term(value[item_key] if item_key else value)
+            if term:
+                terms.add((name, term))
+                terms.update((name, word) for word in term.split(' ') if word not in INDEX_STOP_WORDS)
+    
+    numbers = index_amounts(analysis)
+    if 'word_count' in analysis.get('document_info', {}):
+        numbers['word_count'] = float(analysis['document_info']['word_count'])
+    closing_date = analysis.get('deadlines_and_dates', {}).get('closing_date')
+    if closing_date:
+        numbers['closing_date'] = index_number('closing_date', closing_date)
+    return terms, numbers
+
+class QueryParser:
+    """
+    Boolean queries over the result index, e.g.
         
-        # Extract format requirements
-        format_requirements = []
-        format_patterns = [
-            r'double.?spaced',
-            r'single.?spaced',
-            r'12.?point font',
-            r'Times New Roman',
-            r'Arial',
-            r'PDF format'
-        ]
+        eligible:tribal AND cost_sharing:no AND compliance:nepa AND funding_ceiling>=500000
+    
+    Clauses are field:value (quote multi-word values) or a number comparison
+    (>, >=, <, <=, =). Adjacent clauses are ANDed; OR binds looser than AND,
+    NOT tighter, and parentheses group. Parses to nested tuples:
+    ('and'|'or', [nodes]), ('not', node), ('term', field, term) and
+    ('range', field, low, high, include_low, include_high).
+    """
+    
+    def __init__(self, query: str):
+        self.tokens = []
+        position = 0
+        query = query.strip()
+        while position < len(query):
+            match = QUERY_TOKEN.match(query, position)
+            if match.group('word') is not None and match.group('word').upper() not in QUERY_OPERATORS:
+                raise ValueError(f"Unexpected {match.group('word')!r} in query")
+            self.tokens.append(match)
+            position = match.end()
+        self.position = 0
+    
+    def parse(self) -> tuple:
+        if not self.tokens:
+            raise ValueError("Empty query")
+        node = self._or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position].group(0).strip()!r} in query")
+        return node
+    
+    def _peek(self) -> Optional[str]:
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        return token.group('paren') or (token.group('word') or '').upper() or 'clause'
+    
+    def _or(self) -> tuple:
+        nodes = [self._and()]
+        while self._peek() == 'OR':
+            self.position += 1
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+    
+    def _and(self) -> tuple:
+        nodes = [self._unary()]
+        while self._peek() in ('AND', 'NOT', '(', 'clause'):
+            if self._peek() == 'AND':
+                self.position += 1
+            nodes.append(self._unary())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+    
+    def _unary(self) -> tuple:
+        kind = self._peek()
+        if kind is None:
+            raise ValueError("Query ends unexpectedly")
+        token = self.tokens[self.position]
+        self.position += 1
         
-        for pattern in format_patterns:
-            if re.search(pattern, app_section, re.IGNORECASE):
-                format_requirements.append(pattern)
+        if kind == 'NOT':
+            return ('not', self._unary())
+        if kind == '(':
+            node = self._or()
+            if self._peek() != ')':
+                raise ValueError("Unbalanced parenthesis in query")
+            self.position += 1
+            return node
+        if kind != 'clause':
+            raise ValueError(f"Unexpected {token.group(0).strip()!r} in query")
         
-        return {
-            'required_documents': required_docs,
-            'page_limits': page_limits,
-            'format_requirements': format_requirements
-        }
+        field, op, value = token.group('field'), token.group('op'), token.group('value').strip('"')
+        if field in INDEX_NUMBER_FIELDS:
+            number = index_number(field, value)
+            bounds = {
+                ':': (number, number, True, True), '=': (number, number, True, True),
+                '>': (number, None, False, True), '>=': (number, None, True, True),
+                '<': (None, number, True, False), '<=': (None, number, True, True)
+            }[op]
+            return ('range', field) + bounds
+        if field not in INDEX_TEXT_FIELDS:
+            raise ValueError(f"Unknown query field: {field}")
+        if op != ':':
+            raise ValueError(f"{field} takes field:value, not {op}")
+        return ('term', field, index_term(value))
+
+@lru_cache(maxsize=256)
+def parse_query(query: str) -> tuple:
+    return QueryParser(query).parse()
+
+class ResultIndex:
+    """
+    Inverted index over stored analyses, in a local SQLite file.
     
-    def _extract_deadlines_and_dates(self, text: str) -> Dict[str, Any]:
-        """Extract important dates and deadlines"""
+    Each document's terms (INDEX_TEXT_FIELDS) and numbers (funding amounts,
+    word count, closing date) are persisted as rows, so documents can be added
+    and removed one at a time and the index survives restarts. Queries run in
+    memory: every document gets a bit position, each term's posting list is
+    an int bitmap, and each number field keeps a sorted value list with
+    cumulative bitmaps every RANGE_BLOCK values, so AND/OR/NOT and ranges are
+    a few big-int operations. The memory copy is loaded on the first search
+    and reloaded only when another process has written the file.
+    """
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         
-        # Extract submission deadline
-        deadline_patterns = [
-            r'Closing Date.*?(\d{2}/\d{2}/\d{4})',
-            r'deadline.*?(\d{2}/\d{2}/\d{4})',
-            r'due.*?(\d{2}/\d{2}/\d{4})',
-            r'July \d{1,2}, \d{4}',
-            r'(\d{2}/\d{2}/\d{4})'
-        ]
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(RESULT_INDEX_SCHEMA)
+        self._memory = None
+        self._data_version = None
+    
+    @classmethod
+    def from_env(cls) -> Optional['ResultIndex']:
+        """Index configured by GRANT_ANALYZER_RESULT_INDEX_PATH, or None when it is off"""
         
-        submission_deadline = None
-        for pattern in deadline_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                submission_deadline = match.group(0).strip()
-                break
+        path = os.environ.get('GRANT_ANALYZER_RESULT_INDEX_PATH')
+        return cls(path) if path else None
+    
+    def record(self, analysis: Dict[str, Any], document_key: Optional[str] = None) -> Optional[str]:
+        """
+        Replace the indexed entries of the analysis' document; returns its key,
+        or None for errors and partial (sections-only) analyses.
+        """
         
-        # Extract other important dates
-        date_patterns = [
-            r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}\b',
-            r'\b\d{1,2}/\d{1,2}/\d{4}\b',
-            r'\b\d{4}-\d{2}-\d{2}\b'
-        ]
+        if 'error' in analysis or 'document_info' not in analysis:
+            return None
+        if 'sections' in analysis.get('analysis_metadata', {}):
+            return None
         
-        important_dates = []
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text)
-            important_dates.extend(matches)
+        key = analysis_document_key(analysis, document_key)
+        info = analysis['document_info']
+        terms, numbers = index_entries(analysis)
+        self._check_memory()
+        with self._db:
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO documents (document_key, document_name, program_title, issuing_agency, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, info['document_name'], info['program_title'], info['issuing_agency'], time.time())
+            )
+            self._db.executemany("INSERT INTO terms (field, term, document_key) VALUES (?, ?, ?)",
+                                 [(field, term, key) for field, term in terms])
+            self._db.executemany("INSERT INTO numbers (field, value, document_key) VALUES (?, ?, ?)",
+                                 [(field, value, key) for field, value in numbers.items()])
         
-        return {
-            'submission_deadline': submission_deadline or "Not specified",
-            'important_dates': list(set(important_dates))[:10]  # Remove duplicates, limit to 10
-        }
+        if self._memory is not None:
+            self._forget(key)
+            self._add(key, (info['document_name'], info['program_title'], info['issuing_agency']), terms, numbers)
+        return key
     
-    def _extract_program_priorities(self, text: str) -> Dict[str, Any]:
-        """Extract program priorities and focus areas"""
-        
-        # Find program overview/description section
-        program_section = ""
-        program_match = re.search(r'(Program.*Description|PROGRAM.*OVERVIEW).*?(?=\n[A-Z]{2,}|\Z)', 
-                                 text, re.IGNORECASE | re.DOTALL)
-        if program_match:
-            program_section = program_match.group(0)
-        
-        # Extract priority areas
-        priority_keywords = [
-            'priority', 'focus', 'emphasis', 'important', 'critical', 
-            'essential', 'key', 'primary', 'main', 'principal'
-        ]
+    def remove(self, document_key: str) -> bool:
+        """Drop a document from the index; False when it was not indexed"""
         
-        priorities = []
-        for keyword in priority_keywords:
-            pattern = f'{keyword}.*?(?:\.|$)'
-            matches = re.findall(pattern, program_section, re.IGNORECASE)
-            priorities.extend([match.strip() for match in matches[:2]])  # Limit to 2 per keyword
-        
-        # Extract program goals
-        goals = []
-        goal_patterns = [
-            r'goal.*?(?:\.|$)',
-            r'objective.*?(?:\.|$)',
-            r'purpose.*?(?:\.|$)'
-        ]
+        self._check_memory()
+        with self._db:
+            removed = self._delete(document_key)
+        if self._memory is not None:
+            self._forget(document_key)
+        return removed
+    
+    def search(self, query: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Documents matching a QueryParser query, most recently indexed first"""
         
-        for pattern in goal_patterns:
-            matches = re.findall(pattern, program_section, re.IGNORECASE)
-            goals.extend([match.strip() for match in matches[:3]])
+        node = parse_query(query)
+        self._check_memory()
+        if self._memory is None:
+            self._load()
         
-        return {
-            'program_priorities': priorities[:8],  # Limit to 8
-            'program_goals': goals[:8]
-        }
+        # Bit n sits at string position len - 1 - n, so scanning left to right visits newest first
+        bits = bin(self._match(node))
+        memory = self._memory
+        matches = []
+        position = bits.find('1', 2)
+        while position != -1 and (not limit or len(matches) < limit):
+            key = memory['keys'][len(bits) - 1 - position]
+            matches.append(dict(zip(('document_key', 'document_name', 'program_title', 'issuing_agency'),
+                                    (key,) + memory['documents'][key][1])))
+            position = bits.find('1', position + 1)
+        return {'total': bits.count('1', 2), 'documents': matches}
     
-    def _extract_compliance_requirements(self, text: str) -> Dict[str, Any]:
-        """Extract compliance and regulatory requirements"""
+    def stats(self) -> Dict[str, Any]:
+        documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        terms = self._db.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        return {'path': self.path, 'documents': documents, 'terms': terms}
+    
+    def close(self):
+        self._db.close()
+    
+    def _delete(self, document_key: str) -> bool:
+        self._db.execute("DELETE FROM terms WHERE document_key = ?", (document_key,))
+        self._db.execute("DELETE FROM numbers WHERE document_key = ?", (document_key,))
+        return self._db.execute("DELETE FROM documents WHERE document_key = ?", (document_key,)).rowcount > 0
+    
+    def _check_memory(self):
+        """Drop the in-memory index when another connection has changed the file since it was loaded"""
         
-        compliance_keywords = [
-            'environmental compliance',
-            'NEPA',
-            'civil rights',
-            'equal opportunity',
-            'accessibility',
-            'reporting requirements',
-            'audit',
-            'federal regulations'
-        ]
+        if self._memory is not None and self._db.execute('PRAGMA data_version').fetchone()[0] != self._data_version:
+            self._memory = None
+    
+    def _load(self):
+        self._data_version = self._db.execute('PRAGMA data_version').fetchone()[0]
+        keys, documents = [], {}
+        for key, name, title, agency in self._db.execute(
+                "SELECT document_key, document_name, program_title, issuing_agency FROM documents ORDER BY updated_at"):
+            documents[key] = (len(keys), (name, title, agency), set(), {})
+            keys.append(key)
         
-        compliance_requirements = []
-        for keyword in compliance_keywords:
-            if re.search(keyword, text, re.IGNORECASE):
-                # Extract surrounding context
-                pattern = f'.{{0,100}}{keyword}.{{0,100}}'
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    compliance_requirements.append({
-                        'requirement': keyword,
-                        'context': match.group(0).strip()
-                    })
+        posting_ids: Dict[Tuple[str, str], List[int]] = {}
+        for field, term, key in self._db.execute("SELECT field, term, document_key FROM terms"):
+            bit, _, terms, _ = documents[key]
+            posting_ids.setdefault((field, term), []).append(bit)
+            terms.add((field, term))
+        numbers: Dict[str, List[Tuple[float, int]]] = {}
+        for field, value, key in self._db.execute("SELECT field, value, document_key FROM numbers"):
+            bit, _, _, values = documents[key]
+            numbers.setdefault(field, []).append((value, bit))
+            values[field] = value
         
-        return {
-            'compliance_requirements': compliance_requirements
+        self._memory = {
+            'keys': keys,
+            'documents': documents,
+            'live': (1 << len(keys)) - 1,
+            'postings': {term: bitmap(ids, len(keys)) for term, ids in posting_ids.items()},
+            'numbers': {field: sorted(values) for field, values in numbers.items()},
+            'prefixes': {}
         }
     
-    def _generate_strategic_insights(self, text: str) -> Dict[str, Any]:
-        """Generate strategic insights for competitive advantage"""
-        
-        insights = []
-        
-        # Analyze competitive factors
-        if re.search(r'partnership|collaboration|cooperative', text, re.IGNORECASE):
-            insights.append("Partnership/collaboration emphasis - consider forming strategic partnerships")
-        
-        if re.search(r'innovation|innovative|novel', text, re.IGNORECASE):
-            insights.append("Innovation focus - highlight unique/innovative approaches in proposal")
-        
-        if re.search(r'community|public benefit|stakeholder', text, re.IGNORECASE):
-            insights.append("Community engagement important - emphasize stakeholder involvement")
+    def _add(self, key: str, details: tuple, terms: set, numbers: Dict[str, float]):
+        memory = self._memory
+        # Removed documents leave unused bits; start over once they outnumber live ones
+        if len(memory['keys']) > 2 * len(memory['documents']) + 1024:
+            self._memory = None
+            return
         
-        if re.search(r'data|monitoring|evaluation|assessment', text, re.IGNORECASE):
-            insights.append("Data-driven approach valued - include robust monitoring and evaluation plan")
+        bit = len(memory['keys'])
+        memory['keys'].append(key)
+        memory['documents'][key] = (bit, details, terms, numbers)
+        memory['live'] |= 1 << bit
+        postings = memory['postings']
+        for term in terms:
+            postings[term] = postings.get(term, 0) | (1 << bit)
+        for field, value in numbers.items():
+            insort(memory['numbers'].setdefault(field, []), (value, bit))
+            memory['prefixes'].pop(field, None)
+    
+    def _forget(self, document_key: str):
+        memory = self._memory
+        if document_key not in memory['documents']:
+            return
+        bit, _, terms, numbers = memory['documents'].pop(document_key)
+        memory['live'] &= ~(1 << bit)
+        for term in terms:
+            memory['postings'][term] &= ~(1 << bit)
+        for field, value in numbers.items():
+            values = memory['numbers'][field]
+            del values[bisect_left(values, (value, bit))]
+            memory['prefixes'].pop(field, None)
+    
+    def _prefixes(self, field: str) -> List[int]:
+        """Bitmaps of the first 0, RANGE_BLOCK, 2 * RANGE_BLOCK, ... values of a number field"""
         
-        if re.search(r'sustainability|long.?term|ongoing', text, re.IGNORECASE):
-            insights.append("Sustainability focus - develop strong continuation plan beyond grant period")
+        prefixes = self._memory['prefixes'].get(field)
+        if prefixes is None:
+            buffer = bytearray(len(self._memory['keys']) // 8 + 1)
+            prefixes = [0]
+            for count, (_, bit) in enumerate(self._memory['numbers'][field], 1):
+                buffer[bit >> 3] |= 1 << (bit & 7)
+                if count % RANGE_BLOCK == 0:
+                    prefixes.append(int.from_bytes(buffer, 'little'))
+            self._memory['prefixes'][field] = prefixes
+        return prefixes
+    
+    def _match(self, node: tuple) -> int:
+        kind = node[0]
+        memory = self._memory
+        if kind == 'term':
+            return memory['postings'].get(node[1:], 0)
+        if kind == 'range':
+            field, low, high, include_low, include_high = node[1:]
+            values = memory['numbers'].get(field)
+            if not values:
+                return 0
+            first = 0 if low is None else (bisect_left(values, (low,)) if include_low
+                                           else bisect_right(values, (low, math.inf)))
+            last = len(values) if high is None else (bisect_right(values, (high, math.inf)) if include_high
+                                                     else bisect_left(values, (high,)))
+            if last - first <= 2 * RANGE_BLOCK:
+                return bitmap((bit for _, bit in values[first:last]), len(memory['keys']))
+            
+            # Whole blocks from the cumulative bitmaps, then trim and extend at the edges
+            prefixes = self._prefixes(field)
+            head, tail = first // RANGE_BLOCK * RANGE_BLOCK, last // RANGE_BLOCK * RANGE_BLOCK
+            size = len(memory['keys'])
+            return ((prefixes[tail // RANGE_BLOCK] ^ prefixes[head // RANGE_BLOCK])
+                    ^ bitmap((bit for _, bit in values[head:first]), size)
+                    | bitmap((bit for _, bit in values[tail:last]), size))
+        if kind == 'not':
+            return memory['live'] & ~self._match(node[1])
         
-        # Analyze funding competitiveness
-        competitiveness_score = 0
-        if re.search(r'limited funding|competitive', text, re.IGNORECASE):
-            competitiveness_score += 1
-        if re.search(r'merit review|peer review', text, re.IGNORECASE):
-            competitiveness_score += 1
-        if re.search(r'exceeds.*meets.*does not meet', text, re.IGNORECASE):
-            competitiveness_score += 1
+        results = [self._match(child) for child in node[1]]
+        combined = results[0]
+        for result in results[1:]:
+            combined = combined | result if kind == 'or' else combined & result
+        return combined
+
+# ---------------------------------------------------------------------------
+# Near-duplicate index
+# ---------------------------------------------------------------------------
+
+DUPLICATE_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_key TEXT PRIMARY KEY,
+    document_name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    document_key TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, document_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_by_document ON bands (document_key);
+"""
+
+# Estimated Jaccard similarity from which a document counts as a near-duplicate
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+def fingerprint_bands(fingerprint: str) -> List[Tuple[int, str]]:
+    """(band, bucket) pairs of a fingerprint: its values split into FINGERPRINT_BANDS runs"""
+    
+    width = len(fingerprint) // FINGERPRINT_BANDS
+    return [(band, fingerprint[band * width:(band + 1) * width]) for band in range(FINGERPRINT_BANDS)]
+
+class DuplicateIndex:
+    """
+    Locality-sensitive hash index of document fingerprints in a local SQLite file.
+    
+    Each fingerprint is stored under FINGERPRINT_BANDS (band, bucket) keys.
+    Near-duplicates share at least one bucket with high probability, so a
+    lookup reads only the documents in the query's buckets, a handful of
+    index probes however many documents are indexed, and then ranks them by
+    estimated similarity. Documents are keyed like DeadlineIndex, so an
+    amended NOFO replaces its earlier fingerprint.
+    """
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         
-        competitiveness_level = "High" if competitiveness_score >= 2 else "Medium" if competitiveness_score == 1 else "Low"
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(DUPLICATE_INDEX_SCHEMA)
+    
+    @classmethod
+    def from_env(cls) -> Optional['DuplicateIndex']:
+        """Index configured by GRANT_ANALYZER_DUPLICATE_INDEX_PATH, or None when it is off"""
         
-        return {
-            'strategic_insights': insights,
-            'competitiveness_level': competitiveness_level,
-            'key_success_factors': self._identify_success_factors(text)
-        }
+        path = os.environ.get('GRANT_ANALYZER_DUPLICATE_INDEX_PATH')
+        return cls(path) if path else None
     
-    def _identify_success_factors(self, text: str) -> List[str]:
-        """Identify key success factors from the grant text"""
+    def record(self, analysis: Dict[str, Any], document_key: Optional[str] = None) -> Optional[str]:
+        """Store the analysis' fingerprint; returns its document key, or None when it has no fingerprint"""
         
-        success_factors = []
+        if 'error' in analysis or not analysis.get('document_info', {}).get('fingerprint'):
+            return None
         
-        # Look for emphasized terms and phrases
-        emphasis_patterns = [
-            r'must demonstrate.*?(?:\.|$)',
-            r'should include.*?(?:\.|$)', 
-            r'required to.*?(?:\.|$)',
-            r'essential.*?(?:\.|$)',
-            r'critical.*?(?:\.|$)'
-        ]
+        key = analysis_document_key(analysis, document_key)
+        info = analysis['document_info']
+        with self._db:
+            self._db.execute("DELETE FROM bands WHERE document_key = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (document_key, document_name, fingerprint, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, info['document_name'], info['fingerprint'], time.time())
+            )
+            self._db.executemany("INSERT OR IGNORE INTO bands (band, bucket, document_key) VALUES (?, ?, ?)",
+                                 [(band, bucket, key) for band, bucket in fingerprint_bands(info['fingerprint'])])
+        return key
+    
+    def remove(self, document_key: str) -> bool:
+        with self._db:
+            self._db.execute("DELETE FROM bands WHERE document_key = ?", (document_key,))
+            return self._db.execute("DELETE FROM documents WHERE document_key = ?", (document_key,)).rowcount > 0
+    
+    def similar(self, fingerprint: Optional[str], threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                limit: Optional[int] = None, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Indexed documents whose estimated similarity to the fingerprint is at
+        least threshold, most similar first (ties by key), without exclude;
+        none for a text without words (no fingerprint)
+        """
         
-        for pattern in emphasis_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            success_factors.extend([match.strip() for match in matches[:2]])
+        if not 0 <= threshold <= 1:
+            raise ValueError(f"Threshold must be between 0 and 1, not {threshold}")
+        if fingerprint is None:
+            return []
+        if len(fingerprint) != FINGERPRINT_BINS * 8:
+            raise ValueError(f"Fingerprint must be {FINGERPRINT_BINS * 8} hex digits")
         
-        return success_factors[:6]  # Limit to 6
+        bands = fingerprint_bands(fingerprint)
+        candidates = " UNION ".join("SELECT document_key FROM bands WHERE band = ? AND bucket = ?" for _ in bands)
+        rows = self._db.execute(
+            f"SELECT document_key, document_name, fingerprint FROM documents WHERE document_key IN ({candidates})",
+            [value for pair in bands for value in pair]
+        )
+        matches = []
+        for key, name, stored in rows:
+            similarity = fingerprint_similarity(fingerprint, stored)
+            if key != exclude and similarity >= threshold:
+                matches.append({'document_key': key, 'document_name': name, 'similarity': similarity})
+        matches.sort(key=lambda match: (-match['similarity'], match['document_key']))
+        return matches[:limit] if limit else matches
     
-    def _analyze_competitive_factors(self, text: str) -> Dict[str, Any]:
-        """Analyze competitive factors and positioning"""
-        
-        # Analyze application volume indicators
-        volume_indicators = []
-        if re.search(r'limited.*fund|competitive.*process', text, re.IGNORECASE):
-            volume_indicators.append("Highly competitive funding process")
+    def close(self):
+        self._db.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {'path': self.path, 'documents': documents}
+
+# ---------------------------------------------------------------------------
+# Feature matrix
+# ---------------------------------------------------------------------------
+
+# Keyword families counted per document; each pattern is a family:label column,
+# the label being the pattern without a clause suffix
+FEATURE_FAMILIES = [
+    ('eligible', ELIGIBLE_PATTERNS),
+    ('ineligible', INELIGIBLE_PATTERNS),
+    ('documents', DOC_PATTERNS),
+    ('format', FORMAT_PATTERNS),
+    ('priority', PRIORITY_PATTERNS),
+    ('emphasis', EMPHASIS_PATTERNS),
+    ('compliance', COMPLIANCE_KEYWORDS),
+    ('strategic', [rule for rule, _ in STRATEGIC_INSIGHT_RULES]),
+    ('competitive', COMPETITIVENESS_PATTERNS),
+    ('volume', [rule for rule, _ in VOLUME_INDICATOR_RULES]),
+    ('differentiation', [rule for rule, _ in DIFFERENTIATION_RULES]),
+    ('positioning', [rule for rule, _ in POSITIONING_RULES])
+]
+
+# Award amounts are stored as log10(1 + dollars) / AWARD_SCALE_DIGITS, so $10B is 1.0
+AWARD_SCALE_DIGITS = 10
+
+COMPETITIVENESS_LEVELS = ['High', 'Medium', 'Low']
+
+def feature_label(pattern: str) -> str:
+    return pattern[:-len(CLAUSE_SUFFIX)] if pattern.endswith(CLAUSE_SUFFIX) else pattern
+
+# Hit counts, section presence (1.0), scaled award amounts, days from the
+# reference date to the closing date (with deadline:known set when there is
+# one) and the funding competitiveness score and level (one-hot)
+FEATURE_COLUMNS = (
+    [f'{family}:{feature_label(pattern)}' for family, patterns in FEATURE_FAMILIES for pattern in patterns] +
+    [f'section:{section}' for section in SECTION_HEADINGS] +
+    [f'award:{name}' for _, name, _ in INDEX_AMOUNT_FIELDS] +
+    ['deadline:days', 'deadline:known', 'competitiveness:score'] +
+    [f'competitiveness:{level}' for level in COMPETITIVENESS_LEVELS]
+)
+FEATURE_IDS = {column: number for number, column in enumerate(FEATURE_COLUMNS)}
+
+def _numpy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise ValueError("Feature matrices need the numpy and scipy packages (pip install numpy scipy)")
+    return numpy, sparse
+
+def hit_count(hits: KeywordHits, pattern: str) -> int:
+    """Number of re.finditer matches of a scanner pattern, from the hit table"""
+    
+    if pattern.endswith(CLAUSE_SUFFIX):
+        return len(hits.clauses(pattern))
+    return sum(1 for _ in hits.finditer(pattern))
+
+def document_features(analyzer: EnhancedGrantAnalyzer, document_text: str, document_name: str = "Grant Document",
+                      reference_date: Optional[str] = None) -> Dict[int, float]:
+    """
+    Nonzero FEATURE_COLUMNS values of one document, by column number.
+    reference_date (YYYY-MM-DD, default today) is the day deadline:days counts from.
+    """
+    
+    run = analyzer.lazy_analysis(document_text, document_name)
+    hits = run._keyword_hits()
+    row = {}
+    counts = {}
+    for family, patterns in FEATURE_FAMILIES:
+        for pattern in patterns:
+            if pattern not in counts:
+                counts[pattern] = hit_count(hits, pattern)
+            if counts[pattern]:
+                row[FEATURE_IDS[f'{family}:{feature_label(pattern)}']] = float(counts[pattern])
+    
+    for section in run._document_sections().sections:
+        row[FEATURE_IDS[f'section:{section}']] = 1.0
+    for name, amount in index_amounts(run).items():
+        row[FEATURE_IDS[f'award:{name}']] = min(math.log10(1 + amount) / AWARD_SCALE_DIGITS, 1.0)
+    
+    closing_date = run['deadlines_and_dates'].get('closing_date')
+    if closing_date:
+        reference = reference_date or datetime.now().date().isoformat()
+        days = index_number('closing_date', closing_date) - index_number('closing_date', reference)
+        row[FEATURE_IDS['deadline:days']] = days
+        row[FEATURE_IDS['deadline:known']] = 1.0
+    
+    # The strategic_insights score, without running the rest of that extractor
+    score = sum(1 for pattern in COMPETITIVENESS_PATTERNS if counts[pattern])
+    if score:
+        row[FEATURE_IDS['competitiveness:score']] = float(score)
+    row[FEATURE_IDS[f'competitiveness:{competitiveness_level(score)}']] = 1.0
+    return row
+
+class FeatureMatrix:
+    """
+    Documents-by-features matrix (scipy.sparse CSR, FEATURE_COLUMNS) for
+    ranking many documents at once.
+    
+    A profile weights columns by name, e.g. {"eligible:Nonprofits": 2,
+    "award:funding_ceiling": 5, "compliance:*": -0.5}; scoring every
+    document against any number of profiles is one sparse matrix product.
+    """
+    
+    def __init__(self, matrix, documents: List[str], columns: Optional[List[str]] = None):
+        self.matrix = matrix
+        self.documents = list(documents)
+        self.columns = list(columns or FEATURE_COLUMNS)
+        self._column_ids = {column: number for number, column in enumerate(self.columns)}
+    
+    @classmethod
+    def from_rows(cls, rows: List[Dict[int, float]], documents: List[str]) -> 'FeatureMatrix':
+        """Matrix of document_features rows, in order"""
         
-        if re.search(r'merit.*review|peer.*review', text, re.IGNORECASE):
-            volume_indicators.append("Merit-based review process")
+        numpy, sparse = _numpy()
+        indptr = [0]
+        indices = []
+        data = []
+        for row in rows:
+            for column in sorted(row):
+                indices.append(column)
+                data.append(row[column])
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix((numpy.array(data, dtype=numpy.float64), numpy.array(indices, dtype=numpy.int32),
+                                    numpy.array(indptr, dtype=numpy.int64)), shape=(len(rows), len(FEATURE_COLUMNS)))
+        return cls(matrix, documents)
+    
+    def profile_vector(self, weights: Dict[str, float]):
+        """Weight per column of one profile; a 'family:*' weight applies to every column of the family"""
         
-        # Analyze differentiation opportunities
-        differentiation_ops = []
-        if re.search(r'innovation|novel|unique', text, re.IGNORECASE):
-            differentiation_ops.append("Innovation and uniqueness valued")
+        numpy, _ = _numpy()
+        vector = numpy.zeros(len(self.columns))
+        for name, weight in weights.items():
+            if name.endswith(':*'):
+                ids = [number for column, number in self._column_ids.items() if column.startswith(name[:-1])]
+            else:
+                ids = [self._column_ids[name]] if name in self._column_ids else []
+            if not ids:
+                raise ValueError(f"Unknown feature: {name}")
+            vector[ids] = weight
+        return vector
+    
+    def profile_matrix(self, profiles: Dict[str, Dict[str, float]]):
+        """Columns-by-profiles weight matrix, to reuse across score() calls"""
         
-        if re.search(r'partnership|collaboration', text, re.IGNORECASE):
-            differentiation_ops.append("Strategic partnerships can provide advantage")
+        numpy, _ = _numpy()
+        return numpy.column_stack([self.profile_vector(weights) for weights in profiles.values()])
+    
+    def score(self, profiles):
+        """
+        Documents-by-profiles scores for profiles given as {name: weights} or a
+        profile_matrix(), in one matrix product
+        """
         
-        if re.search(r'experience|track record|past performance', text, re.IGNORECASE):
-            differentiation_ops.append("Demonstrated experience is important")
+        numpy, _ = _numpy()
+        weights = self.profile_matrix(profiles) if isinstance(profiles, dict) else profiles
+        return numpy.asarray(self.matrix @ weights)
+    
+    def rank(self, profiles: Dict[str, Dict[str, float]], limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Documents by descending score for each profile (ties in document order)"""
         
+        if not profiles:
+            return {}
+        numpy, _ = _numpy()
+        scores = self.score(profiles)
+        order = numpy.argsort(-scores, axis=0, kind='stable')[:limit]
         return {
-            'competitive_volume_indicators': volume_indicators,
-            'differentiation_opportunities': differentiation_ops,
-            'recommended_positioning': self._generate_positioning_recommendations(text)
+            name: [{'document': self.documents[row], 'score': float(scores[row, column])} for row in order[:, column]]
+            for column, name in enumerate(profiles)
         }
     
-    def _generate_positioning_recommendations(self, text: str) -> List[str]:
-        """Generate positioning recommendations based on grant analysis"""
-        
-        recommendations = []
-        
-        if re.search(r'public benefit|community', text, re.IGNORECASE):
-            recommendations.append("Position project as high-impact community benefit initiative")
-        
-        if re.search(r'data|evidence|research', text, re.IGNORECASE):
-            recommendations.append("Emphasize evidence-based approach and data-driven methodology")
+    def save(self, path: str):
+        """Write the matrix, its columns and documents to a .npz file"""
         
-        if re.search(r'partnership|collaboration', text, re.IGNORECASE):
-            recommendations.append("Highlight strategic partnerships and collaborative approach")
+        numpy, _ = _numpy()
+        matrix = self.matrix.tocsr()
+        with open(path, 'wb') as out:
+            numpy.savez_compressed(out, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                                   shape=numpy.array(matrix.shape), columns=numpy.array(self.columns, dtype=str),
+                                   documents=numpy.array(self.documents, dtype=str))
+    
+    @classmethod
+    def load(cls, path: str) -> 'FeatureMatrix':
+        numpy, sparse = _numpy()
+        with numpy.load(path) as saved:
+            matrix = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                       shape=tuple(saved['shape']))
+            return cls(matrix, saved['documents'].tolist(), saved['columns'].tolist())
+
+def feature_matrix(analyzer: EnhancedGrantAnalyzer, documents: List[Tuple[str, str]],
+                   reference_date: Optional[str] = None) -> FeatureMatrix:
+    """FeatureMatrix of (document_name, document_text) pairs, one row each in order"""
+    
+    reference_date = reference_date or datetime.now().date().isoformat()
+    rows = [document_features(analyzer, text, name, reference_date) for name, text in documents]
+    return FeatureMatrix.from_rows(rows, [name for name, _ in documents])
+
+def handle_worker_request(analyzer: EnhancedGrantAnalyzer, request: Dict[str, Any],
+                          cache: Optional[AnalysisCache] = None,
+                          deadlines: Optional[DeadlineIndex] = None,
+                          results: Optional[ResultIndex] = None,
+                          duplicates: Optional[DuplicateIndex] = None,
+                          emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Execute a single worker protocol request and build its response (emit sends progressive events)"""
+    
+    request_id = request.get('id')
+    op = request.get('op', 'analyze')
+    
+    try:
+        if op == 'analyze':
+            document_text = request.get('document_text', '')
+            document_name = request.get('document_name') or "Grant Document"
+            sections = request.get('sections')
+            if cache:
+                result = cache.analyze(analyzer, document_text, document_name, sections)
+            else:
+                result = analyzer.analyze_grant_document(document_text, document_name, sections)
+        elif op == 'analyze_file':
+            page_options = {
+                'first_page': request.get('first_page') or 1,
+                'last_page': request.get('last_page'),
+                'max_pages': request.get('max_pages'),
+                'max_bytes': request.get('max_bytes')
+            }
+            if request.get('progressive') and emit:
+                for event in iter_progressive_analysis(analyzer, request['file_path'], request['file_type'],
+                                                       request.get('document_name'), request.get('sections'),
+                                                       workers=request.get('workers'), **page_options):
+                    if event['event'] == 'complete':
+                        result = event['analysis']
+                    else:
+                        emit({'id': request_id, **event})
+            else:
+                result = analyze_document_file(analyzer, request['file_path'], request['file_type'],
+                                               request.get('document_name'), request.get('sections'), cache,
+                                               workers=request.get('workers'), **page_options)
+        elif op == 'reanalyze':
+            result = analyzer.reanalyze_grant_document(
+                request.get('previous_text', ''),
+                request.get('previous_analysis') or {},
+                request.get('document_text', ''),
+                request.get('document_name') or "Grant Document"
+            )
+        elif op == 'deadlines':
+            if not deadlines:
+                raise ValueError("Deadline index is not configured (set GRANT_ANALYZER_DEADLINE_INDEX_PATH)")
+            if request.get('end'):
+                result = deadlines.between(request.get('start') or datetime.now().date().isoformat(),
+                                           request['end'], request.get('roles'), request.get('limit'))
+            else:
+                days = request.get('days')
+                if days is None:
+                    days = DEFAULT_DEADLINE_DAYS
+                result = deadlines.upcoming(days, request.get('roles'), request.get('start'), request.get('limit'))
+        elif op == 'search':
+            if not results:
+                raise ValueError("Result index is not configured (set GRANT_ANALYZER_RESULT_INDEX_PATH)")
+            result = results.search(request.get('query', ''), request.get('limit'))
+        elif op == 'unindex':
+            indexes = [index for index in (deadlines, results, duplicates) if index]
+            if not indexes:
+                raise ValueError("No index is configured (set GRANT_ANALYZER_DEADLINE_INDEX_PATH, "
+                                 "GRANT_ANALYZER_RESULT_INDEX_PATH or GRANT_ANALYZER_DUPLICATE_INDEX_PATH)")
+            # Whether any index held the document; every one is cleared either way
+            result = any([index.remove(request['document_key']) for index in indexes])
+        elif op == 'similar':
+            if not duplicates:
+                raise ValueError("Duplicate index is not configured (set GRANT_ANALYZER_DUPLICATE_INDEX_PATH)")
+            fingerprint = request.get('fingerprint')
+            if not fingerprint:
+                if request.get('file_path'):
+                    extract = cache.extract_text if cache else process_file_content
+                    document_text = extract(request['file_path'], request['file_type'], workers=request.get('workers'))
+                else:
+                    document_text = request.get('document_text', '')
+                fingerprint = document_fingerprint(document_text)
+            threshold = request.get('threshold')
+            if threshold is None:
+                threshold = DEFAULT_DUPLICATE_THRESHOLD
+            result = {
+                'fingerprint': fingerprint,
+                'matches': duplicates.similar(fingerprint, threshold, request.get('limit'), request.get('exclude'))
+            }
+        elif op == 'rank':
+            rows = []
+            names = []
+            reference_date = request.get('reference_date') or datetime.now().date().isoformat()
+            for document in request.get('documents') or []:
+                if document.get('file_path'):
+                    extract = cache.extract_text if cache else process_file_content
+                    document_text = extract(document['file_path'], document['file_type'], workers=request.get('workers'))
+                    names.append(document.get('document_name') or document['file_path'])
+                else:
+                    document_text = document.get('document_text', '')
+                    names.append(document.get('document_name') or "Grant Document")
+                rows.append(document_features(analyzer, document_text, names[-1], reference_date))
+            result = FeatureMatrix.from_rows(rows, names).rank(request.get('profiles') or {}, request.get('limit'))
+        elif op == 'process_file':
+            page_options = {
+                'first_page': request.get('first_page') or 1,
+                'last_page': request.get('last_page'),
+                'max_pages': request.get('max_pages'),
+                'max_bytes': request.get('max_bytes')
+            }
+            # Extraction timings only feed METRICS; the result stays plain text
+            timings = {} if analyzer.instrument else None
+            if cache:
+                result = cache.extract_text(request['file_path'], request['file_type'],
+                                            workers=request.get('workers'), timings=timings, **page_options)
+            else:
+                result = process_file_content(request['file_path'], request['file_type'],
+                                              workers=request.get('workers'), timings=timings, **page_options)
+        elif op == 'cache_stats':
+            result = cache.stats() if cache else None
+        elif op == 'metrics':
+            result = METRICS.render()
+        elif op == 'ping':
+            result = 'pong'
+        else:
+            raise ValueError(f"Unsupported op: {op}")
         
-        if re.search(r'innovation|cutting.edge', text, re.IGNORECASE):
-            recommendations.append("Showcase innovative methods and cutting-edge approaches")
+        if op in ('analyze', 'analyze_file', 'reanalyze'):
+            analysis = result['analysis'] if op == 'reanalyze' and 'analysis' in result else result
+            for index in (deadlines, results, duplicates):
+                if index:
+                    index.record(analysis, request.get('document_key'))
+            if op != 'reanalyze' and request.get('format') == 'packed':
+                result = pack_analysis(result)
         
-        if re.search(r'sustainability|long.term', text, re.IGNORECASE):
-            recommendations.append("Develop strong sustainability and long-term impact narrative")
+        return {'id': request_id, 'ok': True, 'result': result}
+    
+    except Exception as e:
+        return {'id': request_id, 'ok': False, 'error': str(e)}
+
+def serve(input_stream=None, output_stream=None, frames: bool = False):
+    """
+    Long-lived worker loop speaking a JSON-lines protocol.
+    
+    Each input line is a request object {"id", "op", ...} where op is one of
+    "analyze" (document_text, document_name, optional sections), "analyze_file"
+    (file_path, file_type, optional document_name, sections and PDF page
+    options; large txt files are memory-mapped; with "progressive": true,
+    {"id", "event", ...} lines from iter_progressive_analysis are sent while
+    the file is extracted), either with "format": "packed" for a
+    GrantAnalysis.to_packed() result, "reanalyze" (previous_text,
+    previous_analysis, document_text, document_name; these three ops also
+    take an optional document_key that the configured indexes store the
+    result under, see analysis_document_key), "process_file" (file_path,
+    file_type and, for PDFs, optional first_page, last_page, max_pages,
+    max_bytes, workers), "deadlines" (labeled dates of analyzed documents
+    between start and end, or within days of start; optional roles and
+    limit), "search" (query, optional limit; documents matching a result
+    index query), "similar" (fingerprint, document_text or file_path and
+    file_type, optional threshold, limit and exclude; the fingerprint and
+    the indexed near-duplicates of that document, e.g. to reuse their
+    analysis or reanalyze against them), "rank" (documents as file_path and
+    file_type or document_text, each with an optional document_name,
+    profiles of feature column weights, optional limit and reference_date;
+    the documents by descending score per profile), "unindex" (document_key; removed from every configured index),
+    "cache_stats", "metrics"
+    (Prometheus text of the GRANT_ANALYZER_TIMINGS stage timings) or "ping".
+    Each request produces exactly one response line {"id", "ok",
+    "result"|"error"} in request order (after any event lines), so callers
+    may pipeline several requests and correlate the responses by id.
+    
+    With frames, the streams are binary and every request and response is a
+    MessagePack map in a length-prefixed frame (see write_frame) instead of a
+    line; this needs the optional msgpack package.
+    
+    When GRANT_ANALYZER_CACHE_PATH is set, extracted text and analyses are
+    served from and stored in an AnalysisCache at that path. When
+    GRANT_ANALYZER_DEADLINE_INDEX_PATH is set, the dates of every analysis
+    are recorded in a DeadlineIndex there, GRANT_ANALYZER_RESULT_INDEX_PATH
+    likewise keeps a searchable ResultIndex of full analyses and
+    GRANT_ANALYZER_DUPLICATE_INDEX_PATH a DuplicateIndex of their fingerprints.
+    """
+    
+    if frames:
+        msgpack = _msgpack()
+        input_stream = input_stream or sys.stdin.buffer
+        output_stream = output_stream or sys.stdout.buffer
+        messages = iter_frames(input_stream)
+        decode = lambda message: msgpack.unpackb(message, raw=False)
+        encode = lambda response: write_frame(output_stream, msgpack.packb(response, use_bin_type=True))
+    else:
+        if input_stream is None:
+            sys.stdin.reconfigure(encoding='utf-8')
+            input_stream = sys.stdin
+        output_stream = output_stream or sys.stdout
+        messages = (line for line in map(str.strip, input_stream) if line)
+        decode = json.loads
+        encode = lambda response: output_stream.write(json.dumps(response, separators=COMPACT_SEPARATORS) + "\n")
+    
+    analyzer = EnhancedGrantAnalyzer()
+    cache = AnalysisCache.from_env()
+    deadlines = DeadlineIndex.from_env()
+    results = ResultIndex.from_env()
+    duplicates = DuplicateIndex.from_env()
+    
+    def emit(event: Dict[str, Any]):
+        encode(event)
+        output_stream.flush()
+    
+    for message in messages:
+        try:
+            request = decode(message)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as e:
+            response = {'id': None, 'ok': False, 'error': f"Invalid request: {str(e) or type(e).__name__}"}
+        else:
+            if request.get('op') == 'shutdown':
+                break
+            response = handle_worker_request(analyzer, request, cache, deadlines, results, duplicates, emit)
         
-        return recommendations[:4]  # Limit to 4
+        emit(response)
+
+# ---------------------------------------------------------------------------
+# Batch corpus analysis
+# ---------------------------------------------------------------------------
 
-def process_file_content(file_path: str, file_type: str) -> str:
-    """Process uploaded file and extract text content"""
+BATCH_FILE_TYPES = {'.pdf': 'pdf', '.docx': 'docx', '.txt': 'txt'}
+
+# One analyzer (and cache connection) per pool process, created on first use
+_batch_state: Dict[str, Any] = {}
+
+def iter_batch_files(source: str) -> Iterator[str]:
+    """Supported documents under a directory (recursively) or matching a glob, in sorted order"""
+    
+    if os.path.isdir(source):
+        paths = (os.path.join(root, name) for root, _, names in os.walk(source) for name in names)
+    else:
+        import glob
+        paths = glob.iglob(source, recursive=True)
+    
+    for path in sorted(paths):
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in BATCH_FILE_TYPES:
+            yield os.path.abspath(path)
+
+def _init_batch_state():
+    if not _batch_state:
+        _batch_state['analyzer'] = EnhancedGrantAnalyzer()
+        _batch_state['cache'] = AnalysisCache.from_env()
+        _batch_state['indexes'] = [index for index in (DeadlineIndex.from_env(), ResultIndex.from_env(),
+                                                       DuplicateIndex.from_env()) if index]
+
+def analyze_file(file_path: str) -> Dict[str, Any]:
+    """Extract and analyze one file, returning a JSONL record; failures are recorded, never raised"""
     
+    _init_batch_state()
+    analyzer = _batch_state['analyzer']
+    cache = _batch_state['cache']
+    
+    record = {'file': file_path, 'bytes': 0}
     try:
-        if file_type == 'pdf':
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text
+        record['bytes'] = os.path.getsize(file_path)
+        file_type = BATCH_FILE_TYPES[os.path.splitext(file_path)[1].lower()]
+        # The batch pool already uses every core; extract each PDF serially
+        analysis = analyze_document_file(analyzer, file_path, file_type, cache=cache, workers=1)
         
-        elif file_type == 'docx':
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+        if 'error' in analysis:
+            record.update(ok=False, error=analysis['error'])
+        else:
+            record.update(ok=True, analysis=analysis)
+            for index in _batch_state['indexes']:
+                index.record(analysis)
+    except Exception as e:
+        record.update(ok=False, error=str(e))
+    return record
+
+# jsonl: one JSON record per line; compact: the same with packed analyses and no
+# whitespace; msgpack: length-prefixed MessagePack frames holding packed analyses
+BATCH_FORMATS = ('jsonl', 'compact', 'msgpack')
+
+def _is_framed(path: str) -> bool:
+    """Whether a batch output file holds frames (a JSON line always starts with '{')"""
+    
+    with open(path, 'rb') as out:
+        first = out.read(1)
+    return first not in (b'', b'{')
+
+def read_batch_records(path: str, unpack: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a batch output file in any BATCH_FORMATS, with analyses in the
+    JSON shape unless unpack is False. Records cut short by an interrupted run
+    are skipped.
+    """
+    
+    if _is_framed(path):
+        msgpack = _msgpack()
+        with open(path, 'rb') as out:
+            records = [msgpack.unpackb(payload, raw=False) for payload in iter_frames(out)]
+    else:
+        records = []
+        with open(path, 'r', encoding='utf-8') as out:
+            for line in out:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # Line cut short by an interrupted run
+    
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        if unpack and record.get('ok'):
+            record['analysis'] = unpack_analysis(record['analysis'])
+        yield record
+
+def _completed_files(out_path: str) -> set:
+    """Files already analyzed successfully in an earlier run of the same output file"""
+    
+    if not os.path.exists(out_path):
+        return set()
+    return {record.get('file') for record in read_batch_records(out_path, unpack=False) if record.get('ok')}
+
+def _frames_end(path: str) -> int:
+    """Length of the complete frames at the start of a framed file"""
+    
+    end = 0
+    with open(path, 'rb') as out:
+        for payload in iter_frames(out):
+            end += FRAME_HEADER.size + len(payload)
+    return end
+
+def run_batch(source: str, out_path: str, workers: int = 1, resume: bool = True,
+              output_format: str = 'jsonl') -> Dict[str, Any]:
+    """
+    Analyze every supported file in source and append one record per file
+    to out_path as each finishes (completion order, not input order), as a
+    JSON line or, for the msgpack output_format, a frame.
+    
+    Each file is isolated: its extraction or analysis error becomes an
+    {"ok": false, "error"} record and the batch continues. With resume, files
+    that already have a successful record in out_path are skipped, so an
+    interrupted run can simply be restarted; failed files are retried.
+    Returns a throughput summary.
+    """
+    
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f"Unknown batch format: {output_format} (expected one of {', '.join(BATCH_FORMATS)})")
+    framed = output_format == 'msgpack'
+    if framed:
+        msgpack = _msgpack()
+    if resume and os.path.exists(out_path) and os.path.getsize(out_path) and _is_framed(out_path) != framed:
+        raise ValueError(f"{out_path} holds {'frames' if not framed else 'JSON lines'}; "
+                         f"resume it with a matching --format or pass --no-resume")
+    
+    done = _completed_files(out_path) if resume else set()
+    candidates = list(iter_batch_files(source))
+    files = [path for path in candidates if path not in done]
+    skipped = len(candidates) - len(files)
+    
+    started = time.perf_counter()
+    counts = {'succeeded': 0, 'failed': 0, 'bytes': 0}
+    
+    mode = 'a' if resume else 'w'
+    if framed and resume and os.path.exists(out_path):
+        # Drop a frame cut short by an interrupted run so appended frames stay aligned
+        os.truncate(out_path, _frames_end(out_path))
+    with open(out_path, mode + 'b' if framed else mode, **({} if framed else {'encoding': 'utf-8'})) as out:
+        if mode == 'a' and not framed and out.tell() > 0:
+            with open(out_path, 'rb') as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b'\n':
+                    out.write('\n')
         
-        elif file_type == 'txt':
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+        def emit(record: Dict[str, Any]):
+            if output_format != 'jsonl' and record['ok']:
+                record = dict(record, analysis=pack_analysis(record['analysis']))
+            if framed:
+                write_frame(out, msgpack.packb(record, use_bin_type=True))
+            elif output_format == 'compact':
+                out.write(json.dumps(record, separators=COMPACT_SEPARATORS, ensure_ascii=False) + "\n")
+            else:
+                out.write(json.dumps(record) + "\n")
+            out.flush()
+            counts['succeeded' if record['ok'] else 'failed'] += 1
+            counts['bytes'] += record['bytes']
         
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        if workers > 1 and len(files) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
             
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(analyze_file, path): path for path in files}
+                for future in as_completed(futures):
+                    try:
+                        emit(future.result())
+                    except Exception as e:
+                        # analyze_file never raises, so this is a crashed worker process
+                        emit({'file': futures[future], 'bytes': 0, 'ok': False, 'error': str(e)})
+        else:
+            for path in files:
+                emit(analyze_file(path))
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'files': len(files),
+        'succeeded': counts['succeeded'],
+        'failed': counts['failed'],
+        'skipped': skipped,
+        'seconds': round(elapsed, 3),
+        'docs_per_sec': round(len(files) / elapsed, 2) if elapsed else None,
+        'mb_per_sec': round(counts['bytes'] / (1024 * 1024) / elapsed, 2) if elapsed else None
+    }
+
+def file_features(file_path: str, reference_date: str) -> Dict[str, Any]:
+    """Extract one file and compute its document_features row; failures are recorded, never raised"""
+    
+    _init_batch_state()
+    cache = _batch_state['cache']
+    try:
+        file_type = BATCH_FILE_TYPES[os.path.splitext(file_path)[1].lower()]
+        extract = cache.extract_text if cache else process_file_content
+        text = extract(file_path, file_type, workers=1)
+        return {'file': file_path, 'ok': True,
+                'features': document_features(_batch_state['analyzer'], text, file_path, reference_date)}
     except Exception as e:
-        raise Exception(f"Error processing file: {str(e)}")
+        return {'file': file_path, 'ok': False, 'error': str(e)}
+
+def run_features(source: str, workers: int = 1,
+                 reference_date: Optional[str] = None) -> Tuple[FeatureMatrix, List[Dict[str, Any]]]:
+    """
+    FeatureMatrix of every supported file in source (rows in sorted file
+    order), computed by workers processes, and the {"file", "error"} records
+    of files that could not be read.
+    """
+    
+    reference_date = reference_date or datetime.now().date().isoformat()
+    files = list(iter_batch_files(source))
+    if workers > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import repeat
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(file_features, files, repeat(reference_date),
+                                        chunksize=max(1, len(files) // (workers * 4))))
+    else:
+        records = [file_features(path, reference_date) for path in files]
+    
+    succeeded = [record for record in records if record['ok']]
+    matrix = FeatureMatrix.from_rows([record['features'] for record in succeeded],
+                                     [record['file'] for record in succeeded])
+    return matrix, [{'file': record['file'], 'error': record['error']} for record in records if not record['ok']]
+
+def batch_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py batch`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py batch',
+                                     description="Analyze a directory or glob of grant documents to JSONL")
+    parser.add_argument('source', help="directory (searched recursively) or glob pattern")
+    parser.add_argument('--out', required=True, help="JSONL (or frames) file to append results to")
+    parser.add_argument('--format', choices=BATCH_FORMATS, default='jsonl',
+                        help="compact and msgpack store analyses as GrantAnalysis.to_packed() lists")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-resume', action='store_true', help="overwrite --out instead of skipping completed files")
+    args = parser.parse_args(argv)
+    
+    framed = args.format == 'msgpack'
+    if not args.no_resume and os.path.exists(args.out) and os.path.getsize(args.out) and _is_framed(args.out) != framed:
+        parser.error(f"{args.out} holds {'frames' if not framed else 'JSON lines'}; "
+                     f"resume it with a matching --format or pass --no-resume")
+    
+    summary = run_batch(args.source, args.out, max(1, args.workers), resume=not args.no_resume,
+                        output_format=args.format)
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if summary['failed'] else 0)
+
+def deadlines_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py deadlines`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py deadlines',
+                                     description="List dates recorded in the deadline index")
+    parser.add_argument('--index', default=os.environ.get('GRANT_ANALYZER_DEADLINE_INDEX_PATH'),
+                        help="index file (default: GRANT_ANALYZER_DEADLINE_INDEX_PATH)")
+    parser.add_argument('--from', dest='start', help="first date, YYYY-MM-DD (default: today)")
+    parser.add_argument('--to', dest='end', help="last date, YYYY-MM-DD (default: --days after --from)")
+    parser.add_argument('--days', type=int, default=DEFAULT_DEADLINE_DAYS)
+    parser.add_argument('--role', action='append', dest='roles',
+                        help="only dates with this role, e.g. closing (repeatable)")
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args(argv)
+    
+    if not args.index:
+        parser.error("no index: pass --index or set GRANT_ANALYZER_DEADLINE_INDEX_PATH")
+    
+    index = DeadlineIndex(args.index)
+    if args.end:
+        dates = index.between(args.start or datetime.now().date().isoformat(), args.end, args.roles, args.limit)
+    else:
+        dates = index.upcoming(args.days, args.roles, args.start, args.limit)
+    print(json.dumps(dates, indent=2))
+
+def search_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py search`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py search',
+                                     description="Query the index of stored analyses")
+    parser.add_argument('query', help='e.g. \'eligible:tribal AND cost_sharing:no AND compliance:nepa\'')
+    parser.add_argument('--index', default=os.environ.get('GRANT_ANALYZER_RESULT_INDEX_PATH'),
+                        help="index file (default: GRANT_ANALYZER_RESULT_INDEX_PATH)")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--add', metavar='FILE', help="first index the analyses of a batch output file")
+    args = parser.parse_args(argv)
+    
+    if not args.index:
+        parser.error("no index: pass --index or set GRANT_ANALYZER_RESULT_INDEX_PATH")
+    
+    index = ResultIndex(args.index)
+    if args.add:
+        for record in read_batch_records(args.add):
+            if record.get('ok'):
+                index.record(record['analysis'])
+    try:
+        print(json.dumps(index.search(args.query, args.limit), indent=2))
+    except ValueError as e:
+        parser.error(str(e))
+
+def similar_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py similar`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py similar',
+                                     description="Find indexed near-duplicates of a document")
+    parser.add_argument('document', nargs='?', help="PDF, DOCX or TXT file to look up")
+    parser.add_argument('--index', default=os.environ.get('GRANT_ANALYZER_DUPLICATE_INDEX_PATH'),
+                        help="index file (default: GRANT_ANALYZER_DUPLICATE_INDEX_PATH)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_DUPLICATE_THRESHOLD,
+                        help="minimum estimated Jaccard similarity of the documents' word shingles")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--add', metavar='FILE', help="first index the fingerprints of a batch output file")
+    args = parser.parse_args(argv)
+    
+    if not args.index:
+        parser.error("no index: pass --index or set GRANT_ANALYZER_DUPLICATE_INDEX_PATH")
+    if not 0 <= args.threshold <= 1:
+        parser.error(f"--threshold must be between 0 and 1, not {args.threshold}")
+    
+    index = DuplicateIndex(args.index)
+    if args.add:
+        for record in read_batch_records(args.add):
+            if record.get('ok'):
+                index.record(record['analysis'])
+    if not args.document:
+        print(json.dumps(index.stats(), indent=2))
+        return
+    
+    file_type = BATCH_FILE_TYPES.get(os.path.splitext(args.document)[1].lower())
+    if file_type is None:
+        parser.error(f"unsupported file type: {args.document}")
+    fingerprint = document_fingerprint(process_file_content(args.document, file_type))
+    print(json.dumps(index.similar(fingerprint, args.threshold, args.limit), indent=2))
+
+def features_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py features`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py features',
+                                     description="Build a document feature matrix and rank documents against profiles")
+    parser.add_argument('source', nargs='?', help="directory or glob of documents, or a saved .npz matrix")
+    parser.add_argument('--out', help=".npz file to save the matrix to")
+    parser.add_argument('--profiles', help='JSON file of {"profile name": {"feature column": weight}}')
+    parser.add_argument('--limit', type=int, help="documents listed per profile")
+    parser.add_argument('--as-of', dest='reference_date', help="day deadline:days counts from, YYYY-MM-DD (default: today)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--columns', action='store_true', help="list the feature columns and exit")
+    args = parser.parse_args(argv)
+    
+    if args.columns:
+        print("\n".join(FEATURE_COLUMNS))
+        return
+    if not args.source:
+        parser.error("a source is required")
+    
+    started = time.perf_counter()
+    failures = []
+    if args.source.endswith('.npz') and os.path.isfile(args.source):
+        features = FeatureMatrix.load(args.source)
+    else:
+        features, failures = run_features(args.source, max(1, args.workers), args.reference_date)
+    if args.out:
+        features.save(args.out)
+    
+    if args.profiles:
+        with open(args.profiles, 'r', encoding='utf-8') as file:
+            print(json.dumps(features.rank(json.load(file), args.limit), indent=2))
+    else:
+        print(json.dumps({
+            'documents': len(features.documents),
+            'columns': len(features.columns),
+            'nonzero': int(features.matrix.nnz),
+            'failed': failures,
+            'seconds': round(time.perf_counter() - started, 3)
+        }, indent=2))
+    sys.exit(1 if failures else 0)
+
+def stream_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py stream`"""
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='grant_analyzer.py stream',
+                                     description="Analyze a document while extracting it, printing JSON-lines events")
+    parser.add_argument('document', help="PDF, DOCX or TXT file")
+    parser.add_argument('--sections', help="comma-separated analysis sections (default: all)")
+    parser.add_argument('--workers', type=int, help="PDF extraction processes (default: GRANT_ANALYZER_PDF_WORKERS)")
+    args = parser.parse_args(argv)
+    
+    file_type = BATCH_FILE_TYPES.get(os.path.splitext(args.document)[1].lower())
+    if file_type is None:
+        parser.error(f"unsupported file type: {args.document}")
+    sections = [section.strip() for section in args.sections.split(',') if section.strip()] if args.sections else None
+    
+    try:
+        for event in iter_progressive_analysis(EnhancedGrantAnalyzer(), args.document, file_type,
+                                               sections=sections, workers=args.workers):
+            print(json.dumps(event, separators=COMPACT_SEPARATORS), flush=True)
+    except Exception as e:
+        print(json.dumps({'event': 'error', 'error': str(e)}), flush=True)
+        sys.exit(1)
+
+def profile_main(argv: List[str]):
+    """Command line entry point for `grant_analyzer.py --profile <stats_file> <document>`"""
+    
+    import cProfile
+    import pstats
+    
+    if len(argv) < 2:
+        print(json.dumps({"error": "Usage: python grant_analyzer.py --profile <stats_file> <document.pdf|docx|txt>"}))
+        sys.exit(1)
+    stats_path, document_path = argv[0], argv[1]
+    file_type = BATCH_FILE_TYPES.get(os.path.splitext(document_path)[1].lower())
+    if file_type is None:
+        print(json.dumps({"error": f"Unsupported file type: {document_path}"}))
+        sys.exit(1)
+    
+    analyzer = EnhancedGrantAnalyzer(instrument=True)
+    extraction = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    text = process_file_content(document_path, file_type, workers=1, timings=extraction)
+    analysis = analyzer.analyze_grant_document(text, os.path.basename(document_path))
+    profiler.disable()
+    profiler.dump_stats(stats_path)
+    
+    if 'analysis_metadata' in analysis:
+        analysis['analysis_metadata']['timings']['extraction'] = extraction
+    # Hot spots to stderr so stdout stays valid JSON
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+    print(json.dumps(analysis, indent=2))
+
+def _write_output(data: bytes, output_format: str):
+    """Encoded result to stdout; text formats end with a newline, msgpack is written raw"""
+    
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data if output_format == 'msgpack' else data + b"\n")
+    sys.stdout.buffer.flush()
 
 def main():
     """Main function to handle command line arguments and process grant analysis"""
     
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(frames='--frames' in sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'deadlines':
+        deadlines_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'search':
+        search_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'similar':
+        similar_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'features':
+        features_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'stream':
+        stream_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile':
+        profile_main(sys.argv[2:])
+        return
+    
+    output_format = 'json'
     try:
+        # Optional --sections a,b,c limits the output to those analysis sections,
+        # and --format picks one of OUTPUT_FORMATS
+        args = sys.argv[1:]
+        if '--format' in args:
+            position = args.index('--format')
+            requested_format = ''.join(args[position + 1:position + 2])
+            del args[position:position + 2]
+            if requested_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown output format: {requested_format!r} "
+                                 f"(expected one of {', '.join(OUTPUT_FORMATS)})")
+            output_format = requested_format
+        sections = None
+        if '--sections' in args:
+            position = args.index('--sections')
+            sections = [section.strip() for section in ''.join(args[position + 1:position + 2]).split(',')
+                        if section.strip()]
+            del args[position:position + 2]
+        
         # Check if we have the correct number of arguments
-        if len(sys.argv) < 2:
-            print(json.dumps({"error": "Usage: python grant_analyzer.py <document_text> [document_name]"}))
+        if len(args) < 1:
+            print(json.dumps({"error": "Usage: python grant_analyzer.py <document_text> [document_name] [--sections a,b] [--format json|compact|packed|msgpack] | --serve [--frames] | batch <dir-or-glob> --out <file> | deadlines [--from D] [--to D] | search <query> | similar <document> | features <dir-or-glob> [--profiles <file>] | stream <document> | --profile <stats_file> <document>"}))
             sys.exit(1)
         
-        document_text = sys.argv[1]
-        document_name = sys.argv[2] if len(sys.argv) > 2 else "Grant Document"
+        document_text = args[0]
+        document_name = args[1] if len(args) > 1 else "Grant Document"
         
         # Initialize analyzer
         analyzer = EnhancedGrantAnalyzer()
         
         # Perform analysis
-        analysis_result = analyzer.analyze_grant_document(document_text, document_name)
-        
-        # Output JSON result
-        print(json.dumps(analysis_result, indent=2))
+        cache = AnalysisCache.from_env()
+        if cache:
+            analysis_result = cache.analyze(analyzer, document_text, document_name, sections)
+        else:
+            analysis_result = analyzer.analyze_grant_document(document_text, document_name, sections)
+        for index in (DeadlineIndex.from_env(), ResultIndex.from_env(), DuplicateIndex.from_env()):
+            if index:
+                index.record(analysis_result)
         
+        # Output the result
+        _write_output(encode_analysis(analysis_result, output_format), output_format)
+    
     except Exception as e:
         error_result = {
             "error": f"Analysis failed: {str(e)}",
             "timestamp": datetime.now().isoformat()
         }
-        print(json.dumps(error_result, indent=2))
+        _write_output(encode_analysis(error_result, output_format), output_format)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,8 +1,6 @@
-import { spawn } from 'child_process';
-import { promisify } from 'util';
-import fs from 'fs';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import { createInterface } from 'readline';
 import path from 'path';
-import { writeFile, unlink } from 'fs/promises';
 
 interface GrantAnalysisResult {
   document_info: {
@@ -12,6 +10,11 @@ interface GrantAnalysisResult {
     document_name: string;
     word_count: number;
     character_count: number;
+    /**
+     * MinHash signature of the text's word shingles (64 hex-encoded 32-bit values); only
+     * when GRANT_ANALYZER_DUPLICATE_INDEX_PATH is set and the text has words.
+     */
+    fingerprint?: string;
   };
   basic_information: {
     program_description: string;
@@ -41,6 +44,8 @@ interface GrantAnalysisResult {
   deadlines_and_dates: {
     submission_deadline: string;
     important_dates: string[];
+    closing_date: string | null;
+    dates: LabeledDate[];
   };
   program_priorities: {
     program_priorities: string[];
@@ -62,25 +67,259 @@ interface GrantAnalysisResult {
     differentiation_opportunities: string[];
     recommended_positioning: string[];
   };
+  document_sections: {
+    headings: Array<{
+      title: string;
+      section: string | null;
+      start: number;
+      end: number;
+    }>;
+    sections: Record<string, { start: number; end: number }>;
+  };
   analysis_metadata: {
     timestamp: string;
     document_name: string;
+    /** Code release plus rule pack name, version and rule set hash, e.g. "2.2+nofo.2025.11.268c94ea47a63e2c". */
     analyzer_version: string;
+    timed_out: string[];
+    sections?: AnalysisSection[];
+    timings?: {
+      total_seconds: number;
+      stages: Record<string, StageTiming>;
+    };
   };
   error?: string;
 }
 
+/** Sections that can be requested on their own (analysis_metadata is always returned). */
+export type AnalysisSection = Exclude<keyof GrantAnalysisResult, 'analysis_metadata' | 'error'>;
+
+export type DateRole = 'posted' | 'closing' | 'qa' | 'period_of_performance' | 'other';
+
+/** A date found in a document, normalized to YYYY-MM-DD and labeled by what it marks. */
+interface LabeledDate {
+  date: string;
+  role: DateRole;
+  text: string;
+}
+
+/** A labeled date from the cross-document deadline index. */
+export interface IndexedDate extends LabeledDate {
+  document_key: string;
+  document_name: string;
+  program_title: string;
+  issuing_agency: string;
+}
+
+/** Documents matching a result index query, most recently indexed first. */
+export interface AnalysisSearchResult {
+  total: number;
+  documents: Array<{
+    document_key: string;
+    document_name: string;
+    program_title: string;
+    issuing_agency: string;
+  }>;
+}
+
+/** Indexed near-duplicates of a document, most similar first. */
+export interface NearDuplicateResult {
+  /** Null for a text without words, which matches nothing. */
+  fingerprint: string | null;
+  matches: Array<{
+    document_key: string;
+    document_name: string;
+    /** Estimated Jaccard similarity of the two documents' word shingles. */
+    similarity: number;
+  }>;
+}
+
+/**
+ * Feature column weights of one organization profile, e.g.
+ * { "eligible:Nonprofits": 2, "award:funding_ceiling": 5, "compliance:*": -0.5 }
+ * (`grant_analyzer.py features --columns` lists the columns).
+ */
+export type FeatureProfile = Record<string, number>;
+
+/** Documents by descending score, per profile name. */
+export type ProfileRankings = Record<string, Array<{ document: string; score: number }>>;
+
+/** Per-stage instrumentation, present when GRANT_ANALYZER_TIMINGS is enabled. */
+interface StageTiming {
+  seconds: number;
+  regex_calls: number;
+  input_chars: number;
+  result_items: number;
+  result_bytes?: number;
+}
+
+interface AnalysisChange {
+  type: string;
+  section: string;
+  field: string;
+  from?: unknown;
+  to?: unknown;
+  added?: unknown[];
+  removed?: unknown[];
+}
+
+interface GrantReanalysisResult {
+  analysis: GrantAnalysisResult;
+  change_report: {
+    changed_regions: Array<{
+      previous: { start: number; end: number };
+      current: { start: number; end: number };
+    }>;
+    rerun_sections: string[];
+    reused_sections: string[];
+    changes: AnalysisChange[];
+  };
+  error?: string;
+}
+
+/**
+ * Page range and size caps applied when extracting PDF text (pages are 1-based,
+ * inclusive). `workers` > 1 splits large PDFs across a process pool.
+ */
+export interface PdfPageOptions {
+  firstPage?: number;
+  lastPage?: number;
+  maxPages?: number;
+  maxBytes?: number;
+  workers?: number;
+}
+
+/**
+ * Streamed by progressive file analysis while the file is extracted. `final`
+ * sections will not change; provisional ones may be sent again. `pages` is
+ * only set for PDFs.
+ */
+export type AnalysisEvent =
+  | { event: 'progress'; chars: number; pages?: number }
+  | { event: 'section'; section: AnalysisSection; final: boolean; result: any; chars: number; pages?: number };
+
+interface WorkerResponse {
+  id: number | null;
+  ok: boolean;
+  result?: any;
+  error?: string;
+  event?: AnalysisEvent['event'];
+}
+
+interface PendingRequest {
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+  onEvent?: (event: AnalysisEvent) => void;
+}
+
+/**
+ * A long-lived `grant_analyzer.py --serve` process. Requests are written as
+ * JSON lines on stdin and may be pipelined; responses are matched by id.
+ */
+class PythonWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+  private stderr = '';
+  alive = true;
+
+  constructor(scriptPath: string) {
+    this.process = spawn('python3', [scriptPath, '--serve'], {
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    createInterface({ input: this.process.stdout }).on('line', (line) => {
+      let response: WorkerResponse;
+      try {
+        response = JSON.parse(line);
+      } catch (parseError) {
+        console.error('Failed to parse Python worker output:', line);
+        return;
+      }
+
+      const request = response.id === null ? undefined : this.pending.get(response.id);
+      if (!request) {
+        console.error('Python worker error:', response.error);
+        return;
+      }
+
+      if (response.event) {
+        const { id, ...event } = response;
+        request.onEvent?.(event as unknown as AnalysisEvent);
+        return;
+      }
+
+      this.pending.delete(response.id!);
+      if (response.ok) {
+        request.resolve(response.result);
+      } else {
+        request.reject(new Error(response.error));
+      }
+    });
+
+    this.process.stderr.on('data', (data) => {
+      // Keep only the tail so a chatty worker cannot grow memory unbounded
+      this.stderr = (this.stderr + data.toString()).slice(-4096);
+    });
+
+    this.process.stdin.on('error', (error) => {
+      this.fail(new Error(`Python worker stdin closed: ${error.message}`));
+    });
+
+    this.process.on('close', (code) => {
+      this.fail(new Error(`Python worker exited with code ${code}: ${this.stderr}`));
+    });
+
+    this.process.on('error', (error) => {
+      this.fail(new Error(`Failed to start Python worker: ${error.message}`));
+    });
+  }
+
+  get load(): number {
+    return this.pending.size;
+  }
+
+  request<T>(op: string, payload: Record<string, unknown>, onEvent?: (event: AnalysisEvent) => void): Promise<T> {
+    if (!this.alive) {
+      return Promise.reject(new Error('Python worker is not running'));
+    }
+
+    const id = this.nextId++;
+    return new Promise<T>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject, onEvent });
+      this.process.stdin.write(JSON.stringify({ id, op, ...payload }) + '\n');
+    });
+  }
+
+  shutdown() {
+    if (this.alive) {
+      this.process.stdin.end(JSON.stringify({ op: 'shutdown' }) + '\n');
+    }
+  }
+
+  private fail(error: Error) {
+    this.alive = false;
+    this.pending.forEach((request) => request.reject(error));
+    this.pending.clear();
+  }
+}
+
 export class PythonGrantAnalyzer {
   private pythonScriptPath: string;
+  private poolSize: number;
+  private workers: PythonWorker[] = [];
 
-  constructor() {
+  constructor(poolSize: number = parseInt(process.env.PYTHON_ANALYZER_WORKERS || '2', 10)) {
     this.pythonScriptPath = path.join(__dirname, 'grant_analyzer.py');
+    this.poolSize = Math.max(1, poolSize || 1);
   }
 
   async analyzeGrantDocument(documentText: string, documentName: string = "Grant Document"): Promise<GrantAnalysisResult> {
     try {
-      // Run the Python script with the document text
-      const result = await this.runPythonScript(documentText, documentName);
+      const result = await this.getWorker().request<GrantAnalysisResult>('analyze', {
+        document_text: documentText,
+        document_name: documentName
+      });
       
       if (result.error) {
         throw new Error(result.error);
@@ -93,102 +332,247 @@ export class PythonGrantAnalyzer {
     }
   }
 
-  private async runPythonScript(documentText: string, documentName: string): Promise<GrantAnalysisResult> {
-    return new Promise((resolve, reject) => {
-      // Escape the document text for command line
-      const escapedText = documentText.replace(/"/g, '\\"');
-      const escapedName = documentName.replace(/"/g, '\\"');
-      
-      const pythonProcess = spawn('python3', [
-        this.pythonScriptPath,
-        escapedText,
-        escapedName
-      ], {
-        stdio: ['pipe', 'pipe', 'pipe']
+  /**
+   * Analyze only the given sections, e.g. ['deadlines_and_dates'] for the
+   * deadline dashboard; the other extractors never run.
+   */
+  async analyzeGrantSections<K extends AnalysisSection>(
+    documentText: string,
+    sections: K[],
+    documentName: string = "Grant Document"
+  ): Promise<Pick<GrantAnalysisResult, K | 'analysis_metadata'>> {
+    try {
+      const result = await this.getWorker().request<Pick<GrantAnalysisResult, K | 'analysis_metadata' | 'error'>>('analyze', {
+        document_text: documentText,
+        document_name: documentName,
+        sections
       });
 
-      let stdout = '';
-      let stderr = '';
+      if (result.error) {
+        throw new Error(result.error);
+      }
 
-      pythonProcess.stdout.on('data', (data) => {
-        stdout += data.toString();
-      });
+      return result;
+    } catch (error) {
+      console.error('Error analyzing grant document sections:', error);
+      throw new Error(`Grant analysis failed: ${error.message}`);
+    }
+  }
 
-      pythonProcess.stderr.on('data', (data) => {
-        stderr += data.toString();
+  /**
+   * Re-analyze a revised document (e.g. a NOFO amendment), re-running only the
+   * extractors the edits can affect and reporting field-level changes.
+   */
+  async reanalyzeGrantDocument(
+    previousText: string,
+    previousAnalysis: GrantAnalysisResult,
+    documentText: string,
+    documentName: string = "Grant Document"
+  ): Promise<GrantReanalysisResult> {
+    try {
+      const result = await this.getWorker().request<GrantReanalysisResult>('reanalyze', {
+        previous_text: previousText,
+        previous_analysis: previousAnalysis,
+        document_text: documentText,
+        document_name: documentName
       });
 
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python script failed with code ${code}: ${stderr}`));
-          return;
-        }
-
-        try {
-          const result = JSON.parse(stdout);
-          resolve(result);
-        } catch (parseError) {
-          reject(new Error(`Failed to parse Python script output: ${parseError.message}`));
-        }
-      });
+      if (result.error) {
+        throw new Error(result.error);
+      }
 
-      pythonProcess.on('error', (error) => {
-        reject(new Error(`Failed to start Python script: ${error.message}`));
-      });
-    });
+      return result;
+    } catch (error) {
+      console.error('Error re-analyzing grant document:', error);
+      throw new Error(`Grant re-analysis failed: ${error.message}`);
+    }
   }
 
-  async processUploadedFile(filePath: string, fileType: string): Promise<string> {
-    return new Promise((resolve, reject) => {
-      const pythonProcess = spawn('python3', [
-        '-c',
-        `
-import sys
-import os
-sys.path.append('${path.dirname(this.pythonScriptPath)}')
-from grant_analyzer import process_file_content
-
-try:
-    result = process_file_content('${filePath}', '${fileType}')
-    print(result)
-except Exception as e:
-    print(f"ERROR: {str(e)}")
-    sys.exit(1)
-        `
-      ], {
-        stdio: ['pipe', 'pipe', 'pipe']
+  /**
+   * Extract and analyze an uploaded file inside the worker, so the text never
+   * crosses the pipe. Very large .txt files are memory-mapped rather than read.
+   */
+  async analyzeUploadedFile(
+    filePath: string,
+    fileType: string,
+    documentName?: string,
+    options: PdfPageOptions = {}
+  ): Promise<GrantAnalysisResult> {
+    try {
+      const result = await this.getWorker().request<GrantAnalysisResult>('analyze_file', {
+        file_path: filePath,
+        file_type: fileType,
+        document_name: documentName,
+        first_page: options.firstPage,
+        last_page: options.lastPage,
+        max_pages: options.maxPages,
+        max_bytes: options.maxBytes,
+        workers: options.workers
       });
 
-      let stdout = '';
-      let stderr = '';
+      if (result.error) {
+        throw new Error(result.error);
+      }
 
-      pythonProcess.stdout.on('data', (data) => {
-        stdout += data.toString();
-      });
+      return result;
+    } catch (error) {
+      console.error('Error analyzing uploaded file:', error);
+      throw new Error(`Grant analysis failed: ${error.message}`);
+    }
+  }
 
-      pythonProcess.stderr.on('data', (data) => {
-        stderr += data.toString();
-      });
+  /**
+   * Like analyzeUploadedFile, but `onEvent` receives section results while the
+   * file is still being extracted (e.g. document_info and deadlines from the
+   * first pages); the promise resolves to the complete analysis.
+   */
+  async analyzeUploadedFileProgressive(
+    filePath: string,
+    fileType: string,
+    onEvent: (event: AnalysisEvent) => void,
+    documentName?: string,
+    options: PdfPageOptions = {}
+  ): Promise<GrantAnalysisResult> {
+    try {
+      const result = await this.getWorker().request<GrantAnalysisResult>('analyze_file', {
+        file_path: filePath,
+        file_type: fileType,
+        document_name: documentName,
+        progressive: true,
+        first_page: options.firstPage,
+        last_page: options.lastPage,
+        max_pages: options.maxPages,
+        max_bytes: options.maxBytes,
+        workers: options.workers
+      }, onEvent);
 
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`File processing failed: ${stderr}`));
-          return;
-        }
+      if (result.error) {
+        throw new Error(result.error);
+      }
 
-        if (stdout.startsWith('ERROR:')) {
-          reject(new Error(stdout.replace('ERROR:', '').trim()));
-          return;
-        }
+      return result;
+    } catch (error) {
+      console.error('Error analyzing uploaded file:', error);
+      throw new Error(`Grant analysis failed: ${error.message}`);
+    }
+  }
 
-        resolve(stdout.trim());
+  async processUploadedFile(filePath: string, fileType: string, options: PdfPageOptions = {}): Promise<string> {
+    try {
+      const text = await this.getWorker().request<string>('process_file', {
+        file_path: filePath,
+        file_type: fileType,
+        first_page: options.firstPage,
+        last_page: options.lastPage,
+        max_pages: options.maxPages,
+        max_bytes: options.maxBytes,
+        workers: options.workers
       });
+      return text.trim();
+    } catch (error) {
+      throw new Error(`File processing failed: ${error.message}`);
+    }
+  }
 
-      pythonProcess.on('error', (error) => {
-        reject(new Error(`Failed to process file: ${error.message}`));
-      });
+  /**
+   * Dates of every analyzed document from `start` (default today) through
+   * `end`, or the following `days` (default 30), in date order. Needs
+   * GRANT_ANALYZER_DEADLINE_INDEX_PATH.
+   */
+  async upcomingDeadlines(
+    options: { start?: string; end?: string; days?: number; roles?: DateRole[]; limit?: number } = {}
+  ): Promise<IndexedDate[]> {
+    return this.getWorker().request<IndexedDate[]>('deadlines', options);
+  }
+
+  /**
+   * Query the index of stored analyses (needs GRANT_ANALYZER_RESULT_INDEX_PATH), e.g.
+   * `eligible:tribal AND cost_sharing:no AND compliance:nepa AND funding_ceiling>=500000`.
+   */
+  async searchAnalyses(query: string, limit?: number): Promise<AnalysisSearchResult> {
+    return this.getWorker().request<AnalysisSearchResult>('search', { query, limit });
+  }
+
+  /**
+   * Indexed documents whose estimated similarity to this one is at least
+   * `threshold` (default 0.8), e.g. earlier postings of an amended NOFO whose
+   * analysis can be reused or passed to reanalyzeGrantDocument. Pass a stored
+   * `fingerprint`, the document text or an uploaded file; needs
+   * GRANT_ANALYZER_DUPLICATE_INDEX_PATH.
+   */
+  async findNearDuplicates(
+    document: { fingerprint: string } | { documentText: string } | { filePath: string; fileType: string },
+    options: { threshold?: number; limit?: number; exclude?: string } = {}
+  ): Promise<NearDuplicateResult> {
+    return this.getWorker().request<NearDuplicateResult>('similar', {
+      fingerprint: 'fingerprint' in document ? document.fingerprint : undefined,
+      document_text: 'documentText' in document ? document.documentText : undefined,
+      file_path: 'filePath' in document ? document.filePath : undefined,
+      file_type: 'fileType' in document ? document.fileType : undefined,
+      ...options
+    });
+  }
+
+  /**
+   * Rank documents against organization profiles. The worker builds one sparse
+   * feature matrix of the documents and scores every profile in a single matrix
+   * product (needs numpy and scipy in the worker's Python).
+   */
+  async rankForProfiles(
+    documents: Array<{ documentText: string; documentName?: string } | { filePath: string; fileType: string; documentName?: string }>,
+    profiles: Record<string, FeatureProfile>,
+    options: { limit?: number; referenceDate?: string } = {}
+  ): Promise<ProfileRankings> {
+    return this.getWorker().request<ProfileRankings>('rank', {
+      documents: documents.map((document) => ({
+        document_text: 'documentText' in document ? document.documentText : undefined,
+        file_path: 'filePath' in document ? document.filePath : undefined,
+        file_type: 'fileType' in document ? document.fileType : undefined,
+        document_name: document.documentName
+      })),
+      profiles,
+      limit: options.limit,
+      reference_date: options.referenceDate
     });
   }
+
+  /** Drop a document (by the document_key search results report) from every configured index; false if none held it. */
+  async unindexAnalysis(documentKey: string): Promise<boolean> {
+    return this.getWorker().request<boolean>('unindex', { document_key: documentKey });
+  }
+
+  /** Hit/miss counters of one worker's result cache, or null when caching is disabled. */
+  async cacheStats(): Promise<Record<string, unknown> | null> {
+    return this.getWorker().request<Record<string, unknown> | null>('cache_stats', {});
+  }
+
+  /** Stage timings of one worker in the Prometheus text format (needs GRANT_ANALYZER_TIMINGS). */
+  async metrics(): Promise<string> {
+    return this.getWorker().request<string>('metrics', {});
+  }
+
+  shutdown() {
+    this.workers.forEach((worker) => worker.shutdown());
+    this.workers = [];
+  }
+
+  private getWorker(): PythonWorker {
+    // Replace crashed workers, then grow the pool lazily up to poolSize
+    this.workers = this.workers.filter((worker) => worker.alive);
+
+    const idle = this.workers.find((worker) => worker.load === 0);
+    if (idle) {
+      return idle;
+    }
+
+    if (this.workers.length < this.poolSize) {
+      const worker = new PythonWorker(this.pythonScriptPath);
+      this.workers.push(worker);
+      return worker;
+    }
+
+    return this.workers.reduce((least, worker) => (worker.load < least.load ? worker : least));
+  }
 }
 
-export const pythonAnalyzer = new PythonGrantAnalyzer();
\ No newline at end of file
+export const pythonAnalyzer = new PythonGrantAnalyzer();
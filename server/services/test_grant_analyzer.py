@@ -0,0 +1,255 @@
+"""
+Regression tests: every fast path of the analyzer against the reference path
+it replaces, on a fixed corpus of synthetic NOFOs and pathological inputs.
+
+Run from this directory with `python -m pytest -q`.
+"""
+
+import re
+
+import pytest
+
+import grant_analyzer
+from benchmark_grant_analyzer import ADVERSARIAL_CASES, generate_nofo
+from grant_analyzer import EnhancedGrantAnalyzer, KEYWORD_PATTERNS, KEYWORD_SCANNER
+
+# Hand-written edge cases: mixed case, Unicode, headings without bodies, no final newline
+SAMPLE_NOFO = """NOTICE OF FUNDING OPPORTUNITY
+Funding Opportunity Number: HHS-2025-ACF-OCS-EE-0042
+Funding Opportunity Title: Community Resilience Grants – Phase Ⅱ
+
+I. PROGRAM DESCRIPTION
+The purpose of this program is to support rural communities. Priority is given to
+tribal applicants. Applications Due: March 15, 2025 by 11:59 PM Eastern.
+
+II. ELIGIBILITY INFORMATION
+Eligible applicants include nonprofits with 501(c)(3) status, state governments
+and Native American tribal organizations. Cost sharing or matching is not required.
+
+III. AWARD INFORMATION
+Estimated Total Program Funding: $2,500,000. Award Ceiling: $500,000
+Award Floor: $100,000. Expected Number of Awards: 5. Period of performance: 36 months.
+
+IV. APPLICATION REVIEW INFORMATION
+Merit review criteria: Approach (30 points), Organizational Capacity (25 points),
+Budget and Budget Justification (20 points). Letters of intent are due February 1, 2025.
+Applicants must register in SAM.gov and comply with 2 CFR 200 (Uniform Guidance).
+V. REPORTING
+Café résumé naïve — non-ASCII text should not confuse the scanner."""
+
+CORPUS = {
+    'sample': SAMPLE_NOFO,
+    **{f'nofo_{size}_{seed}': generate_nofo(size, seed) for seed in range(3) for size in (3000, 40000)},
+    **{name: build(5000) for name, build in ADVERSARIAL_CASES.items()}
+}
+
+def without_timestamp(analysis):
+    """The analysis with its run timestamp, which always differs, dropped"""
+    
+    metadata = dict(analysis['analysis_metadata'])
+    metadata.pop('timestamp')
+    return dict(analysis, analysis_metadata=metadata)
+
+@pytest.fixture
+def analyzer():
+    return EnhancedGrantAnalyzer(scan_workers=1)
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_scanner_matches_re(name):
+    """KeywordHits search, finditer and contains give what re would, whole text and sub-ranges"""
+    
+    text = CORPUS[name]
+    hits = KEYWORD_SCANNER.scan(text)
+    ranges = [(0, len(text)), (len(text) // 3, 2 * len(text) // 3)]
+    for pattern, flags in KEYWORD_PATTERNS:
+        regex = re.compile(pattern, flags)
+        for start, end in ranges:
+            expected = [match.span() for match in regex.finditer(text, start, end)]
+            assert [match.span() for match in hits.finditer(pattern, start, end)] == expected, pattern
+            match = hits.search(pattern, start, end)
+            assert (match.span() if match else None) == (expected[0] if expected else None), pattern
+            assert hits.contains(pattern, start, end) == bool(expected), pattern
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_reanalyze_equals_full_analysis(analyzer, name):
+    """An incremental analysis of an edited document equals analyzing the edited document"""
+    
+    previous_text = CORPUS[name]
+    previous_analysis = analyzer.analyze_grant_document(previous_text, name)
+    lines = previous_text.splitlines(True)
+    middle = len(lines) // 2
+    edits = [
+        previous_text,
+        previous_text.replace('2025', '2026', 1),
+        ''.join(lines[:middle] + ['Award Ceiling: $750,000. Applications are due April 30, 2026.\n'] + lines[middle:]),
+        ''.join(lines[:middle] + lines[middle + 3:]),
+        previous_text + '\nVI. AGENCY CONTACTS\nProgram questions: grants@example.gov\n'
+    ]
+    for document_text in edits:
+        revised = analyzer.reanalyze_grant_document(previous_text, previous_analysis, document_text, name)
+        full = analyzer.analyze_grant_document(document_text, name)
+        assert without_timestamp(revised['analysis']) == without_timestamp(full)
+
+@pytest.mark.parametrize('name', [name for name, text in CORPUS.items() if text.isascii()])
+def test_mapped_text_equals_str_analysis(analyzer, monkeypatch, tmp_path, name):
+    """Analyzing an ASCII file through its memory map equals analyzing its text"""
+    
+    # Small chunks so scans and word counts cross chunk boundaries
+    monkeypatch.setattr(grant_analyzer, 'SCAN_CHUNK_SIZE', 37)
+    monkeypatch.setattr(grant_analyzer, 'COUNT_CHUNK_SIZE', 50)
+    text = CORPUS[name]
+    path = tmp_path / 'nofo.txt'
+    path.write_bytes(text.encode('ascii'))
+    
+    mapped = grant_analyzer.analyze_mapped_text(analyzer, str(path), name)
+    assert without_timestamp(mapped) == without_timestamp(analyzer.analyze_grant_document(text, name))
+
+@pytest.mark.parametrize('name', ['sample', 'nofo_40000_0', 'merit_caps'])
+def test_parallel_scan_equals_serial_scan(monkeypatch, name):
+    """parallel_scan builds the serial hit table, counts and headings, and the same analysis"""
+    
+    text = CORPUS[name]
+    serial = KEYWORD_SCANNER.scan(text)
+    parallel = grant_analyzer.parallel_scan(KEYWORD_SCANNER, text, 3)
+    assert [list(found) for found in parallel.offsets] == [list(found) for found in serial.offsets]
+    assert parallel.counts() == serial.counts()
+    assert parallel.headings == grant_analyzer.DocumentSections.heading_lines(text)
+    
+    monkeypatch.setattr(grant_analyzer, 'PARALLEL_SCAN_MIN_CHARS', 0)
+    parallel_analysis = EnhancedGrantAnalyzer(scan_workers=3).analyze_grant_document(text, name)
+    serial_analysis = EnhancedGrantAnalyzer(scan_workers=1).analyze_grant_document(text, name)
+    assert without_timestamp(parallel_analysis) == without_timestamp(serial_analysis)
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_progressive_analysis_ends_with_full_analysis(analyzer, monkeypatch, tmp_path, name):
+    """The 'complete' event of a progressive analysis equals analyzing the whole file"""
+    
+    # Small pieces so sections are finalized before the end of the file
+    monkeypatch.setattr(grant_analyzer, 'PROGRESSIVE_PIECE_CHARS', 1000)
+    text = CORPUS[name]
+    path = tmp_path / 'nofo.txt'
+    path.write_text(text, encoding='utf-8')
+    
+    events = list(grant_analyzer.iter_progressive_analysis(analyzer, str(path), 'txt', name))
+    assert events[-1]['event'] == 'complete'
+    assert [event for event in events if event['event'] == 'complete'] == events[-1:]
+    full = analyzer.analyze_grant_document(grant_analyzer.process_file_content(str(path), 'txt'), name)
+    assert without_timestamp(events[-1]['analysis']) == without_timestamp(full)
+
+def agency_nofo(number, closing_date):
+    """Small NOFO of one agency, told apart by its number and closing date"""
+    
+    heading = f"Funding Opportunity Number: {number}\n" if number else ""
+    return (f"{heading}Funding Opportunity Title: Grid Resilience Research\n"
+            f"Department of Energy\nApplications Due: {closing_date}\n")
+
+def test_deadline_index_keeps_each_nofo_of_one_agency(analyzer, tmp_path):
+    """Numbers sharing an agency prefix, and unnumbered documents, are indexed separately"""
+    
+    index = grant_analyzer.DeadlineIndex(str(tmp_path / 'deadlines.sqlite3'))
+    documents = [('DE-FOA-0003001', 'March 15, 2026'), ('DE-FOA-0003555', 'April 30, 2026'),
+                 (None, 'May 1, 2026'), (None, 'June 1, 2026')]
+    keys = [index.record(analyzer.analyze_grant_document(agency_nofo(number, closing_date)))
+            for number, closing_date in documents]
+    
+    assert keys[:2] == ['DE-FOA-0003001', 'DE-FOA-0003555']
+    assert len(set(keys)) == len(documents)
+    dates = index.between('2026-01-01', '2026-12-31')
+    assert sorted(entry['document_key'] for entry in dates) == sorted(keys)
+    
+    # A revised NOFO replaces its own dates only
+    index.record(analyzer.analyze_grant_document(agency_nofo('DE-FOA-0003001', 'March 31, 2026')))
+    dates = index.between('2026-01-01', '2026-12-31')
+    assert {entry['document_key']: entry['date'] for entry in dates}['DE-FOA-0003001'] == '2026-03-31'
+    assert len(dates) == len(documents)
+
+def test_result_index_and_unindex_keep_documents_apart(analyzer, tmp_path):
+    """Two NOFOs of one agency stay separately searchable, and unindex clears every configured index"""
+    
+    results = grant_analyzer.ResultIndex(str(tmp_path / 'results.sqlite3'))
+    deadlines = grant_analyzer.DeadlineIndex(str(tmp_path / 'deadlines.sqlite3'))
+    nonprofits = (agency_nofo('DE-FOA-0003001', 'March 15, 2026') +
+                  "\nII. ELIGIBILITY INFORMATION\nEligible applicants include nonprofits.\n")
+    for text in (nonprofits, agency_nofo('DE-FOA-0003555', 'April 30, 2026')):
+        response = grant_analyzer.handle_worker_request(analyzer, {'op': 'analyze', 'document_text': text},
+                                                        deadlines=deadlines, results=results)
+        assert response['ok']
+    
+    assert results.stats()['documents'] == 2
+    assert [match['document_key'] for match in results.search('eligible:nonprofits')['documents']] == ['DE-FOA-0003001']
+    
+    # Without a result index, unindex still clears the deadline index
+    response = grant_analyzer.handle_worker_request(analyzer, {'op': 'unindex', 'document_key': 'DE-FOA-0003001'},
+                                                    deadlines=deadlines)
+    assert response == {'id': None, 'ok': True, 'result': True}
+    assert {entry['document_key'] for entry in deadlines.between('2026-01-01', '2026-12-31')} == {'DE-FOA-0003555'}
+    response = grant_analyzer.handle_worker_request(analyzer, {'op': 'unindex', 'document_key': 'DE-FOA-0003001'})
+    assert not response['ok']
+
+def test_texts_without_words_are_never_near_duplicates(tmp_path):
+    """Blank and whitespace-only texts get no fingerprint, so they are neither indexed nor matched"""
+    
+    analyzer = EnhancedGrantAnalyzer(fingerprint=True)
+    index = grant_analyzer.DuplicateIndex(str(tmp_path / 'duplicates.sqlite3'))
+    for number, text in enumerate(['', ' \n\t \n', '\f' * 40]):
+        assert grant_analyzer.document_fingerprint(text) is None
+        analysis = analyzer.analyze_grant_document(text, f"scan{number}.pdf")
+        assert 'fingerprint' not in analysis['document_info']
+        assert index.record(analysis) is None
+        assert index.similar(None, 0.0) == []
+    assert index.stats()['documents'] == 0
+    
+    index.record(analyzer.analyze_grant_document(SAMPLE_NOFO, "sample.txt"))
+    response = grant_analyzer.handle_worker_request(analyzer, {'op': 'similar', 'document_text': '  '},
+                                                    duplicates=index)
+    assert response['result'] == {'fingerprint': None, 'matches': []}
+
+def test_fingerprint_is_a_separate_opt_in_stage():
+    """Analyses are only fingerprinted when asked to, timed as their own stage, and reanalyses keep up"""
+    
+    text = CORPUS['nofo_3000_0']
+    plain = EnhancedGrantAnalyzer(fingerprint=False, instrument=True).analyze_grant_document(text)
+    assert 'fingerprint' not in plain['document_info']
+    assert 'fingerprint' not in plain['analysis_metadata']['timings']['stages']
+    
+    analyzer = EnhancedGrantAnalyzer(fingerprint=True, instrument=True)
+    analysis = analyzer.analyze_grant_document(text)
+    assert analysis['document_info']['fingerprint'] == grant_analyzer.document_fingerprint(text)
+    assert 'fingerprint' in analysis['analysis_metadata']['timings']['stages']
+    
+    revised_text = text + "\nVI. AGENCY CONTACTS\nProgram questions: grants@example.gov\n"
+    for previous in (analysis, plain):
+        revised = analyzer.reanalyze_grant_document(text, previous, revised_text)['analysis']
+        assert revised['document_info'] == analyzer.analyze_grant_document(revised_text)['document_info']
+
+def test_deadlines_op_keeps_an_explicit_zero_days(analyzer, tmp_path):
+    """days: 0 asks for the start date alone, not the default window"""
+    
+    index = grant_analyzer.DeadlineIndex(str(tmp_path / 'deadlines.sqlite3'))
+    index.record(analyzer.analyze_grant_document(agency_nofo('DE-FOA-0003001', 'March 15, 2026')))
+    index.record(analyzer.analyze_grant_document(agency_nofo('DE-FOA-0003555', 'March 20, 2026')))
+    
+    def upcoming(**options):
+        request = {'op': 'deadlines', 'start': '2026-03-15', **options}
+        return [entry['date'] for entry in grant_analyzer.handle_worker_request(analyzer, request,
+                                                                                 deadlines=index)['result']]
+    
+    assert upcoming(days=0) == ['2026-03-15']
+    assert upcoming() == ['2026-03-15', '2026-03-20']
+
+def test_reanalyze_sees_a_label_blank_lines_above_its_amount(analyzer):
+    """Editing an amount far below its label (PDF-style blank lines) still re-runs funding_details"""
+    
+    previous_text = ("NOTICE OF FUNDING OPPORTUNITY\nFunding Opportunity Number: DE-FOA-0003001\n\n"
+                     "III. AWARD INFORMATION\nAward Ceiling:\n\n\n\n$500,000\n\n\n\n"
+                     "Projects must begin within twelve months.\n\nIV. ELIGIBILITY INFORMATION\n"
+                     "Eligible applicants include nonprofits.\n")
+    document_text = previous_text.replace('$500,000', '$750,000')
+    previous_analysis = analyzer.analyze_grant_document(previous_text)
+    revised = analyzer.reanalyze_grant_document(previous_text, previous_analysis, document_text)
+    
+    assert without_timestamp(revised['analysis']) == without_timestamp(analyzer.analyze_grant_document(document_text))
+    assert revised['analysis']['funding_details']['funding_amounts'] == ['Award Ceiling: $750,000']
+    assert 'funding_details' in revised['change_report']['rerun_sections']
+    assert {'type': 'award_ceiling_changed', 'section': 'funding_details', 'field': 'Award Ceiling',
+            'from': '$500,000', 'to': '$750,000'} in revised['change_report']['changes']